@@ -5,29 +5,200 @@ This module provides the application factory pattern for creating Flask app inst
 Routes are organized in separate blueprint modules in the routes package.
 """
 
+import os
+from datetime import datetime, timedelta
+
+import click
 from flask import Flask
-from database import init_database, add_sample_data
+from jinja2 import FileSystemBytecodeCache
+from database import (
+    archive_closed_loans, enable_group_commit, disable_group_commit, ARCHIVE_AFTER_DAYS, insert_branch,
+    add_branch_copies
+)
+from repository import configure_repository
 from routes import register_blueprints
+from json_provider import FastJSONProvider
+from services.search_cache import search_cache
+from services.idempotency import idempotency_store
+from services.catalog_snapshot import export_snapshot, snapshot_search
+from services.export_service import DATASETS, EXPORT_FORMATS, export_to_file
+from services.fee_scheduler import FeeAccrualScheduler
+from services.library_service import expire_uncollected_holds
+from services.payment_service import configure_payment_gateway
+from compression import init_compression
+from profiling import init_profiling
+
+# Features that read or write the SQLite file directly, whatever the storage backend
+SQLITE_ONLY_CONFIG = ('CATALOG_SNAPSHOT_PATH', 'GROUP_COMMIT', 'FEE_SCHEDULER_INTERVAL')
 
 
-def create_app():
+def create_app(config: dict = None):
     """
     Application factory function to create and configure Flask app.
+
+    Args:
+        config: Optional overrides applied on top of the defaults. SEED_SAMPLE_DATA
+            defaults to off when the LIBRARY_ENV environment variable is "production";
+            GROUP_COMMIT batches circulation writes through a background writer;
+            SEARCH_CACHE_SIZE and SEARCH_CACHE_TTL tune the search result cache;
+            IDEMPOTENCY_MAX_KEYS and IDEMPOTENCY_TTL bound the remembered idempotency
+            keys of successful borrow, return and payment posts (per process);
+            CATALOG_SNAPSHOT_PATH serves title/author searches from a memory-mapped
+            catalog snapshot kept at that path;
+            FEE_SCHEDULER_INTERVAL (seconds) starts background late fee accrual;
+            PAYMENT_GATEWAY_URL (with PAYMENT_GATEWAY_KEY) sends payments to a real
+            gateway over HTTP, rate limited to PAYMENT_RATE_LIMIT calls/second;
+            STORAGE_BACKEND is "sqlite" (default, or the LIBRARY_STORAGE environment
+            variable) or "memory" for a throwaway in-process store (see repository.py),
+            which cannot be combined with the SQLITE_ONLY_CONFIG options;
+            PROFILING_ENABLED turns on per-request profiling (X-Profile header, or
+            PROFILE_SAMPLE_RATE of requests) listed under /admin/profiles (see profiling.py).
     
     Returns:
         Flask: Configured Flask application instance
+
+    Raises:
+        ValueError: an option in SQLITE_ONLY_CONFIG is set for the memory backend
     """
     app = Flask(__name__)
     app.secret_key = "super secret key"
+    app.config['SEED_SAMPLE_DATA'] = os.environ.get('LIBRARY_ENV', 'development') != 'production'
+    app.config['GROUP_COMMIT'] = False
+    app.config['FEE_SCHEDULER_INTERVAL'] = None
+    app.config['STORAGE_BACKEND'] = os.environ.get('LIBRARY_STORAGE', 'sqlite')
+    app.config.update(config or {})
+
+    backend = app.config['STORAGE_BACKEND']
+    if getattr(backend, 'name', backend) != 'sqlite':
+        sqlite_only = [option for option in SQLITE_ONLY_CONFIG if app.config.get(option)]
+        if sqlite_only:
+            raise ValueError(f"{', '.join(sqlite_only)} need the SQLite storage backend")
+
+    # Share compiled templates between worker processes so cold starts skip compilation. Unless
+    # JINJA_BYTECODE_CACHE_DIR is set, Jinja picks a private per-user directory and checks its owner
+    bytecode_dir = app.config.get('JINJA_BYTECODE_CACHE_DIR')
+    app.jinja_options = {**app.jinja_options, 'bytecode_cache': FileSystemBytecodeCache(bytecode_dir)}
+
+    app.json = FastJSONProvider(app)
+    init_compression(app)
+    init_profiling(app)
     
-    # Initialize the database
-    init_database()
+    # Initialize the database unless its schema marker is already current
+    repository = configure_repository(backend)
+    repository.ensure_schema()
+    if repository.name != 'sqlite':
+        # Left over from an earlier app in this process, and both bypass the repository
+        snapshot_search.configure(None)
+        disable_group_commit()
     
     # Add sample data for testing and demonstration
-    add_sample_data()
+    if app.config['SEED_SAMPLE_DATA']:
+        repository.add_sample_data()
+
+    if app.config['GROUP_COMMIT']:
+        enable_group_commit()
+
+    if 'SEARCH_CACHE_SIZE' in app.config or 'SEARCH_CACHE_TTL' in app.config:
+        search_cache.configure(app.config.get('SEARCH_CACHE_SIZE'), app.config.get('SEARCH_CACHE_TTL'))
+
+    if 'IDEMPOTENCY_MAX_KEYS' in app.config or 'IDEMPOTENCY_TTL' in app.config:
+        idempotency_store.configure(app.config.get('IDEMPOTENCY_MAX_KEYS'), app.config.get('IDEMPOTENCY_TTL'))
+
+    if app.config.get('CATALOG_SNAPSHOT_PATH'):
+        snapshot_search.configure(app.config['CATALOG_SNAPSHOT_PATH'])
+
+    if app.config.get('PAYMENT_GATEWAY_URL'):
+        configure_payment_gateway(app.config['PAYMENT_GATEWAY_URL'],
+                                  api_key=app.config.get('PAYMENT_GATEWAY_KEY', 'test_key_12345'),
+                                  rate=app.config.get('PAYMENT_RATE_LIMIT', 50))
+
+    if app.config['FEE_SCHEDULER_INTERVAL']:
+        scheduler = FeeAccrualScheduler(app.config['FEE_SCHEDULER_INTERVAL'])
+        scheduler.start()
+        app.extensions['fee_scheduler'] = scheduler
     
     # Register all route blueprints
     register_blueprints(app)
+
+    @app.cli.command('archive-loans')
+    @click.option('--days', default=ARCHIVE_AFTER_DAYS, show_default=True,
+                  help='Archive loans returned more than this many days ago.')
+    def archive_loans_command(days):
+        """Move closed loans out of the hot borrow_records table."""
+        moved = archive_closed_loans(datetime.now() - timedelta(days=days))
+        click.echo(f'Archived {moved} closed loan(s).')
+
+    @app.cli.command('add-branch')
+    @click.argument('code')
+    @click.argument('name')
+    def add_branch_command(code, name):
+        """Add a library branch."""
+        branch_id = insert_branch(code, name)
+        if branch_id is None:
+            raise click.ClickException(f'A branch with code {code} already exists.')
+        click.echo(f'Added branch {code} with id {branch_id}.')
+
+    @app.cli.command('stock-branch')
+    @click.argument('book_id', type=int)
+    @click.argument('branch_id', type=int)
+    @click.argument('copies', type=int)
+    def stock_branch_command(book_id, branch_id, copies):
+        """Add copies of a book to a branch (negative to withdraw copies on the shelf)."""
+        if not add_branch_copies(book_id, branch_id, copies):
+            raise click.ClickException('Unknown book or branch, or not enough copies on the shelf.')
+        click.echo(f'Changed book {book_id} at branch {branch_id} by {copies:+d} copies.')
+
+    @app.cli.command('expire-holds')
+    def expire_holds_command():
+        """Release copies set aside for holds that were not picked up in time."""
+        click.echo(f'Expired {expire_uncollected_holds()} uncollected hold(s).')
+
+    @app.cli.command('circulation-report')
+    @click.option('--workers', type=int, default=None, help='Worker processes (default: CPU count).')
+    @click.option('--top', default=20, show_default=True, help='Overdue patrons to list.')
+    @click.option('--format', 'output_format', type=click.Choice(['json', 'csv']), default='json',
+                  show_default=True)
+    @click.option('--output', required=True,
+                  help='JSON file, or the directory to write titles/daily/overdue_patrons CSVs into.')
+    def circulation_report_command(workers, top, output_format, output):
+        """Library-wide circulation statistics, computed in parallel."""
+        # Imported here so web processes never pay for numpy
+        from services.circulation_report import generate_circulation_report, write_report_csv, write_report_json
+
+        report = generate_circulation_report(workers=workers, top=top)
+        if output_format == 'json':
+            write_report_json(report, output)
+        else:
+            write_report_csv(report, output)
+        click.echo(f"Reported on {report['loans']} loan(s) to {output}.")
+
+    @app.cli.command('export')
+    @click.argument('dataset', type=click.Choice(DATASETS))
+    @click.option('--format', 'export_format', type=click.Choice(list(EXPORT_FORMATS)), default='csv',
+                  show_default=True)
+    @click.option('--output', default='-', show_default=True, help='File to write, or - for stdout.')
+    @click.option('--available-only', is_flag=True, help='Books: only those with copies on the shelf.')
+    @click.option('--patron', help="Loans: only this patron's.")
+    @click.option('--from', 'start', type=click.DateTime(['%Y-%m-%d']), help='Loans: borrowed on or after.')
+    @click.option('--to', 'end', type=click.DateTime(['%Y-%m-%d']), help='Loans: borrowed on or before.')
+    @click.option('--archived', is_flag=True, help='Loans: include the yearly archive tables.')
+    def export_command(dataset, export_format, output, available_only, patron, start, end, archived):
+        """Stream the books or loans table to CSV or JSON Lines."""
+        if dataset == 'books':
+            filters = {'available_only': available_only}
+        else:
+            filters = {'patron_id': patron, 'include_archived': archived,
+                       'start': start and start.date(), 'end': end and end.date()}
+        written = export_to_file(output, dataset, export_format, dumps=app.json.dumps_bytes, **filters)
+        if output != '-':
+            click.echo(f'Wrote {written} bytes to {output}.')
+
+    @app.cli.command('export-catalog')
+    @click.argument('path')
+    def export_catalog_command(path):
+        """Write a memory-mapped catalog snapshot for search workers."""
+        version = export_snapshot(path)
+        click.echo(f'Wrote catalog snapshot version {version} to {path}.')
     
     return app
 
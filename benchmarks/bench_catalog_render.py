@@ -0,0 +1,77 @@
+"""
+Benchmark: render time of the /catalog page with a large catalog.
+
+Compares a cold row cache (every row rendered through Jinja, as before
+fragment caching) with a warm one, and a warm cache after one borrow.
+
+Usage:
+    python benchmarks/bench_catalog_render.py [--rows 50000] [--repeat 5]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+import database
+
+
+def build_database(rows: int):
+    database.init_database()
+    conn = database.get_db_connection()
+    conn.executemany(
+        'INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)',
+        ((f'Title {i:06d}', f'Author {i % 5000}', f'{9780000000000 + i}', 3, i % 4) for i in range(rows))
+    )
+    conn.commit()
+    conn.close()
+    database.notify_book_changed(None)
+
+
+def timed_get(client) -> float:
+    start = time.perf_counter()
+    response = client.get('/catalog')
+    assert response.status_code == 200
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=50_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE = os.path.join(tmp, 'bench.db')
+        build_database(args.rows)
+
+        from app import create_app
+        from routes.catalog_routes import row_cache
+        app = create_app()
+        client = app.test_client()
+
+        cold = []
+        for _ in range(args.repeat):
+            row_cache.invalidate()
+            cold.append(timed_get(client))
+
+        warm = [timed_get(client) for _ in range(args.repeat)]
+
+        after_write = []
+        for _ in range(args.repeat):
+            database.update_book_availability(1, 0)
+            after_write.append(timed_get(client))
+
+    print(f'{args.rows} rows, median of {args.repeat}:')
+    print(f'  cold row cache:     {statistics.median(cold) * 1000:8.1f} ms')
+    print(f'  warm row cache:     {statistics.median(warm) * 1000:8.1f} ms')
+    print(f'  warm + one write:   {statistics.median(after_write) * 1000:8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark: title/author search over the SQLite LIKE query vs the mmap snapshot.
+
+Seeds N books, then times uncached searches for a mix of rare and common terms
+through both backends (the search cache is bypassed), plus the snapshot export.
+
+Usage:
+    python benchmarks/bench_catalog_snapshot.py [--books 100000] [--queries 200]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+import database
+from database import BOOK_COLUMNS
+from services.catalog_snapshot import export_snapshot, snapshot_search
+
+WORDS = ['the', 'harry', 'potter', 'war', 'peace', 'great', 'gatsby', 'orwell', 'secret',
+         'garden', 'night', 'house', 'river', 'stone', 'winter', 'kingdom', 'shadow', 'light']
+
+
+def sqlite_search(search_type: str, term: str):
+    return database.conn_execute_read(
+        f'SELECT {BOOK_COLUMNS} FROM books WHERE {search_type} LIKE ? ORDER BY title', (f'%{term}%',))
+
+
+def timed(fn, queries):
+    samples = []
+    for search_type, term in queries:
+        start = time.perf_counter()
+        fn(search_type, term)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--books', type=int, default=100_000)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(327)
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE = os.path.join(tmp, 'bench.db')
+        database.init_database()
+        conn = database.get_db_connection()
+        conn.executemany(
+            'INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)',
+            ((' '.join(rng.choice(WORDS).title() for _ in range(3)) + f' {i}',
+              f'{rng.choice(WORDS).title()} Author{i % 5000}', f'{9780000000000 + i}', 3, 3)
+             for i in range(args.books)))
+        conn.commit()
+        conn.close()
+
+        path = os.path.join(tmp, 'catalog.snap')
+        start = time.perf_counter()
+        export_snapshot(path)
+        print(f'exported {args.books} books ({os.path.getsize(path) / 1e6:.1f} MB) '
+              f'in {time.perf_counter() - start:.2f}s')
+        snapshot_search.configure(path)
+
+        rare = [('title', f' {rng.randrange(args.books)}x') for _ in range(args.queries // 2)]
+        rare += [('author', f'author{rng.randrange(5000)}') for _ in range(args.queries // 2)]
+        common = [(rng.choice(['title', 'author']), rng.choice(WORDS)) for _ in range(args.queries // 10)]
+
+        print(f'{"queries":<10} {"backend":<10} {"median":>10} {"p95":>10}')
+        for label, queries in (('rare', rare), ('common', common)):
+            for backend, fn in (('sqlite', sqlite_search), ('snapshot', snapshot_search.search)):
+                median, p95 = timed(fn, queries)
+                print(f'{label:<10} {backend:<10} {median * 1000:>8.2f}ms {p95 * 1000:>8.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
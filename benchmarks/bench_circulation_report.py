@@ -0,0 +1,85 @@
+"""
+Benchmark: library-wide circulation report vs number of worker processes.
+
+Seeds N loans spread over several years (half of them archived), then times
+generate_circulation_report with 1, 2, 4, ... workers up to the CPU count.
+
+Usage:
+    python benchmarks/bench_circulation_report.py [--loans 1000000] [--repeat 3] [--workers 1 2 4 8]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+import database
+from services.circulation_report import generate_circulation_report
+
+
+def seed(loans: int, books: int = 5000, patrons: int = 20000):
+    rng = random.Random(327)
+    now = datetime.now()
+    conn = database.get_db_connection()
+    conn.executemany(
+        'INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)',
+        ((f'Title {i}', f'Author {i}', f'{9780000000000 + i}', 5, rng.randint(0, 5)) for i in range(books)))
+
+    def rows():
+        for _ in range(loans):
+            borrowed = now - timedelta(days=rng.randint(0, 5 * 365))
+            due = borrowed + timedelta(days=14)
+            late = rng.randint(-10, 10)
+            returned = due + timedelta(days=late)
+            yield (f'{rng.randrange(patrons):06d}', rng.randint(1, books), borrowed.isoformat(),
+                   due.isoformat(), returned.isoformat() if returned < now else None)
+
+    conn.executemany('''
+        INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date)
+        VALUES (?, ?, ?, ?, ?)
+    ''', rows())
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--loans', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--workers', type=int, nargs='+', help='worker counts (default: powers of two up to CPUs)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE = os.path.join(tmp, 'bench.db')
+        database.init_database()
+        start = time.perf_counter()
+        seed(args.loans)
+        archived = database.archive_closed_loans(datetime.now() - timedelta(days=2 * 365))
+        print(f'seeded {args.loans} loans ({archived} archived) in {time.perf_counter() - start:.1f}s')
+
+        counts = args.workers or [1]
+        while not args.workers and counts[-1] * 2 <= (os.cpu_count() or 1):
+            counts.append(counts[-1] * 2)
+
+        baseline = None
+        print(f'{"workers":>8} {"median":>10} {"speedup":>8}')
+        for workers in counts:
+            samples = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                generate_circulation_report(workers=workers)
+                samples.append(time.perf_counter() - start)
+            median = statistics.median(samples)
+            baseline = baseline or median
+            print(f'{workers:>8} {median:>9.2f}s {baseline / median:>7.2f}x')
+
+
+if __name__ == '__main__':
+    main()
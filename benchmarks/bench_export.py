@@ -0,0 +1,78 @@
+"""
+Benchmark: memory and throughput of streaming loan exports.
+
+Seeds N loans, then exports them as CSV and JSON Lines through iter_export
+and, for comparison, through the old fetchall-into-dicts path, reporting
+rows/s and peak traced Python memory for each.
+
+Usage:
+    python benchmarks/bench_export.py [--loans 1000000] [--batch-size 1000]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+import database
+from services.export_service import export_query, iter_export
+
+
+def seed(loans: int):
+    now = datetime.now()
+    conn = database.get_db_connection()
+    conn.executemany('''
+        INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date)
+        VALUES (?, ?, ?, ?, ?)
+    ''', ((f'{i % 50000:06d}', i % 3 + 1, (now - timedelta(minutes=i)).isoformat(),
+           (now - timedelta(minutes=i) + timedelta(days=14)).isoformat(), None) for i in range(loans)))
+    conn.commit()
+    conn.close()
+
+
+def measure(label: str, fn, rows: int):
+    tracemalloc.start()
+    start = time.perf_counter()
+    written = fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f'{label:<22} {rows / elapsed:>12,.0f} rows/s {peak / 1e6:>10.1f} MB peak {written / 1e6:>8.1f} MB out')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--loans', type=int, default=1_000_000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE = os.path.join(tmp, 'bench.db')
+        database.init_database()
+        database.add_sample_data()
+        seed(args.loans)
+
+        def streamed(export_format):
+            return lambda: sum(len(chunk) for chunk in iter_export('loans', export_format,
+                                                                   batch_size=args.batch_size))
+
+        def materialized():
+            _, sql, params = export_query('loans')
+            rows = database.conn_execute_read(sql, params)
+            return len(''.join(json.dumps(row) + '\n' for row in rows))
+
+        total = args.loans + 1
+        measure('streamed csv', streamed('csv'), total)
+        measure('streamed jsonl', streamed('jsonl'), total)
+        measure('fetchall jsonl', materialized, total)
+
+
+if __name__ == '__main__':
+    main()
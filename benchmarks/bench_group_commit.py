@@ -0,0 +1,57 @@
+"""
+Benchmark: circulation write throughput, per-call commit vs group commit.
+
+Request threads hammer update_book_availability against an on-disk database,
+first committing every call on its own, then through the group commit writer.
+
+Usage:
+    python benchmarks/bench_group_commit.py [--threads 32] [--writes 4000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+import database
+
+
+def run(threads: int, writes: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(lambda i: database.update_book_availability(1 + i % 3, 1), range(writes)))
+    elapsed = time.perf_counter() - start
+    assert all(results), 'some writes failed (database busy?)'
+    return writes / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--writes', type=int, default=4000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=ROOT) as tmp:
+        database.DATABASE = os.path.join(tmp, 'bench.db')
+        database.init_database()
+        database.add_sample_data()
+
+        per_call = run(args.threads, args.writes)
+
+        writer = database.enable_group_commit()
+        grouped = run(args.threads, args.writes)
+        database.disable_group_commit()
+
+    print(f'{args.writes} writes from {args.threads} threads:')
+    print(f'  per-call commit: {per_call:9.0f} writes/s')
+    print(f'  group commit:    {grouped:9.0f} writes/s '
+          f'({writer.statements / writer.batches:.1f} writes per batch)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark: patron status report, per-loan lookups vs the aggregated query.
+
+The per-loan baseline replays the old report shape: borrowed books, one late
+fee calculation per loan, a separate count and a history query.
+
+Usage:
+    python benchmarks/bench_patron_report.py [--sizes 1 100 10000] [--repeat 3]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+import database
+from services.library_service import calculate_late_fee_for_book, get_patron_status_report
+
+
+def per_loan_report(patron_id: str):
+    current = database.get_patron_borrowed_books(patron_id)
+    total = sum(calculate_late_fee_for_book(patron_id, loan['book_id'])['fee_amount'] for loan in current)
+    return current, total, database.get_patron_borrow_count(patron_id), \
+        database.get_patron_borrow_history(patron_id)
+
+
+def seed(patron_id: str, loans: int):
+    now = datetime.now()
+    conn = database.get_db_connection()
+    book_ids = [row['id'] for row in conn.execute('SELECT id FROM books')]
+    rows = []
+    for i in range(loans):
+        due = now - timedelta(days=i % 40 - 10)
+        returned = (due + timedelta(days=1)).isoformat() if i % 2 else None
+        rows.append((patron_id, book_ids[i % len(book_ids)], (due - timedelta(days=14)).isoformat(),
+                     due.isoformat(), returned))
+    conn.executemany('''
+        INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date)
+        VALUES (?, ?, ?, ?, ?)
+    ''', rows)
+    conn.commit()
+    conn.close()
+
+
+def timed(fn, patron_id: str, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(patron_id)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 100, 10_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE = os.path.join(tmp, 'bench.db')
+        database.init_database()
+        conn = database.get_db_connection()
+        conn.executemany(
+            'INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)',
+            ((f'Title {i}', f'Author {i}', f'{9780000000000 + i}', 1000, 1000) for i in range(1000)))
+        conn.commit()
+        conn.close()
+
+        print(f'{"loans":>8} {"per-loan":>12} {"aggregated":>12}')
+        for i, size in enumerate(args.sizes):
+            patron_id = f'{i + 1:06d}'
+            seed(patron_id, size)
+            before = timed(per_loan_report, patron_id, args.repeat)
+            after = timed(get_patron_status_report, patron_id, args.repeat)
+            print(f'{size:>8} {before * 1000:>10.1f}ms {after * 1000:>10.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
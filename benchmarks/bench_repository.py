@@ -0,0 +1,83 @@
+"""
+Benchmark: the SQLite repository vs the in-memory repository.
+
+Seeds N books into each backend through the Repository interface, then times
+book lookups by id, uncached title searches (a Query, bypassing the search
+cache) and borrow/return cycles.
+
+Usage:
+    python benchmarks/bench_repository.py [--books 5000] [--operations 500]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+import database
+from repository import InMemoryRepository, Query, SqliteRepository, contains
+
+WORDS = ['the', 'harry', 'potter', 'war', 'peace', 'great', 'gatsby', 'orwell', 'secret',
+         'garden', 'night', 'house', 'river', 'stone', 'winter', 'kingdom', 'shadow', 'light']
+
+
+def timed(fn, inputs):
+    samples = []
+    for value in inputs:
+        start = time.perf_counter()
+        fn(value)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95)]
+
+
+def seed(repository, books: int):
+    rng = random.Random(47)
+    repository.ensure_schema()
+    for i in range(books):
+        repository.insert_book(' '.join(rng.choice(WORDS).title() for _ in range(3)) + f' {i}',
+                               f'{rng.choice(WORDS).title()} Author{i % 500}', f'{9780000000000 + i}', 3, 3)
+    return [book['id'] for book in repository.conn_execute_read(Query('books', ('id',)))]
+
+
+def borrow_return(repository, book_id: int):
+    now = datetime.now()
+    repository.borrow_book_transaction('000001', book_id, now, now + timedelta(days=14))
+    repository.return_book_transaction('000001', book_id, now)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--books', type=int, default=5000)
+    parser.add_argument('--operations', type=int, default=500)
+    args = parser.parse_args()
+
+    rng = random.Random(327)
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE = os.path.join(tmp, 'bench.db')
+        print(f'{"operation":<14} {"backend":<8} {"median":>10} {"p95":>10}')
+        for repository in (SqliteRepository(), InMemoryRepository()):
+            start = time.perf_counter()
+            book_ids = seed(repository, args.books)
+            print(f'{"seed":<14} {repository.name:<8} {(time.perf_counter() - start) * 1000:>8.0f}ms')
+
+            picks = [rng.choice(book_ids) for _ in range(args.operations)]
+            terms = [rng.choice(WORDS) for _ in range(args.operations // 10)]
+            for label, fn, inputs in (
+                    ('get_book', repository.get_book_by_id, picks),
+                    ('search', lambda term: repository.conn_execute_read(
+                        Query('books', ('id', 'title'), (contains('title', term),), order_by=('title',))), terms),
+                    ('borrow+return', lambda book_id: borrow_return(repository, book_id), picks)):
+                median, p95 = timed(fn, inputs)
+                print(f'{label:<14} {repository.name:<8} {median * 1000:>8.3f}ms {p95 * 1000:>8.3f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark: peak memory of a full catalog listing, dict rows vs slotted records.
+
+Builds a throwaway database with N books, then lists the whole catalog in a
+fresh subprocess per mode and reports the peak RSS of that process.
+
+Usage:
+    python benchmarks/bench_row_memory.py [--rows 1000000]
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+import database
+
+
+def build_database(path: str, rows: int):
+    database.DATABASE = path
+    database.init_database()
+    conn = database.get_db_connection()
+    conn.executemany(
+        'INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)',
+        ((f'Title {i:07d}', f'Author {i % 5000}', f'{9780000000000 + i}', 3, 2) for i in range(rows))
+    )
+    conn.commit()
+    conn.close()
+
+
+def list_catalog(path: str, mode: str):
+    database.DATABASE = path
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+
+    if mode == 'dict':
+        conn = database.get_db_connection()
+        books = [dict(book) for book in conn.execute('SELECT * FROM books ORDER BY title').fetchall()]
+        conn.close()
+    else:
+        books = database.get_all_books()
+
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f'{mode:>7}: {len(books)} rows in {elapsed:.2f}s, '
+          f'peak RSS {peak / 1024:.1f} MiB (+{(peak - baseline) / 1024:.1f} MiB over startup)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--mode', choices=['dict', 'record'])
+    parser.add_argument('--database')
+    args = parser.parse_args()
+
+    if args.mode:
+        list_catalog(args.database, args.mode)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        build_database(path, args.rows)
+        for mode in ('dict', 'record'):
+            subprocess.run([sys.executable, __file__, '--mode', mode, '--database', path], check=True)
+
+
+if __name__ == '__main__':
+    main()
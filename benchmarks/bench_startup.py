@@ -0,0 +1,80 @@
+"""
+Benchmark: application startup cost.
+
+Reports the slowest imports from `python -X importtime -c "import app"` and the
+wall time from interpreter start to the first /catalog response, for a fresh
+database, an already initialized one, and an initialized one in production
+mode (no sample seeding).
+
+Usage:
+    python benchmarks/bench_startup.py [--top 10] [--repeat 5]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+FIRST_REQUEST = '''
+import time, sys
+start = time.perf_counter()
+import database
+database.DATABASE = sys.argv[1]
+from app import create_app
+app = create_app()
+assert app.test_client().get('/catalog').status_code == 200
+print(time.perf_counter() - start)
+'''
+
+
+def import_times(top: int):
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line.split('|'))
+        rows.append((int(cumulative_us), int(self_us.split(':')[-1]), name))
+    rows.sort(reverse=True)
+    print('Slowest imports (cumulative us / self us):')
+    for cumulative_us, self_us, name in rows[:top]:
+        print(f'  {cumulative_us:>9} {self_us:>9}  {name}')
+
+
+def first_request(path: str, env: dict) -> float:
+    result = subprocess.run([sys.executable, '-c', FIRST_REQUEST, path], cwd=ROOT,
+                            env={**os.environ, **env}, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    import_times(args.top)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        cold = []
+        for _ in range(args.repeat):
+            if os.path.exists(path):
+                os.remove(path)
+            cold.append(first_request(path, {}))
+        warm = [first_request(path, {}) for _ in range(args.repeat)]
+        production = [first_request(path, {'LIBRARY_ENV': 'production'}) for _ in range(args.repeat)]
+
+    print(f'Wall time to first request, median of {args.repeat}:')
+    print(f'  fresh database:           {statistics.median(cold) * 1000:7.1f} ms')
+    print(f'  initialized database:     {statistics.median(warm) * 1000:7.1f} ms')
+    print(f'  initialized, production:  {statistics.median(production) * 1000:7.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Benchmark: typeahead completion latency on a large prefix index.
+
+Builds a PrefixIndex over N synthetic titles and times random prefix lookups
+and incremental inserts.
+
+Usage:
+    python benchmarks/bench_suggest.py [--titles 1000000] [--queries 10000]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from services.suggest_index import PrefixIndex
+
+WORDS = ['the', 'harry', 'potter', 'war', 'peace', 'great', 'gatsby', 'orwell', 'secret',
+         'garden', 'night', 'house', 'river', 'stone', 'winter', 'kingdom', 'shadow', 'light']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--titles', type=int, default=1_000_000)
+    parser.add_argument('--queries', type=int, default=10_000)
+    args = parser.parse_args()
+
+    rng = random.Random(327)
+    titles = [' '.join(rng.choice(WORDS).title() for _ in range(3)) + f' {i}' for i in range(args.titles)]
+
+    start = time.perf_counter()
+    index = PrefixIndex(titles)
+    print(f'built index of {len(index)} titles in {time.perf_counter() - start:.2f}s')
+
+    prefixes = [rng.choice(titles)[:rng.randint(1, 12)] for _ in range(args.queries)]
+    latencies = []
+    for prefix in prefixes:
+        start = time.perf_counter()
+        index.complete(prefix)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    print(f'complete(): median {statistics.median(latencies) * 1e6:.1f} us, '
+          f'p99 {latencies[int(len(latencies) * 0.99)] * 1e6:.1f} us')
+
+    inserts = []
+    for i in range(1000):
+        start = time.perf_counter()
+        index.add(f'Inserted Title {i}')
+        inserts.append(time.perf_counter() - start)
+    print(f'add(): median {statistics.median(inserts) * 1e6:.1f} us')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+"""
+Load test: drive a running library server with realistic circulation traffic.
+
+Each virtual user is a patron with its own ID who loops over a weighted mix of
+catalog browsing, searches, suggestions, borrows, returns, late-fee lookups,
+status reports and fee payments. Latency percentiles and throughput are
+reported per endpoint; a borrow's POST is timed on its own and the catalog
+page it redirects to is reported as borrow_result.
+
+Start the server first (e.g. `python app.py`), then:
+    python benchmarks/loadtest.py --url http://127.0.0.1:5000 --users 20 --duration 30
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+import requests
+
+SEARCH_TERMS = ['the', 'great', 'kill', 'orwell', 'harper', '1984', 'gatsby', 'mock', 'war', 'lee']
+
+# Flashed by /borrow only when the loan was made
+BORROW_SUCCESS = 'Successfully borrowed'
+
+# (endpoint name, relative weight)
+TRAFFIC_MIX = [
+    ('catalog', 30),
+    ('search', 20),
+    ('api_search', 10),
+    ('suggest', 10),
+    ('borrow', 8),
+    ('return', 8),
+    ('late_fee', 6),
+    ('patron_status', 5),
+    ('pay_late_fee', 3),
+]
+
+
+def percentile(sorted_samples, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, max(0, int(round(fraction * len(sorted_samples))) - 1))
+    return sorted_samples[index]
+
+
+class Stats:
+    """Thread-safe per-endpoint latency and error collection."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, name: str, elapsed: float, ok: bool):
+        with self._lock:
+            self.latencies[name].append(elapsed)
+            if not ok:
+                self.errors[name] += 1
+
+    def summary(self, duration: float) -> dict:
+        result = {}
+        for name, samples in sorted(self.latencies.items()):
+            samples = sorted(samples)
+            result[name] = {
+                'requests': len(samples),
+                'errors': self.errors[name],
+                'rps': round(len(samples) / duration, 2),
+                'p50_ms': round(percentile(samples, 0.50) * 1000, 2),
+                'p95_ms': round(percentile(samples, 0.95) * 1000, 2),
+                'p99_ms': round(percentile(samples, 0.99) * 1000, 2),
+            }
+        return result
+
+
+class VirtualUser(threading.Thread):
+    """One patron issuing requests until the deadline."""
+
+    def __init__(self, base_url: str, patron_id: str, book_ids, stats: Stats, deadline: float,
+                 think_time: float, seed: int):
+        super().__init__(daemon=True)
+        self.base_url = base_url.rstrip('/')
+        self.patron_id = patron_id
+        self.book_ids = book_ids
+        self.stats = stats
+        self.deadline = deadline
+        self.think_time = think_time
+        self.rng = random.Random(seed)
+        self.session = requests.Session()
+        self.borrowed = []
+
+    def request(self, name: str, method: str, path: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, self.base_url + path, allow_redirects=False,
+                                            timeout=30, **kwargs)
+            ok = response.status_code < 500
+        except requests.RequestException:
+            response, ok = None, False
+        self.stats.record(name, time.perf_counter() - start, ok)
+        return response
+
+    def run(self):
+        names, weights = zip(*TRAFFIC_MIX)
+        while time.monotonic() < self.deadline:
+            getattr(self, 'do_' + self.rng.choices(names, weights)[0])()
+            if self.think_time:
+                time.sleep(self.rng.uniform(0, 2 * self.think_time))
+
+    def do_catalog(self):
+        self.request('catalog', 'GET', '/catalog')
+
+    def do_search(self):
+        self.request('search', 'GET', '/search', params={
+            'q': self.rng.choice(SEARCH_TERMS), 'type': self.rng.choice(['title', 'author'])})
+
+    def do_api_search(self):
+        self.request('api_search', 'GET', '/api/search', params={'q': self.rng.choice(SEARCH_TERMS)})
+
+    def do_suggest(self):
+        self.request('suggest', 'GET', '/api/suggest', params={'q': self.rng.choice(SEARCH_TERMS)[:2]})
+
+    def do_borrow(self):
+        # /borrow redirects whatever the outcome; the flashed message on the
+        # catalog page it lands on says whether the loan was made. The POST is
+        # timed alone and the page it redirects to is recorded as borrow_result
+        book_id = self.rng.choice(self.book_ids)
+        response = self.request('borrow', 'POST', '/borrow',
+                                data={'patron_id': self.patron_id, 'book_id': book_id})
+        if response is None or response.status_code != 302:
+            return
+        location = urlsplit(response.headers['Location'])
+        result = self.request('borrow_result', 'GET', location.path, params=location.query)
+        if result is not None and BORROW_SUCCESS in result.text:
+            self.borrowed.append(book_id)
+
+    def do_return(self):
+        if not self.borrowed:
+            return self.do_borrow()
+        book_id = self.borrowed.pop(self.rng.randrange(len(self.borrowed)))
+        self.request('return', 'POST', '/return', data={'patron_id': self.patron_id, 'book_id': book_id})
+
+    def do_late_fee(self):
+        self.request('late_fee', 'GET', f'/api/late_fee/{self.patron_id}/{self.rng.choice(self.book_ids)}')
+
+    def do_patron_status(self):
+        self.request('patron_status', 'GET', f'/api/patron/{self.patron_id}/status')
+
+    def do_pay_late_fee(self):
+        self.request('pay_late_fee', 'POST', f'/api/late_fee/{self.patron_id}/{self.rng.choice(self.book_ids)}/pay')
+
+
+def print_report(summary: dict, duration: float):
+    total = sum(row['requests'] for row in summary.values())
+    print(f'{"endpoint":<15}{"reqs":>8}{"errors":>8}{"req/s":>9}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}')
+    for name, row in summary.items():
+        print(f'{name:<15}{row["requests"]:>8}{row["errors"]:>8}{row["rps"]:>9.1f}'
+              f'{row["p50_ms"]:>10.1f}{row["p95_ms"]:>10.1f}{row["p99_ms"]:>10.1f}')
+    print(f'{"total":<15}{total:>8}{"":>8}{total / duration:>9.1f}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds')
+    parser.add_argument('--think-time', type=float, default=0.0, help='mean pause between requests (s)')
+    parser.add_argument('--books', type=int, default=3, help='borrow/return book ids 1..N')
+    parser.add_argument('--first-patron', type=int, default=500000)
+    parser.add_argument('--seed', type=int, default=327)
+    parser.add_argument('--json', help='also write the per-endpoint summary to this file')
+    args = parser.parse_args(argv)
+
+    stats = Stats()
+    book_ids = list(range(1, args.books + 1))
+    deadline = time.monotonic() + args.duration
+    users = [VirtualUser(args.url, f'{args.first_patron + i:06d}', book_ids, stats, deadline,
+                         args.think_time, args.seed + i) for i in range(args.users)]
+
+    start = time.monotonic()
+    for user in users:
+        user.start()
+    for user in users:
+        user.join()
+    elapsed = time.monotonic() - start
+
+    summary = stats.summary(elapsed)
+    print_report(summary, elapsed)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'duration': elapsed, 'users': args.users, 'endpoints': summary}, f, indent=2)
+    return 0 if not any(stats.errors.values()) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""
+Compression Module - Accept-Encoding negotiated response compression
+
+Compresses textual responses with brotli (when the brotli package is
+installed) or gzip, including streamed responses, which are compressed
+incrementally as chunks are produced.
+"""
+
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'text/html', 'text/css', 'text/plain', 'text/csv',
+    'application/javascript', 'application/x-ndjson',
+}
+
+
+def choose_encoding(accept_encodings) -> str:
+    """Pick the best supported encoding the client accepts, or '' for none."""
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return ''
+
+
+def _compressor(encoding: str):
+    """Get (compress, flush) callables for an incremental compressor."""
+    if encoding == 'br':
+        compressor = brotli.Compressor()
+        return compressor.process, compressor.finish
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+
+def _compress_stream(chunks, encoding: str):
+    compress, flush = _compressor(encoding)
+    for chunk in chunks:
+        data = compress(chunk)
+        if data:
+            yield data
+    yield flush()
+
+
+def compress_response(response, min_size: int):
+    """Compress a response in place if the client and content allow it."""
+    if (response.status_code < 200 or response.status_code in (204, 304)
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.accept_encodings)
+    if not encoding:
+        return response
+
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        body = response.get_data()
+        if len(body) < min_size:
+            return response
+        compress, flush = _compressor(encoding)
+        response.set_data(compress(body) + flush())
+
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_compression(app):
+    """Register response compression on the app (see COMPRESS_* config)."""
+    app.config.setdefault('COMPRESS_ENABLED', True)
+    app.config.setdefault('COMPRESS_MIN_SIZE', 500)
+
+    @app.after_request
+    def _compress(response):
+        if not app.config['COMPRESS_ENABLED']:
+            return response
+        return compress_response(response, app.config['COMPRESS_MIN_SIZE'])
@@ -3,13 +3,152 @@ Database module for Library Management System
 Handles all database operations and connections
 """
 
+import queue
 import sqlite3
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from isbn_utils import BloomFilter, normalize_isbn
 
 # Database configuration
 DATABASE = 'library.db'
 
+# Bump whenever init_database gains new DDL or migrations; ensure_schema uses it
+# (stored in PRAGMA user_version) to skip initialization on already current files.
+SCHEMA_VERSION = 9
+
+# Most loans a patron may have open at once
+MAX_BORROWED_BOOKS = 5
+
+# Outcomes of borrow_book_transaction
+BORROW_OK = 'ok'
+BORROW_BOOK_MISSING = 'missing'
+BORROW_UNAVAILABLE = 'unavailable'
+BORROW_LIMIT_REACHED = 'limit'
+BORROW_ERROR = 'error'
+
+# Outcomes of return_book_transaction
+RETURN_OK = 'ok'
+RETURN_NOT_BORROWED = 'not_borrowed'
+RETURN_ERROR = 'error'
+
+# Hold lifecycle: waiting in the queue -> ready (a returned copy is set aside
+# for the patron) -> fulfilled when they borrow it, or cancelled, or expired
+# when a ready copy is not picked up within HOLD_PICKUP_DAYS
+HOLD_WAITING = 'waiting'
+HOLD_READY = 'ready'
+HOLD_FULFILLED = 'fulfilled'
+HOLD_CANCELLED = 'cancelled'
+HOLD_EXPIRED = 'expired'
+HOLD_PICKUP_DAYS = 7
+# Spelled out as literals so the planner can use the partial hold indexes
+ACTIVE_HOLD_SQL = f"status IN ('{HOLD_WAITING}', '{HOLD_READY}')"
+
+# Outcomes of place_hold_transaction
+HOLD_PLACED = 'placed'
+HOLD_BOOK_MISSING = 'missing'
+HOLD_BOOK_AVAILABLE = 'available'
+HOLD_ALREADY_BORROWED = 'borrowed'
+HOLD_EXISTS = 'exists'
+HOLD_ERROR = 'error'
+
+# Copies are held by branches (the holdings table); books.total_copies and
+# books.available_copies are library-wide sums of a book's holdings, kept in
+# step by triggers. Books catalogued before branches existed belong to MAIN.
+MAIN_BRANCH_ID = 1
+
+# Closed loans are moved out of the hot borrow_records table into one archive
+# table per borrow year (borrow_records_YYYY) once they are this old.
+ARCHIVE_AFTER_DAYS = 90
+BORROW_RECORD_COLUMNS = 'id, patron_id, book_id, borrow_date, due_date, return_date, due_day, return_day, branch_id'
+
+# due_day/return_day mirror the ISO text columns as whole days since 1970-01-01
+EPOCH = date(1970, 1, 1)
+EPOCH_DAY_SQL = "CAST(julianday(date({column})) - 2440587.5 AS INTEGER)"
+
+def to_epoch_day(value: datetime) -> int:
+    """Convert a datetime to whole days since 1970-01-01."""
+    return (value.date() - EPOCH).days
+
+class RecordMapping:
+    """
+    Mapping-style access for slotted record types.
+
+    Lets records stand in for the dicts the helpers used to return, so
+    record['title'], 'title' in record, record.get() and dict(record) all work.
+    """
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in self.__slots__
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.__slots__ else default
+
+    def keys(self):
+        return self.__slots__
+
+@dataclass(slots=True)
+class Book(RecordMapping):
+    """A row of the books table."""
+    id: int
+    title: str
+    author: str
+    isbn: str
+    total_copies: int
+    available_copies: int
+
+    @classmethod
+    def from_row(cls, cursor, row):
+        """sqlite3 row factory for queries selecting BOOK_COLUMNS."""
+        return cls(*row)
+
+@dataclass(slots=True)
+class Loan(RecordMapping):
+    """A currently borrowed book as seen by a patron."""
+    book_id: int
+    title: str
+    author: str
+    borrow_date: datetime
+    due_date: datetime
+    is_overdue: bool
+
+    @classmethod
+    def from_row(cls, cursor, row):
+        """
+        sqlite3 row factory for open-loan queries selecting
+        book_id, title, author, borrow_date, due_date, is_overdue (see get_patron_borrowed_books).
+        """
+        book_id, title, author, borrow_date, due_date, is_overdue = row
+        return cls(book_id, title, author, datetime.fromisoformat(borrow_date),
+                   datetime.fromisoformat(due_date), bool(is_overdue))
+
+BOOK_COLUMNS = 'id, title, author, isbn, total_copies, available_copies'
+
+# Callbacks run after books rows are written. They receive the changed book id
+# (None when the whole table may have changed, e.g. schema init or sample data)
+# and whether the book was newly inserted.
+_book_change_listeners = []
+
+def register_book_change_listener(listener):
+    """Register a callback to run after a book is inserted or its availability changes."""
+    if listener not in _book_change_listeners:
+        _book_change_listeners.append(listener)
+
+def notify_book_changed(book_id: Optional[int], inserted: bool = False):
+    """Tell every registered listener that a book (or, for None, any book) changed."""
+    for listener in _book_change_listeners:
+        listener(book_id, inserted)
+
 def get_db_connection():
     """Get a database connection."""
     conn = sqlite3.connect(DATABASE)
@@ -31,9 +170,11 @@ def init_database():
             author TEXT NOT NULL,
             isbn TEXT UNIQUE NOT NULL,
             total_copies INTEGER NOT NULL,
-            available_copies INTEGER NOT NULL
+            available_copies INTEGER NOT NULL,
+            isbn_key TEXT
         )
     ''')
+    migrate_isbn_keys(conn)
     
     # Create borrow_records table
     conn.execute('''
@@ -44,12 +185,424 @@ def init_database():
             borrow_date TEXT NOT NULL,
             due_date TEXT NOT NULL,
             return_date TEXT,
+            due_day INTEGER,
+            return_day INTEGER,
+            branch_id INTEGER,
             FOREIGN KEY (book_id) REFERENCES books (id)
         )
     ''')
-    
+
+    migrate_epoch_days(conn, 'borrow_records')
+    migrate_branch_ids(conn, 'borrow_records')
+    for table in get_archive_tables(conn):
+        migrate_epoch_days(conn, table)
+        migrate_branch_ids(conn, table)
+
+    # Branches and the copies each one holds
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS branches (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            code TEXT UNIQUE NOT NULL,
+            name TEXT NOT NULL
+        )
+    ''')
+    conn.execute('INSERT OR IGNORE INTO branches (id, code, name) VALUES (?, ?, ?)',
+                 (MAIN_BRANCH_ID, 'MAIN', 'Main Library'))
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS holdings (
+            book_id INTEGER NOT NULL,
+            branch_id INTEGER NOT NULL,
+            total_copies INTEGER NOT NULL,
+            available_copies INTEGER NOT NULL,
+            PRIMARY KEY (book_id, branch_id),
+            FOREIGN KEY (book_id) REFERENCES books (id),
+            FOREIGN KEY (branch_id) REFERENCES branches (id)
+        ) WITHOUT ROWID
+    ''')
+    # A branch's shelf list; per-book lookups use the primary key
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_holdings_branch ON holdings (branch_id, book_id)')
+
+    # Roll every holdings change up into the books aggregates in the same
+    # transaction, so "available anywhere" stays a primary-key lookup on books
+    # instead of a SUM over holdings
+    for name, event, sign, row in (('insert', 'INSERT', '+', 'NEW'), ('delete', 'DELETE', '-', 'OLD')):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS holdings_aggregate_{name}
+            AFTER {event} ON holdings
+            BEGIN
+                UPDATE books
+                SET total_copies = total_copies {sign} {row}.total_copies,
+                    available_copies = available_copies {sign} {row}.available_copies
+                WHERE id = {row}.book_id;
+            END
+        ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS holdings_aggregate_update
+        AFTER UPDATE OF total_copies, available_copies ON holdings
+        BEGIN
+            UPDATE books
+            SET total_copies = total_copies + NEW.total_copies - OLD.total_copies,
+                available_copies = available_copies + NEW.available_copies - OLD.available_copies
+            WHERE id = NEW.book_id;
+        END
+    ''')
+    migrate_holdings(conn)
+
+    # Listing what is on the shelf anywhere only touches available books
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_books_available
+        ON books (id) WHERE available_copies > 0
+    ''')
+
+    # Keep the epoch-day columns in step with the ISO text on every write
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS borrow_records_epoch_days_insert
+        AFTER INSERT ON borrow_records
+        BEGIN
+            UPDATE borrow_records
+            SET due_day = {EPOCH_DAY_SQL.format(column='NEW.due_date')},
+                return_day = {EPOCH_DAY_SQL.format(column='NEW.return_date')}
+            WHERE id = NEW.id;
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS borrow_records_epoch_days_update
+        AFTER UPDATE OF due_date, return_date ON borrow_records
+        BEGIN
+            UPDATE borrow_records
+            SET due_day = {EPOCH_DAY_SQL.format(column='NEW.due_date')},
+                return_day = {EPOCH_DAY_SQL.format(column='NEW.return_date')}
+            WHERE id = NEW.id;
+        END
+    ''')
+
+    # "What is overdue" is a range scan over open loans by due day
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_open_due
+        ON borrow_records (due_day) WHERE return_date IS NULL
+    ''')
+
+    # Per-patron lookups. Open-loan checks seek (patron_id, NULL); history, ledger and
+    # export queries filter on patron_id alone, so the index is deliberately not partial
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_patron_open
+        ON borrow_records (patron_id, return_date)
+    ''')
+
+    # Late fees accrued by the background scheduler, one row per overdue loan
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS fee_ledger (
+            borrow_record_id INTEGER PRIMARY KEY,
+            patron_id TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            due_day INTEGER NOT NULL,
+            days_overdue INTEGER NOT NULL,
+            fee_amount REAL NOT NULL,
+            computed_day INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_fee_ledger_patron ON fee_ledger (patron_id)')
+
+    # Leases that elect a single worker to run each background job
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS scheduler_leases (
+            name TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            lease_until REAL NOT NULL,
+            last_run_day INTEGER
+        )
+    ''')
+
+    # Reservation queue; a book's waiting holds are served in id (FIFO) order
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS holds (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patron_id TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            ready_at TEXT,
+            branch_id INTEGER,
+            FOREIGN KEY (book_id) REFERENCES books (id)
+        )
+    ''')
+    # The branch a ready hold's copy is waiting at
+    migrate_branch_ids(conn, 'holds')
+    conn.execute(f'''
+        CREATE INDEX IF NOT EXISTS idx_holds_queue
+        ON holds (book_id, id) WHERE status = '{HOLD_WAITING}'
+    ''')
+    # Ready holds by pickup deadline, for expiring uncollected copies
+    conn.execute(f'''
+        CREATE INDEX IF NOT EXISTS idx_holds_ready
+        ON holds (ready_at) WHERE status = '{HOLD_READY}'
+    ''')
+    # At most one active hold per patron and book
+    conn.execute(f'''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_holds_active
+        ON holds (book_id, patron_id) WHERE {ACTIVE_HOLD_SQL}
+    ''')
+
+    # Catalog version, bumped whenever a book is added, removed or renamed, so
+    # derived copies of the catalog (see services/catalog_snapshot.py) can tell they are stale
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS catalog_meta (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('INSERT OR IGNORE INTO catalog_meta (id, version) VALUES (1, 0)')
+    for name, event in (('insert', 'INSERT'), ('delete', 'DELETE'),
+                        ('update', 'UPDATE OF title, author, isbn')):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS books_catalog_version_{name}
+            AFTER {event} ON books
+            BEGIN
+                UPDATE catalog_meta SET version = version + 1 WHERE id = 1;
+            END
+        ''')
+    migrate_unique_isbn_keys(conn)
+
+    # The books table may have been rebuilt since the last run
+    conn.execute('UPDATE catalog_meta SET version = version + 1 WHERE id = 1')
+
+    conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
     conn.commit()
     conn.close()
+    notify_book_changed(None)
+
+def get_catalog_version(conn=None) -> int:
+    """Get the catalog version counter maintained by the books triggers."""
+    own = conn is None
+    if own:
+        conn = get_db_connection()
+    row = conn.execute('SELECT version FROM catalog_meta WHERE id = 1').fetchone()
+    if own:
+        conn.close()
+    return row[0] if row else 0
+
+def ensure_schema() -> bool:
+    """
+    Initialize the database only if its schema marker is out of date.
+
+    Returns:
+        bool: True if init_database had to run
+    """
+    conn = get_db_connection()
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    conn.close()
+    if version == SCHEMA_VERSION:
+        return False
+    init_database()
+    return True
+
+def snapshot_database() -> sqlite3.Connection:
+    """
+    Copy the whole database into a private in-memory connection using the SQLite
+    online backup API; restore_database puts it back.
+    """
+    snapshot = sqlite3.connect(':memory:', check_same_thread=False)
+    conn = get_db_connection()
+    conn.backup(snapshot)
+    conn.close()
+    return snapshot
+
+def restore_database(snapshot: sqlite3.Connection):
+    """Overwrite the database with a snapshot_database copy, resetting anything cached from it."""
+    conn = get_db_connection()
+    snapshot.backup(conn)
+    conn.close()
+    notify_book_changed(None)
+
+def migrate_isbn_keys(conn):
+    """Add the normalized isbn_key column to books and backfill it."""
+    columns = [row['name'] for row in conn.execute('PRAGMA table_info(books)')]
+    if 'isbn_key' not in columns:
+        conn.execute('ALTER TABLE books ADD COLUMN isbn_key TEXT')
+
+    rows = conn.execute('SELECT id, isbn FROM books WHERE isbn_key IS NULL').fetchall()
+    conn.executemany('UPDATE books SET isbn_key = ? WHERE id = ?',
+                     [(normalize_isbn(row['isbn']), row['id']) for row in rows])
+
+def migrate_unique_isbn_keys(conn):
+    """
+    Merge books catalogued twice under differently written ISBNs into the
+    oldest one, then make isbn_key unique so the database refuses the next one.
+
+    The duplicate's copies are added to the survivor's holdings at the same
+    branches, and its loans, archived loans, fee ledger rows and holds move to
+    the survivor. A patron left with two active holds keeps the survivor's.
+    """
+    indexes = {row['name']: row['unique'] for row in conn.execute('PRAGMA index_list(books)')}
+    if indexes.get('idx_books_isbn_key') == 0:
+        conn.execute('DROP INDEX idx_books_isbn_key')
+
+    duplicates = conn.execute('''
+        SELECT b.id, (SELECT MIN(id) FROM books s WHERE s.isbn_key = b.isbn_key) AS survivor_id
+        FROM books b
+        WHERE b.id > (SELECT MIN(id) FROM books s WHERE s.isbn_key = b.isbn_key)
+        ORDER BY b.id
+    ''').fetchall()
+    now = datetime.now()
+    for duplicate_id, survivor_id in duplicates:
+        # The holdings triggers move the copy counts between the books aggregates
+        conn.execute('''
+            INSERT INTO holdings (book_id, branch_id, total_copies, available_copies)
+            SELECT ?, branch_id, total_copies, available_copies FROM holdings WHERE book_id = ?
+            ON CONFLICT (book_id, branch_id) DO UPDATE SET
+                total_copies = total_copies + excluded.total_copies,
+                available_copies = available_copies + excluded.available_copies
+        ''', (survivor_id, duplicate_id))
+        conn.execute('DELETE FROM holdings WHERE book_id = ?', (duplicate_id,))
+
+        for table in ['borrow_records', 'fee_ledger'] + get_archive_tables(conn):
+            conn.execute(f'UPDATE {table} SET book_id = ? WHERE book_id = ?', (survivor_id, duplicate_id))
+
+        clashing = conn.execute(f'''
+            SELECT h.id, h.status, h.branch_id FROM holds h
+            WHERE h.book_id = ? AND h.{ACTIVE_HOLD_SQL} AND EXISTS (
+                SELECT 1 FROM holds s WHERE s.book_id = ? AND s.patron_id = h.patron_id AND s.{ACTIVE_HOLD_SQL})
+        ''', (duplicate_id, survivor_id)).fetchall()
+        for hold in clashing:
+            conn.execute('UPDATE holds SET status = ? WHERE id = ?', (HOLD_CANCELLED, hold['id']))
+        conn.execute('UPDATE holds SET book_id = ? WHERE book_id = ?', (survivor_id, duplicate_id))
+        for hold in clashing:
+            if hold['status'] == HOLD_READY:
+                _release_copy(conn, survivor_id, hold['branch_id'] or MAIN_BRANCH_ID, now)
+
+        conn.execute('DELETE FROM books WHERE id = ?', (duplicate_id,))
+
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_books_isbn_key ON books (isbn_key)')
+
+def migrate_epoch_days(conn, table: str):
+    """Add the epoch-day columns to a borrow record table and backfill them."""
+    columns = [row['name'] for row in conn.execute(f'PRAGMA table_info({table})')]
+    for column in ('due_day', 'return_day'):
+        if column not in columns:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} INTEGER')
+
+    conn.execute(f'''
+        UPDATE {table}
+        SET due_day = {EPOCH_DAY_SQL.format(column='due_date')},
+            return_day = {EPOCH_DAY_SQL.format(column='return_date')}
+        WHERE due_day IS NULL OR (return_date IS NOT NULL AND return_day IS NULL)
+    ''')
+
+def migrate_branch_ids(conn, table: str):
+    """Add the branch_id column to a table created before branches existed."""
+    columns = [row['name'] for row in conn.execute(f'PRAGMA table_info({table})')]
+    if 'branch_id' not in columns:
+        conn.execute(f'ALTER TABLE {table} ADD COLUMN branch_id INTEGER')
+
+def migrate_holdings(conn):
+    """
+    Move books that have no holdings (catalogued before branches existed) to
+    the main branch, and drop holdings whose book no longer exists.
+    """
+    conn.execute('DELETE FROM holdings WHERE book_id NOT IN (SELECT id FROM books)')
+    rows = conn.execute('''
+        SELECT id, total_copies, available_copies FROM books b
+        WHERE NOT EXISTS (SELECT 1 FROM holdings h WHERE h.book_id = b.id)
+    ''').fetchall()
+    conn.executemany('''
+        INSERT INTO holdings (book_id, branch_id, total_copies, available_copies) VALUES (?, ?, ?, ?)
+    ''', [(row['id'], MAIN_BRANCH_ID, row['total_copies'], row['available_copies']) for row in rows])
+    # The insert trigger added the copies on top of the counts already there
+    conn.executemany('UPDATE books SET total_copies = ?, available_copies = ? WHERE id = ?',
+                     [(row['total_copies'], row['available_copies'], row['id']) for row in rows])
+
+def archive_table_name(year: int) -> str:
+    """Get the name of the archive partition holding loans borrowed in a year."""
+    return f'borrow_records_{year:04d}'
+
+def create_archive_table(conn, year: int) -> str:
+    """Create the archive partition for a year if it does not exist yet."""
+    table = archive_table_name(year)
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {table} (
+            id INTEGER PRIMARY KEY,
+            patron_id TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            borrow_date TEXT NOT NULL,
+            due_date TEXT NOT NULL,
+            return_date TEXT,
+            due_day INTEGER,
+            return_day INTEGER,
+            branch_id INTEGER
+        )
+    ''')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_patron ON {table} (patron_id)')
+    return table
+
+def get_archive_tables(conn) -> List[str]:
+    """Get the names of all existing archive partitions, oldest first."""
+    rows = conn.execute('''
+        SELECT name FROM sqlite_master
+        WHERE type = 'table' AND name GLOB 'borrow_records_[0-9][0-9][0-9][0-9]'
+        ORDER BY name
+    ''').fetchall()
+    return [row['name'] for row in rows]
+
+def borrow_records_source(conn, include_archived: bool = False) -> str:
+    """
+    Get a FROM-clause source for borrow records.
+
+    The hot table alone is returned unless archived history is requested, in
+    which case every archive partition is unioned in behind it.
+    """
+    if not include_archived:
+        return 'borrow_records'
+
+    parts = [f'SELECT {BORROW_RECORD_COLUMNS} FROM borrow_records']
+    for table in get_archive_tables(conn):
+        parts.append(f'SELECT {BORROW_RECORD_COLUMNS} FROM {table}')
+    return '(' + ' UNION ALL '.join(parts) + ')'
+
+def archive_closed_loans(before: Optional[datetime] = None) -> int:
+    """
+    Move returned loans out of the hot borrow_records table.
+
+    Loans returned before the cutoff (default: ARCHIVE_AFTER_DAYS ago) are copied
+    into the archive partition for their borrow year and deleted from the hot
+    table in a single transaction.
+
+    Returns:
+        int: number of loans archived
+    """
+    if before is None:
+        before = datetime.now() - timedelta(days=ARCHIVE_AFTER_DAYS)
+    cutoff = before.isoformat()
+
+    conn = get_db_connection()
+    try:
+        years = conn.execute('''
+            SELECT DISTINCT CAST(strftime('%Y', borrow_date) AS INTEGER) AS year
+            FROM borrow_records
+            WHERE return_date IS NOT NULL AND return_date < ?
+        ''', (cutoff,)).fetchall()
+
+        moved = 0
+        for row in years:
+            table = create_archive_table(conn, row['year'])
+            conn.execute(f'''
+                INSERT INTO {table} ({BORROW_RECORD_COLUMNS})
+                SELECT {BORROW_RECORD_COLUMNS} FROM borrow_records
+                WHERE return_date IS NOT NULL AND return_date < ?
+                AND CAST(strftime('%Y', borrow_date) AS INTEGER) = ?
+            ''', (cutoff, row['year']))
+            moved += conn.execute('''
+                DELETE FROM borrow_records
+                WHERE return_date IS NOT NULL AND return_date < ?
+                AND CAST(strftime('%Y', borrow_date) AS INTEGER) = ?
+            ''', (cutoff, row['year'])).rowcount
+
+        conn.commit()
+        return moved
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
 
 def add_sample_data():
     """Add sample data to the database if it's empty."""
@@ -57,82 +610,417 @@ def add_sample_data():
     book_count = conn.execute('SELECT COUNT(*) as count FROM books').fetchone()['count']
     
     if book_count == 0:
-        # Add sample books
+        conn.execute("INSERT OR IGNORE INTO branches (code, name) VALUES ('EAST', 'Eastside Branch')")
+        east_id = conn.execute("SELECT id FROM branches WHERE code = 'EAST'").fetchone()['id']
+
+        # Add sample books, with their copies per branch
         sample_books = [
-            ('The Great Gatsby', 'F. Scott Fitzgerald', '9780743273565', 3),
-            ('To Kill a Mockingbird', 'Harper Lee', '9780061120084', 2),
-            ('1984', 'George Orwell', '9780451524935', 1)
+            ('The Great Gatsby', 'F. Scott Fitzgerald', '9780743273565', {MAIN_BRANCH_ID: 2, east_id: 1}),
+            ('To Kill a Mockingbird', 'Harper Lee', '9780061120084', {MAIN_BRANCH_ID: 2}),
+            ('1984', 'George Orwell', '9780451524935', {MAIN_BRANCH_ID: 1})
         ]
         
         for title, author, isbn, copies in sample_books:
-            conn.execute('''
-                INSERT INTO books (title, author, isbn, total_copies, available_copies)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (title, author, isbn, copies, copies))
+            # The holdings triggers fill in the copy counts
+            book_id = conn.execute('''
+                INSERT INTO books (title, author, isbn, total_copies, available_copies, isbn_key)
+                VALUES (?, ?, ?, 0, 0, ?)
+            ''', (title, author, isbn, normalize_isbn(isbn))).lastrowid
+            conn.executemany('''
+                INSERT INTO holdings (book_id, branch_id, total_copies, available_copies) VALUES (?, ?, ?, ?)
+            ''', [(book_id, branch_id, count, count) for branch_id, count in copies.items()])
         
         # Make 1984 unavailable by adding a borrow record
         conn.execute('''
-            INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
-            VALUES (?, ?, ?, ?)
+            INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, branch_id)
+            VALUES (?, ?, ?, ?, ?)
         ''', ('123456', 3, 
               (datetime.now() - timedelta(days=5)).isoformat(),
-              (datetime.now() + timedelta(days=9)).isoformat()))
+              (datetime.now() + timedelta(days=9)).isoformat(), MAIN_BRANCH_ID))
         
         # Update available copies for 1984
-        conn.execute('UPDATE books SET available_copies = 0 WHERE id = 3')
+        conn.execute('UPDATE holdings SET available_copies = 0 WHERE book_id = 3 AND branch_id = ?',
+                     (MAIN_BRANCH_ID,))
         
         conn.commit()
+        notify_book_changed(None)
     
     conn.close()
 
 # Helper Functions for Database Operations
 
-def get_all_books(order_by: str = "title") -> List[Dict]:
+def get_all_books(order_by: str = "title") -> List[Book]:
     """Get all books from the database."""
     conn = get_db_connection()
-    books = conn.execute(f'SELECT * FROM books ORDER BY {order_by}').fetchall()
+    cursor = conn.cursor()
+    cursor.row_factory = Book.from_row
+    books = cursor.execute(f'SELECT {BOOK_COLUMNS} FROM books ORDER BY {order_by}').fetchall()
     conn.close()
-    return [dict(book) for book in books]
+    return books
 
-def get_book_by_id(book_id: int) -> Optional[Dict]:
+def get_book_by_id(book_id: int) -> Optional[Book]:
     """Get a specific book by ID."""
     conn = get_db_connection()
-    book = conn.execute('SELECT * FROM books WHERE id = ?', (book_id,)).fetchone()
+    cursor = conn.cursor()
+    cursor.row_factory = Book.from_row
+    book = cursor.execute(f'SELECT {BOOK_COLUMNS} FROM books WHERE id = ?', (book_id,)).fetchone()
     conn.close()
-    return dict(book) if book else None
+    return book
+
+def get_book_by_isbn(isbn: str) -> Optional[Book]:
+    """Get a specific book by ISBN, in any hyphenation or ISBN-10/13 form."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.row_factory = Book.from_row
+    book = cursor.execute(f'''
+        SELECT {BOOK_COLUMNS} FROM books WHERE isbn_key = ? OR isbn = ?
+    ''', (normalize_isbn(isbn), isbn)).fetchone()
+    conn.close()
+    return book
+
+def get_branches() -> List[Dict]:
+    """Get every branch, by id."""
+    return conn_execute_read('SELECT id, code, name FROM branches ORDER BY id')
+
+def get_branch(branch_id: int) -> Optional[Dict]:
+    """Get a specific branch by ID."""
+    rows = conn_execute_read('SELECT id, code, name FROM branches WHERE id = ?', (branch_id,))
+    return rows[0] if rows else None
 
-def get_book_by_isbn(isbn: str) -> Optional[Dict]:
-    """Get a specific book by ISBN."""
+def insert_branch(code: str, name: str) -> Optional[int]:
+    """Add a branch, returning its id (None if the code is taken)."""
     conn = get_db_connection()
-    book = conn.execute('SELECT * FROM books WHERE isbn = ?', (isbn,)).fetchone()
+    try:
+        branch_id = conn.execute('INSERT INTO branches (code, name) VALUES (?, ?)', (code, name)).lastrowid
+        conn.commit()
+        return branch_id
+    except sqlite3.IntegrityError:
+        return None
+    finally:
+        conn.close()
+
+def get_book_holdings(book_id: int) -> List[Dict]:
+    """Get a book's copies at each branch that holds it, by branch id."""
+    return conn_execute_read('''
+        SELECT h.branch_id, br.code, br.name, h.total_copies, h.available_copies
+        FROM holdings h
+        JOIN branches br ON br.id = h.branch_id
+        WHERE h.book_id = ?
+        ORDER BY h.branch_id
+    ''', (book_id,))
+
+def get_branch_books(branch_id: int, order_by: str = "title") -> List[Book]:
+    """Get the books a branch holds, with that branch's copy counts."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.row_factory = Book.from_row
+    books = cursor.execute(f'''
+        SELECT b.id, b.title, b.author, b.isbn, h.total_copies, h.available_copies
+        FROM holdings h
+        JOIN books b ON b.id = h.book_id
+        WHERE h.branch_id = ?
+        ORDER BY b.{order_by}
+    ''', (branch_id,)).fetchall()
     conn.close()
-    return dict(book) if book else None
+    return books
+
+def add_branch_copies(book_id: int, branch_id: int, copies: int) -> bool:
+    """
+    Add copies of a book to a branch's shelves, or withdraw copies with a
+    negative count (only copies on the shelf can be withdrawn).
 
-def get_patron_borrowed_books(patron_id: str) -> List[Dict]:
+    Returns:
+        bool: False if the book or branch does not exist, or the branch does
+            not have enough copies on the shelf to withdraw
+    """
+    conn = get_db_connection()
+    conn.isolation_level = None
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        holding = conn.execute('''
+            SELECT available_copies FROM holdings WHERE book_id = ? AND branch_id = ?
+        ''', (book_id, branch_id)).fetchone()
+        if holding:
+            ok = holding['available_copies'] + copies >= 0
+            if ok:
+                conn.execute('''
+                    UPDATE holdings
+                    SET total_copies = total_copies + ?, available_copies = available_copies + ?
+                    WHERE book_id = ? AND branch_id = ?
+                ''', (copies, copies, book_id, branch_id))
+        else:
+            ok = copies > 0 and conn.execute('''
+                SELECT 1 FROM books, branches WHERE books.id = ? AND branches.id = ?
+            ''', (book_id, branch_id)).fetchone() is not None
+            if ok:
+                conn.execute('''
+                    INSERT INTO holdings (book_id, branch_id, total_copies, available_copies)
+                    VALUES (?, ?, ?, ?)
+                ''', (book_id, branch_id, copies, copies))
+        conn.execute('COMMIT' if ok else 'ROLLBACK')
+    except sqlite3.Error:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        ok = False
+    finally:
+        conn.close()
+
+    if ok:
+        notify_book_changed(book_id)
+    return ok
+
+# Bloom filter of every isbn_key in the catalog, loaded on first use
+_isbn_filter: Optional[BloomFilter] = None
+
+def isbn_may_exist(isbn: str) -> bool:
+    """
+    Check whether an ISBN might already be in the catalog without querying it.
+
+    False means the ISBN is definitely new; True means it probably exists and
+    get_book_by_isbn should confirm. This is only a fast path: the unique
+    isbn_key index is what stops two workers adding the same book at once.
+    """
+    global _isbn_filter
+    if _isbn_filter is None or _isbn_filter.count > _isbn_filter.capacity:
+        conn = get_db_connection()
+        keys = [row[0] for row in conn.execute('SELECT isbn_key FROM books WHERE isbn_key IS NOT NULL')]
+        conn.close()
+        isbn_filter = BloomFilter(max(1024, 2 * len(keys)))
+        for key in keys:
+            isbn_filter.add(key)
+        _isbn_filter = isbn_filter
+    return _isbn_filter.might_contain(normalize_isbn(isbn))
+
+def _reset_isbn_filter(book_id: Optional[int], inserted: bool = False):
+    global _isbn_filter
+    if book_id is None:
+        _isbn_filter = None
+
+register_book_change_listener(_reset_isbn_filter)
+
+def get_patron_borrowed_books(patron_id: str) -> List[Loan]:
     """Get currently borrowed books for a patron."""
     conn = get_db_connection()
-    records = conn.execute('''
-        SELECT br.*, b.title, b.author 
+    cursor = conn.cursor()
+    cursor.row_factory = Loan.from_row
+    borrowed_books = cursor.execute('''
+        SELECT br.book_id, b.title, b.author, br.borrow_date, br.due_date,
+               br.due_day < ? AS is_overdue
         FROM borrow_records br 
         JOIN books b ON br.book_id = b.id 
         WHERE br.patron_id = ? AND br.return_date IS NULL
         ORDER BY br.borrow_date
-    ''', (patron_id,)).fetchall()
+    ''', (to_epoch_day(datetime.now()), patron_id)).fetchall()
     conn.close()
     
-    borrowed_books = []
-    for record in records:
-        borrowed_books.append({
-            'book_id': record['book_id'],
-            'title': record['title'],
-            'author': record['author'],
-            'borrow_date': datetime.fromisoformat(record['borrow_date']),
-            'due_date': datetime.fromisoformat(record['due_date']),
-            'is_overdue': datetime.now() > datetime.fromisoformat(record['due_date'])
-        })
-    
     return borrowed_books
 
+def get_patron_borrow_history(patron_id: str, include_archived: bool = True) -> List[Dict]:
+    """Get every loan for a patron, newest first, optionally including archived loans."""
+    conn = get_db_connection()
+    source = borrow_records_source(conn, include_archived)
+    records = conn.execute(f'''
+        SELECT b.title, b.author, br.borrow_date, br.due_date, br.return_date
+        FROM {source} br
+        JOIN books b ON br.book_id = b.id
+        WHERE br.patron_id = ?
+        ORDER BY br.borrow_date DESC
+    ''', (patron_id,)).fetchall()
+    conn.close()
+    return [dict(record) for record in records]
+
+def get_patron_report(patron_id: str, include_archived: bool = True) -> Dict:
+    """
+    Gather everything a patron status report needs in one query.
+
+    A single pass over the patron's loans (archives included if requested)
+    computes each open loan's late fee in SQL, while window aggregates carry
+    the open-loan count and fee total on every row.
+
+    Returns:
+        Dict: {'current': List[Loan] (oldest first), 'history': List[Dict] (newest first),
+               'count': int, 'total_late_fees': float}
+    """
+    today = to_epoch_day(datetime.now())
+    conn = get_db_connection()
+    source = borrow_records_source(conn, include_archived)
+    rows = conn.execute(f'''
+        WITH loans AS (
+            SELECT br.book_id, b.title, b.author, br.borrow_date, br.due_date, br.return_date,
+                   CASE WHEN br.return_date IS NULL AND br.due_day < :today
+                        THEN {late_fee_sql(':today - br.due_day')} ELSE 0 END AS fee
+            FROM {source} br
+            JOIN books b ON br.book_id = b.id
+            WHERE br.patron_id = :patron_id
+        )
+        SELECT loans.*,
+               SUM(return_date IS NULL) OVER () AS open_count,
+               SUM(fee) OVER () AS fee_total
+        FROM loans
+        ORDER BY borrow_date DESC
+    ''', {'today': today, 'patron_id': patron_id}).fetchall()
+    conn.close()
+
+    current = []
+    history = []
+    for row in rows:
+        history.append({'title': row['title'], 'author': row['author'], 'borrow_date': row['borrow_date'],
+                        'due_date': row['due_date'], 'return_date': row['return_date']})
+        if row['return_date'] is None:
+            current.append(Loan(row['book_id'], row['title'], row['author'],
+                                datetime.fromisoformat(row['borrow_date']),
+                                datetime.fromisoformat(row['due_date']), row['fee'] > 0))
+    current.reverse()
+
+    return {
+        'current': current,
+        'history': history,
+        'count': rows[0]['open_count'] if rows else 0,
+        'total_late_fees': round(rows[0]['fee_total'], 2) if rows else 0.0,
+    }
+
+def get_overdue_loans(as_of: Optional[datetime] = None, limit: Optional[int] = None) -> List[Dict]:
+    """Get open loans whose due day has passed, most overdue first."""
+    today = to_epoch_day(as_of or datetime.now())
+    conn = get_db_connection()
+    records = conn.execute('''
+        SELECT br.id, br.patron_id, br.book_id, b.title, b.author,
+               br.borrow_date, br.due_date, ? - br.due_day AS days_overdue
+        FROM borrow_records br
+        JOIN books b ON br.book_id = b.id
+        WHERE br.return_date IS NULL AND br.due_day < ?
+        ORDER BY br.due_day, br.id
+        LIMIT ?
+    ''', (today, today, -1 if limit is None else limit)).fetchall()
+    conn.close()
+    return [dict(record) for record in records]
+
+def late_fee_sql(days: str) -> str:
+    """
+    SQL expression for the late fee owed for a number of days overdue.
+
+    Mirrors calculate_late_fee_for_book: $0.50/day for the first 7 days,
+    $1.00/day after that, capped at $15.00.
+    """
+    days = f'({days})'
+    return f'''MIN(15.0, CASE WHEN {days} <= 7 THEN {days} * 0.5
+                            ELSE 3.5 + ({days} - 7) * 1.0 END)'''
+
+def acquire_scheduler_lease(name: str, owner: str, lease_seconds: float) -> bool:
+    """
+    Take or renew the lease for a background job.
+
+    Succeeds if nobody holds the lease, it has expired, or owner already holds
+    it, so exactly one worker across processes runs the job at a time.
+    """
+    now = time.time()
+    conn = get_db_connection()
+    try:
+        acquired = conn.execute('''
+            INSERT INTO scheduler_leases (name, owner, lease_until) VALUES (?, ?, ?)
+            ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, lease_until = excluded.lease_until
+            WHERE scheduler_leases.owner = excluded.owner OR scheduler_leases.lease_until < ?
+        ''', (name, owner, now + lease_seconds, now)).rowcount == 1
+        conn.commit()
+        return acquired
+    finally:
+        conn.close()
+
+def release_scheduler_lease(name: str, owner: str):
+    """Give up a lease so another worker can take over immediately."""
+    conn = get_db_connection()
+    conn.execute('UPDATE scheduler_leases SET lease_until = 0 WHERE name = ? AND owner = ?', (name, owner))
+    conn.commit()
+    conn.close()
+
+def accrue_late_fees(as_of: Optional[datetime] = None) -> int:
+    """
+    Bring the fee_ledger up to date for one day.
+
+    Only loans that need it are scanned: open loans past their due day whose
+    ledger row was not yet computed today (via the open-loan due-day index),
+    and loans returned late since the previous run, whose fee is then final.
+
+    Returns:
+        int: number of ledger rows written
+    """
+    today = to_epoch_day(as_of or datetime.now())
+    conn = get_db_connection()
+    try:
+        last_run = conn.execute('''
+            SELECT last_run_day FROM scheduler_leases WHERE name = 'fee_accrual'
+        ''').fetchone()
+        since_day = last_run['last_run_day'] if last_run and last_run['last_run_day'] is not None else 0
+
+        written = conn.execute(f'''
+            INSERT INTO fee_ledger (borrow_record_id, patron_id, book_id, due_day,
+                                    days_overdue, fee_amount, computed_day)
+            SELECT id, patron_id, book_id, due_day, days, {late_fee_sql('days')}, ?
+            FROM (
+                SELECT br.id, br.patron_id, br.book_id, br.due_day, ? - br.due_day AS days
+                FROM borrow_records br
+                LEFT JOIN fee_ledger fl ON fl.borrow_record_id = br.id
+                WHERE br.return_date IS NULL AND br.due_day < ?
+                AND (fl.computed_day IS NULL OR fl.computed_day < ?)
+                UNION ALL
+                SELECT br.id, br.patron_id, br.book_id, br.due_day, br.return_day - br.due_day
+                FROM borrow_records br
+                WHERE br.return_day >= ? AND br.return_day > br.due_day
+            ) WHERE true
+            ON CONFLICT (borrow_record_id) DO UPDATE SET
+                patron_id = excluded.patron_id, book_id = excluded.book_id,
+                due_day = excluded.due_day, days_overdue = excluded.days_overdue,
+                fee_amount = excluded.fee_amount, computed_day = excluded.computed_day
+        ''', (today, today, today, today, since_day)).rowcount
+
+        conn.execute('''
+            INSERT INTO scheduler_leases (name, owner, lease_until, last_run_day)
+            VALUES ('fee_accrual', '', 0, ?)
+            ON CONFLICT (name) DO UPDATE SET last_run_day = excluded.last_run_day
+        ''', (today,))
+        conn.commit()
+        return written
+    finally:
+        conn.close()
+
+def _fees_current(conn, today: int) -> bool:
+    row = conn.execute("SELECT last_run_day FROM scheduler_leases WHERE name = 'fee_accrual'").fetchone()
+    return bool(row) and row['last_run_day'] == today
+
+def get_ledger_late_fee(patron_id: str, book_id: int) -> Optional[Dict]:
+    """
+    Get the precomputed late fee for a patron's latest loan of a book.
+
+    Returns None unless the fee ledger is current for today, in which case the
+    caller can skip calculate_late_fee_for_book.
+    """
+    today = to_epoch_day(datetime.now())
+    conn = get_db_connection()
+    try:
+        if not _fees_current(conn, today):
+            return None
+        record = conn.execute('''
+            SELECT br.due_day, br.return_day, fl.days_overdue, fl.fee_amount
+            FROM borrow_records br
+            LEFT JOIN fee_ledger fl ON fl.borrow_record_id = br.id
+                AND fl.patron_id = br.patron_id AND fl.book_id = br.book_id AND fl.due_day = br.due_day
+            WHERE br.patron_id = ? AND br.book_id = ?
+            ORDER BY br.id DESC LIMIT 1
+        ''', (patron_id, book_id)).fetchone()
+    finally:
+        conn.close()
+
+    if not record:
+        return None
+    if record['fee_amount'] is None:
+        # No ledger row is only trustworthy for loans that were never late
+        end_day = today if record['return_day'] is None else record['return_day']
+        if record['due_day'] is None or end_day > record['due_day']:
+            return None
+        return {'fee_amount': 0.00, 'days_overdue': 0, 'status': 'On time'}
+    return {'fee_amount': round(record['fee_amount'], 2), 'days_overdue': record['days_overdue'],
+            'status': 'Overdue'}
+
 def get_patron_borrow_count(patron_id: str) -> int:
     """Get the number of books currently borrowed by a patron."""
     conn = get_db_connection()
@@ -143,16 +1031,25 @@ def get_patron_borrow_count(patron_id: str) -> int:
     conn.close()
     return count
 
-def insert_book(title: str, author: str, isbn: str, total_copies: int, available_copies: int) -> bool:
-    """Insert a new book into the database."""
+def insert_book(title: str, author: str, isbn: str, total_copies: int, available_copies: int,
+                branch_id: int = MAIN_BRANCH_ID) -> bool:
+    """Insert a new book into the database, with its copies held by one branch."""
+    isbn_key = normalize_isbn(isbn)
     conn = get_db_connection()
     try:
+        # The holdings insert trigger fills in the book's copy counts
+        cursor = conn.execute('''
+            INSERT INTO books (title, author, isbn, total_copies, available_copies, isbn_key)
+            VALUES (?, ?, ?, 0, 0, ?)
+        ''', (title, author, isbn, isbn_key))
         conn.execute('''
-            INSERT INTO books (title, author, isbn, total_copies, available_copies)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (title, author, isbn, total_copies, available_copies))
+            INSERT INTO holdings (book_id, branch_id, total_copies, available_copies) VALUES (?, ?, ?, ?)
+        ''', (cursor.lastrowid, branch_id, total_copies, available_copies))
         conn.commit()
         conn.close()
+        if _isbn_filter is not None:
+            _isbn_filter.add(isbn_key)
+        notify_book_changed(cursor.lastrowid, inserted=True)
         return True
     except Exception as e:
         conn.close()
@@ -160,51 +1057,516 @@ def insert_book(title: str, author: str, isbn: str, total_copies: int, available
 
 def insert_borrow_record(patron_id: str, book_id: int, borrow_date: datetime, due_date: datetime) -> bool:
     """Insert a new borrow record into the database."""
-    conn = get_db_connection()
     try:
-        conn.execute('''
+        execute_write('''
             INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
             VALUES (?, ?, ?, ?)
         ''', (patron_id, book_id, borrow_date.isoformat(), due_date.isoformat()))
-        conn.commit()
-        conn.close()
         return True
     except Exception as e:
-        conn.close()
         return False
 
-def update_book_availability(book_id: int, change: int) -> bool:
-    """Update the available copies of a book by a given amount (+1 for return, -1 for borrow)."""
-    conn = get_db_connection()
+def borrow_book_transaction(patron_id: str, book_id: int, borrow_date: datetime, due_date: datetime,
+                            max_borrowed: int = MAX_BORROWED_BOOKS, branch_id: Optional[int] = None) -> str:
+    """
+    Check a book out to a patron inside a single write transaction.
+
+    The availability and borrowing-limit checks, the borrow record insert and the
+    availability decrement all run under BEGIN IMMEDIATE, so concurrent requests
+    for the same patron or book are serialized by SQLite's write lock and cannot
+    both pass the checks. A patron whose hold on the book is ready takes the copy
+    set aside for them instead of one from the shelf.
+
+    The copy comes from branch_id's shelf, or when no branch is given from the
+    branch with the most copies on the shelf; the loan records which branch lent it.
+
+    Ready holds on the book that were not picked up in time are expired first,
+    so an uncollected copy goes to the next hold or back on the shelf.
+
+    Runs through run_write_transaction, so it shares the group commit writer's
+    batches when that is enabled.
+
+    Returns:
+        str: one of BORROW_OK, BORROW_BOOK_MISSING, BORROW_UNAVAILABLE,
+            BORROW_LIMIT_REACHED or BORROW_ERROR
+    """
     try:
+        outcome, expired = run_write_transaction(_borrow_book, patron_id, book_id, borrow_date, due_date,
+                                                 max_borrowed, branch_id)
+    except sqlite3.Error:
+        return BORROW_ERROR
+
+    if outcome == BORROW_OK or expired:
+        notify_book_changed(book_id)
+    return outcome
+
+def _borrow_book(conn, patron_id: str, book_id: int, borrow_date: datetime, due_date: datetime,
+                 max_borrowed: int, branch_id: Optional[int]) -> Tuple[str, List[Tuple[int, Optional[str]]]]:
+    """The body of borrow_book_transaction; only writes when the borrow succeeds or holds expire."""
+    # Expired holds stay expired even when the borrow itself is refused
+    expired = _expire_ready_holds(conn, borrow_date, book_id)
+
+    book = conn.execute('SELECT available_copies FROM books WHERE id = ?', (book_id,)).fetchone()
+    hold = conn.execute(f'''
+        SELECT id, branch_id FROM holds
+        WHERE book_id = ? AND patron_id = ? AND {ACTIVE_HOLD_SQL} AND status = '{HOLD_READY}'
+    ''', (book_id, patron_id)).fetchone()
+    lending_branch = None
+    if hold:
+        lending_branch = hold['branch_id']
+    elif book and book['available_copies'] > 0:
+        # The books aggregate rules out most unavailable books before touching holdings
+        if branch_id is None:
+            shelf = conn.execute('''
+                SELECT branch_id FROM holdings WHERE book_id = ? AND available_copies > 0
+                ORDER BY available_copies DESC, branch_id LIMIT 1
+            ''', (book_id,)).fetchone()
+        else:
+            shelf = conn.execute('''
+                SELECT branch_id FROM holdings WHERE book_id = ? AND branch_id = ? AND available_copies > 0
+            ''', (book_id, branch_id)).fetchone()
+        lending_branch = shelf['branch_id'] if shelf else None
+
+    if not book:
+        outcome = BORROW_BOOK_MISSING
+    elif not hold and lending_branch is None:
+        outcome = BORROW_UNAVAILABLE
+    elif conn.execute('''
+        SELECT COUNT(*) FROM borrow_records WHERE patron_id = ? AND return_date IS NULL
+    ''', (patron_id,)).fetchone()[0] >= max_borrowed:
+        outcome = BORROW_LIMIT_REACHED
+    else:
         conn.execute('''
-            UPDATE books SET available_copies = available_copies + ? WHERE id = ?
-        ''', (change, book_id))
-        conn.commit()
+            INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, branch_id)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (patron_id, book_id, borrow_date.isoformat(), due_date.isoformat(), lending_branch))
+        if hold:
+            conn.execute('UPDATE holds SET status = ? WHERE id = ?', (HOLD_FULFILLED, hold['id']))
+        else:
+            # The holdings update trigger takes the copy off the books aggregate too
+            conn.execute('''
+                UPDATE holdings SET available_copies = available_copies - 1
+                WHERE book_id = ? AND branch_id = ?
+            ''', (book_id, lending_branch))
+        outcome = BORROW_OK
+    return outcome, expired
+
+def _release_copy(conn, book_id: int, branch_id: int, now: datetime) -> Optional[str]:
+    """
+    Hand a freed copy at a branch to the next waiting hold, or put it back on
+    that branch's shelf. Runs inside the caller's write transaction.
+
+    Returns:
+        Optional[str]: the patron whose hold became ready, if any
+    """
+    hold = conn.execute(f'''
+        SELECT id, patron_id FROM holds WHERE book_id = ? AND status = '{HOLD_WAITING}' ORDER BY id LIMIT 1
+    ''', (book_id,)).fetchone()
+    if hold:
+        conn.execute('UPDATE holds SET status = ?, ready_at = ?, branch_id = ? WHERE id = ?',
+                     (HOLD_READY, now.isoformat(), branch_id, hold['id']))
+        return hold['patron_id']
+    conn.execute('''
+        UPDATE holdings SET available_copies = available_copies + 1 WHERE book_id = ? AND branch_id = ?
+    ''', (book_id, branch_id))
+    return None
+
+def _expire_ready_holds(conn, now: datetime, book_id: Optional[int] = None) -> List[Tuple[int, Optional[str]]]:
+    """
+    Expire ready holds not picked up within HOLD_PICKUP_DAYS, passing each copy
+    on like a cancellation would. Runs inside the caller's write transaction.
+
+    Returns:
+        list: (book_id, patron_id whose hold became ready or None) per expired hold
+    """
+    cutoff = (now - timedelta(days=HOLD_PICKUP_DAYS)).isoformat()
+    query = f"SELECT id, book_id, branch_id FROM holds WHERE status = '{HOLD_READY}' AND ready_at <= ?"
+    params = (cutoff,)
+    if book_id is not None:
+        query += ' AND book_id = ?'
+        params += (book_id,)
+    released = []
+    for hold in conn.execute(query + ' ORDER BY ready_at', params).fetchall():
+        conn.execute('UPDATE holds SET status = ? WHERE id = ?', (HOLD_EXPIRED, hold['id']))
+        released.append((hold['book_id'],
+                         _release_copy(conn, hold['book_id'], hold['branch_id'] or MAIN_BRANCH_ID, now)))
+    return released
+
+def expire_ready_holds(now: Optional[datetime] = None) -> List[Tuple[int, Optional[str]]]:
+    """
+    Expire every ready hold past its pickup window, in one write transaction.
+
+    The borrow and place-hold transactions already expire a book's stale holds
+    before they look at it; this sweep (run by the fee scheduler and `flask expire-holds`) also frees
+    copies nobody has asked about since.
+
+    Returns:
+        list: (book_id, patron_id whose hold became ready or None) per expired hold
+    """
+    conn = get_db_connection()
+    conn.isolation_level = None
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        released = _expire_ready_holds(conn, now or datetime.now())
+        conn.execute('COMMIT')
+    except sqlite3.Error:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        return []
+    finally:
         conn.close()
-        return True
-    except Exception as e:
+
+    for book_id in {book_id for book_id, _ in released}:
+        notify_book_changed(book_id)
+    return released
+
+def return_book_transaction(patron_id: str, book_id: int, return_date: datetime,
+                            branch_id: Optional[int] = None) -> Tuple[str, Optional[str]]:
+    """
+    Close a patron's open loan and release the copy in one write transaction.
+
+    The copy goes to the oldest waiting hold on the book if there is one (it is
+    set aside rather than put back on the shelf), otherwise availability goes up.
+
+    A copy returned to a branch other than the one that lent it stays there:
+    the lending branch's holding shrinks and branch_id's grows by one copy.
+
+    Returns:
+        tuple: (RETURN_OK, RETURN_NOT_BORROWED or RETURN_ERROR,
+                patron_id whose hold became ready or None)
+    """
+    try:
+        outcome, ready_patron = run_write_transaction(_return_book, patron_id, book_id, return_date, branch_id)
+    except sqlite3.Error:
+        return RETURN_ERROR, None
+
+    if outcome == RETURN_OK:
+        notify_book_changed(book_id)
+    return outcome, ready_patron
+
+def _return_book(conn, patron_id: str, book_id: int, return_date: datetime,
+                 branch_id: Optional[int]) -> Tuple[str, Optional[str]]:
+    """The body of return_book_transaction; only writes when a loan is closed."""
+    loan = conn.execute('''
+        SELECT id, branch_id FROM borrow_records
+        WHERE patron_id = ? AND book_id = ? AND return_date IS NULL
+        ORDER BY id LIMIT 1
+    ''', (patron_id, book_id)).fetchone()
+    if not loan:
+        return RETURN_NOT_BORROWED, None
+
+    conn.execute('UPDATE borrow_records SET return_date = ? WHERE id = ?',
+                 (return_date.isoformat(), loan['id']))
+    # Loans from before branches existed were lent by the main branch
+    lending_branch = loan['branch_id'] or MAIN_BRANCH_ID
+    receiving_branch = branch_id or lending_branch
+    if receiving_branch != lending_branch:
+        conn.execute('''
+            UPDATE holdings SET total_copies = total_copies - 1 WHERE book_id = ? AND branch_id = ?
+        ''', (book_id, lending_branch))
+        conn.execute('''
+            INSERT INTO holdings (book_id, branch_id, total_copies, available_copies) VALUES (?, ?, 1, 0)
+            ON CONFLICT (book_id, branch_id) DO UPDATE SET total_copies = total_copies + 1
+        ''', (book_id, receiving_branch))
+    return RETURN_OK, _release_copy(conn, book_id, receiving_branch, return_date)
+
+def place_hold_transaction(patron_id: str, book_id: int, now: Optional[datetime] = None) -> str:
+    """
+    Queue a hold on a book that has no copies on the shelf (after expiring its
+    uncollected ready holds, which may put one back).
+
+    Returns:
+        str: one of HOLD_PLACED, HOLD_BOOK_MISSING, HOLD_BOOK_AVAILABLE,
+            HOLD_ALREADY_BORROWED, HOLD_EXISTS or HOLD_ERROR
+    """
+    now = now or datetime.now()
+    conn = get_db_connection()
+    conn.isolation_level = None
+    expired = []
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        expired = _expire_ready_holds(conn, now, book_id)
+        book = conn.execute('SELECT available_copies FROM books WHERE id = ?', (book_id,)).fetchone()
+        if not book:
+            outcome = HOLD_BOOK_MISSING
+        elif book['available_copies'] > 0:
+            outcome = HOLD_BOOK_AVAILABLE
+        elif conn.execute('''
+            SELECT 1 FROM borrow_records WHERE patron_id = ? AND book_id = ? AND return_date IS NULL
+        ''', (patron_id, book_id)).fetchone():
+            outcome = HOLD_ALREADY_BORROWED
+        elif conn.execute(f'''
+            SELECT 1 FROM holds WHERE book_id = ? AND patron_id = ? AND {ACTIVE_HOLD_SQL}
+        ''', (book_id, patron_id)).fetchone():
+            outcome = HOLD_EXISTS
+        else:
+            conn.execute('''
+                INSERT INTO holds (patron_id, book_id, status, created_at) VALUES (?, ?, ?, ?)
+            ''', (patron_id, book_id, HOLD_WAITING, now.isoformat()))
+            outcome = HOLD_PLACED
+        conn.execute('COMMIT' if outcome == HOLD_PLACED or expired else 'ROLLBACK')
+    except sqlite3.Error:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        outcome, expired = HOLD_ERROR, []
+    finally:
         conn.close()
-        return False
 
-def update_borrow_record_return_date(patron_id: str, book_id: int, return_date: datetime) -> bool:
-    """Update the return date for a borrow record."""
+    if expired:
+        notify_book_changed(book_id)
+    return outcome
+
+def cancel_hold_transaction(patron_id: str, book_id: int,
+                            now: Optional[datetime] = None) -> Tuple[bool, Optional[str]]:
+    """
+    Cancel a patron's active hold. A copy already set aside for it moves on to
+    the next waiting hold, or back to the shelf of the branch it waited at.
+
+    Returns:
+        tuple: (whether a hold was cancelled, patron_id whose hold became ready or None)
+    """
     conn = get_db_connection()
+    conn.isolation_level = None
+    released = False
+    ready_patron = None
     try:
-        conn.execute('''
-            UPDATE borrow_records 
-            SET return_date = ? 
-            WHERE patron_id = ? AND book_id = ? AND return_date IS NULL
-        ''', (return_date.isoformat(), patron_id, book_id))
-        conn.commit()
+        conn.execute('BEGIN IMMEDIATE')
+        hold = conn.execute(f'''
+            SELECT id, status, branch_id FROM holds WHERE book_id = ? AND patron_id = ? AND {ACTIVE_HOLD_SQL}
+        ''', (book_id, patron_id)).fetchone()
+        if hold:
+            conn.execute('UPDATE holds SET status = ? WHERE id = ?', (HOLD_CANCELLED, hold['id']))
+            if hold['status'] == HOLD_READY:
+                ready_patron = _release_copy(conn, book_id, hold['branch_id'] or MAIN_BRANCH_ID,
+                                             now or datetime.now())
+                released = True
+        conn.execute('COMMIT')
+    except sqlite3.Error:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        return False, None
+    finally:
         conn.close()
+
+    if released:
+        notify_book_changed(book_id)
+    return hold is not None, ready_patron
+
+def get_hold(patron_id: str, book_id: int) -> Optional[Dict]:
+    """
+    Get a patron's active hold on a book with its place in the queue.
+
+    Returns:
+        Optional[Dict]: {'status', 'position', 'created_at', 'ready_at', 'branch_id'};
+            position is 1 for the next hold to be served and 0 once the hold is
+            ready; branch_id is where a ready hold's copy waits for pickup
+    """
+    conn = get_db_connection()
+    hold = conn.execute(f'''
+        SELECT h.status, h.created_at, h.ready_at, h.branch_id,
+               CASE WHEN h.status = '{HOLD_WAITING}' THEN (
+                   SELECT COUNT(*) FROM holds q
+                   WHERE q.book_id = h.book_id AND q.status = '{HOLD_WAITING}' AND q.id <= h.id
+               ) ELSE 0 END AS position
+        FROM holds h
+        WHERE h.book_id = ? AND h.patron_id = ? AND h.{ACTIVE_HOLD_SQL}
+    ''', (book_id, patron_id)).fetchone()
+    conn.close()
+    return dict(hold) if hold else None
+
+def get_last_hold_status(patron_id: str, book_id: int) -> Optional[str]:
+    """Get the status of a patron's most recent hold on a book, active or not."""
+    conn = get_db_connection()
+    row = conn.execute('''
+        SELECT status FROM holds WHERE book_id = ? AND patron_id = ? ORDER BY id DESC LIMIT 1
+    ''', (book_id, patron_id)).fetchone()
+    conn.close()
+    return row['status'] if row else None
+
+def update_book_availability(book_id: int, change: int, branch_id: int = MAIN_BRANCH_ID) -> bool:
+    """Update the available copies of a book at a branch by a given amount (+1 for return, -1 for borrow)."""
+    try:
+        # The holdings update trigger carries the change to the books aggregate
+        execute_write('''
+            UPDATE holdings SET available_copies = available_copies + ? WHERE book_id = ? AND branch_id = ?
+        ''', (change, book_id, branch_id))
+        notify_book_changed(book_id)
         return True
     except Exception as e:
-        conn.close()
         return False
 
+class GroupCommitWriter:
+    """
+    Background writer that commits queued statements in batches.
+
+    Request threads submit statements, or whole transactions as functions of a
+    connection, and wait on the returned futures; a single writer thread drains
+    the queue, runs up to max_batch of them (each inside its own savepoint, so
+    one failing write doesn't undo the others) and commits them together, paying
+    for one fsync per batch instead of per write.
+    """
+
+    def __init__(self, max_batch: int = 256, max_delay: float = 0.002):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.batches = 0
+        self.statements = 0
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def start(self):
+        """Start the writer thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='group-commit-writer', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Flush outstanding writes and stop the writer thread."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, query: str, params: tuple = ()) -> Future:
+        """Queue a write; the future resolves to its rowcount once committed."""
+        return self.submit_transaction(lambda conn: conn.execute(query, params).rowcount)
+
+    def submit_transaction(self, work: Callable, *args) -> Future:
+        """Queue work(conn, *args); the future resolves to its return value once committed."""
+        future = Future()
+        self._queue.put((work, args, future))
+        return future
+
+    def _collect(self, first) -> Tuple[list, bool]:
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        conn = get_db_connection()
+        conn.isolation_level = None
+        stopping = False
+        try:
+            while not stopping:
+                first = self._queue.get()
+                if first is None:
+                    break
+                batch, stopping = self._collect(first)
+                self._commit(conn, batch)
+        finally:
+            conn.close()
+
+    def _commit(self, conn, batch):
+        results = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for work, args, future in batch:
+                conn.execute('SAVEPOINT write')
+                try:
+                    results.append((future, work(conn, *args), None))
+                    conn.execute('RELEASE write')
+                except Exception as e:
+                    conn.execute('ROLLBACK TO write')
+                    conn.execute('RELEASE write')
+                    results.append((future, None, e))
+            conn.execute('COMMIT')
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.statements += len(batch)
+        for future, rowcount, error in results:
+            if error is None:
+                future.set_result(rowcount)
+            else:
+                future.set_exception(error)
+
+_group_writer: Optional[GroupCommitWriter] = None
+
+def enable_group_commit(max_batch: int = 256, max_delay: float = 0.002) -> GroupCommitWriter:
+    """Route circulation writes through a shared GroupCommitWriter."""
+    global _group_writer
+    if _group_writer is None:
+        _group_writer = GroupCommitWriter(max_batch, max_delay)
+        _group_writer.start()
+    return _group_writer
+
+def disable_group_commit():
+    """Flush and stop the shared GroupCommitWriter, returning to per-call commits."""
+    global _group_writer
+    if _group_writer is not None:
+        _group_writer.stop()
+        _group_writer = None
+
+def run_write_transaction(work: Callable, *args):
+    """
+    Run work(conn, *args) in a write transaction and return its result.
+
+    Goes through the group commit writer when it is enabled (as one savepoint in
+    its next batch), otherwise opens a connection and commits under
+    BEGIN IMMEDIATE on its own. Either way an exception from work undoes its
+    writes and is raised here.
+    """
+    if _group_writer is not None:
+        return _group_writer.submit_transaction(work, *args).result()
+
+    conn = get_db_connection()
+    conn.isolation_level = None
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        result = work(conn, *args)
+        conn.execute('COMMIT')
+        return result
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+def execute_write(query: str, params: tuple = ()) -> int:
+    """
+    Run and commit a single write, returning its rowcount.
+
+    Goes through the group commit writer when it is enabled, otherwise opens a
+    connection and commits on its own.
+    """
+    return run_write_transaction(lambda conn: conn.execute(query, params).rowcount)
+
 def conn_execute_read(query: str, param: tuple = ()):
     conn = get_db_connection()
     result = conn.execute(query, param).fetchall()
     conn.close()
     return [dict(row) for row in result]
+
+def iter_row_batches(query: str, params=(), batch_size: int = 1000) -> Iterator[List[tuple]]:
+    """
+    Run a query and yield its rows as plain tuples, batch_size at a time.
+
+    Rows are pulled with fetchmany, so however large the result only one batch
+    is held in memory. The connection stays open until the generator is
+    exhausted or closed.
+    """
+    conn = sqlite3.connect(DATABASE)
+    try:
+        cursor = conn.execute(query, params)
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            yield batch
+    finally:
+        conn.close()
@@ -0,0 +1,96 @@
+"""
+ISBN Utilities Module - ISBN normalization, validation and a Bloom filter
+
+normalize_isbn turns user-entered ISBNs ("978-0-7432-7356-5", "0743273567")
+into the 13-character key stored in books.isbn_key. BloomFilter backs the
+"definitely not in the catalog" check that lets duplicate checks skip the
+database for new ISBNs.
+"""
+
+import hashlib
+import math
+
+
+def clean_isbn(raw: str) -> str:
+    """Strip hyphens and whitespace and upper-case a trailing ISBN-10 'x'."""
+    return ''.join(raw.split()).replace('-', '').upper()
+
+
+def isbn10_check_digit(first9: str) -> str:
+    """Compute the ISBN-10 check character for the first nine digits."""
+    total = sum((10 - i) * int(digit) for i, digit in enumerate(first9))
+    check = (11 - total % 11) % 11
+    return 'X' if check == 10 else str(check)
+
+
+def isbn13_check_digit(first12: str) -> str:
+    """Compute the ISBN-13 check digit for the first twelve digits."""
+    total = sum(int(digit) * (3 if i % 2 else 1) for i, digit in enumerate(first12))
+    return str((10 - total % 10) % 10)
+
+
+def is_valid_isbn10(isbn: str) -> bool:
+    """Check an already cleaned ISBN-10, including its checksum."""
+    return (len(isbn) == 10 and isbn[:9].isdigit() and (isbn[9].isdigit() or isbn[9] == 'X')
+            and isbn10_check_digit(isbn[:9]) == isbn[9])
+
+
+def is_valid_isbn13(isbn: str) -> bool:
+    """Check an already cleaned ISBN-13, including its checksum."""
+    return len(isbn) == 13 and isbn.isdigit() and isbn13_check_digit(isbn[:12]) == isbn[12]
+
+
+def is_valid_isbn(raw: str) -> bool:
+    """Check whether a raw ISBN is a well-formed ISBN-10 or ISBN-13 with a valid checksum."""
+    isbn = clean_isbn(raw)
+    return is_valid_isbn10(isbn) or is_valid_isbn13(isbn)
+
+
+def isbn10_to_isbn13(isbn10: str) -> str:
+    """Convert a cleaned ISBN-10 to its 978-prefixed ISBN-13."""
+    first12 = '978' + isbn10[:9]
+    return first12 + isbn13_check_digit(first12)
+
+
+def normalize_isbn(raw: str) -> str:
+    """
+    Get the lookup key for an ISBN.
+
+    Valid ISBN-10s are converted to ISBN-13; anything else is returned cleaned
+    but otherwise unchanged, so keys exist for legacy values with bad checksums.
+    """
+    isbn = clean_isbn(raw)
+    if is_valid_isbn10(isbn):
+        return isbn10_to_isbn13(isbn)
+    return isbn
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings.
+
+    might_contain() never returns False for an added value, and returns True
+    for an absent one with roughly the configured false-positive rate while
+    no more than capacity values have been added.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.capacity = max(1, capacity)
+        self.size = max(8, int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value: str):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, value: str):
+        for position in self._positions(value):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def might_contain(self, value: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
@@ -0,0 +1,79 @@
+"""
+JSON Provider Module - Fast JSON serialization for API responses
+
+Uses orjson when it is installed and falls back to Flask's stdlib-based
+provider otherwise. Values orjson cannot encode (and datetimes, so both paths
+emit the same HTTP-date strings) are handed to Flask's default hook.
+"""
+
+from typing import Iterable
+
+from flask import Response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised only without orjson
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes with orjson when available."""
+
+    def _options(self, indent: bool = False) -> int:
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps_bytes(self, obj, indent: bool = False) -> bytes:
+        """Serialize data as UTF-8 JSON bytes."""
+        if orjson is None:
+            return self.dumps(obj, indent=2 if indent else None,
+                              separators=None if indent else (",", ":")).encode()
+        return orjson.dumps(obj, default=self.default, option=self._options(indent))
+
+    def dumps(self, obj, **kwargs) -> str:
+        # Custom json.dumps arguments only make sense to the stdlib encoder
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self.dumps_bytes(obj, indent) + b"\n", mimetype=self.mimetype)
+
+
+def stream_json_array(items: Iterable, provider: DefaultJSONProvider, chunk_size: int = 500) -> Response:
+    """
+    Stream an iterable as a JSON array without materializing the whole body.
+
+    Items are encoded and flushed chunk_size at a time, so memory stays flat
+    however large the result set is.
+    """
+    encode = provider.dumps_bytes if hasattr(provider, 'dumps_bytes') else (
+        lambda obj: provider.dumps(obj, separators=(",", ":")).encode())
+
+    def generate():
+        yield b"["
+        chunk = []
+        first = True
+        for item in items:
+            chunk.append(encode(item))
+            if len(chunk) >= chunk_size:
+                yield (b"" if first else b",") + b",".join(chunk)
+                first = False
+                chunk = []
+        if chunk:
+            yield (b"" if first else b",") + b",".join(chunk)
+        yield b"]\n"
+
+    return Response(stream_with_context(generate()), mimetype=provider.mimetype)
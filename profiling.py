@@ -0,0 +1,187 @@
+"""
+Profiling Module - opt-in per-request profiles
+
+With PROFILING_ENABLED set, a request is profiled when it carries the
+X-Profile header or is picked by PROFILE_SAMPLE_RATE:
+
+- "X-Profile: cprofile" (or "1") runs the request under cProfile; the result
+  downloads as a pstats file (python -m pstats, snakeviz, ...).
+- "X-Profile: stacks", and every rate-sampled request, uses a stack sampler
+  thread, which is cheap enough to leave on; the result downloads in the
+  collapsed-stack format read by flamegraph.pl and speedscope.
+
+The profile id (the incoming X-Request-ID, or a generated one) comes back in
+the X-Profile-Id response header. The PROFILE_HISTORY most recent profiles are
+kept in memory and listed slowest first under /admin/profiles.
+"""
+
+import cProfile
+import marshal
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional
+
+from flask import g, request
+
+PROFILE_KINDS = ('cprofile', 'stacks')
+
+
+class StackSampler:
+    """Samples one thread's Python stack every interval seconds from a helper thread."""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.counts[_stack(frame)] += 1
+
+
+def _stack(frame) -> tuple:
+    """Frame labels from the outermost call down to frame."""
+    labels = []
+    while frame is not None:
+        code = frame.f_code
+        labels.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+        frame = frame.f_back
+    return tuple(reversed(labels))
+
+
+class Profile:
+    """One finished request profile."""
+
+    def __init__(self, profile_id: str, kind: str, method: str, path: str, status: int,
+                 duration: float, data):
+        self.id = profile_id
+        self.kind = kind
+        self.method = method
+        self.path = path
+        self.status = status
+        self.duration = duration
+        self.created_at = time.time()
+        self.data = data
+
+    def summary(self) -> Dict:
+        return {'id': self.id, 'kind': self.kind, 'method': self.method, 'path': self.path,
+                'status': self.status, 'duration_ms': round(self.duration * 1000, 3),
+                'created_at': self.created_at}
+
+    def pstats_bytes(self) -> bytes:
+        """The profile in the marshal format pstats.Stats loads."""
+        return marshal.dumps(self.data)
+
+    def collapsed(self) -> str:
+        """One "outer;...;inner count" line per distinct sampled stack."""
+        return ''.join(f'{";".join(stack)} {count}\n' for stack, count in self.data.most_common())
+
+
+class ProfileStore:
+    """Thread safe, bounded record of the most recent profiles."""
+
+    def __init__(self, history: int = 50):
+        self.history = history
+        self._lock = threading.Lock()
+        self._profiles: "OrderedDict[str, Profile]" = OrderedDict()
+
+    def add(self, profile: Profile):
+        with self._lock:
+            self._profiles.pop(profile.id, None)
+            self._profiles[profile.id] = profile
+            while len(self._profiles) > self.history:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def slowest(self, limit: int = 20) -> List[Profile]:
+        with self._lock:
+            profiles = list(self._profiles.values())
+        return sorted(profiles, key=lambda profile: profile.duration, reverse=True)[:limit]
+
+
+def _requested_kind(app) -> Optional[str]:
+    """The profiler this request asked for (or was sampled into), if any."""
+    header = request.headers.get('X-Profile', '').strip().lower()
+    if header in ('1', 'cprofile'):
+        return 'cprofile'
+    if header == 'stacks':
+        return 'stacks'
+    rate = app.config['PROFILE_SAMPLE_RATE']
+    if rate and random.random() < rate:
+        return 'stacks'
+    return None
+
+
+def init_profiling(app):
+    """Register per-request profiling on the app (see PROFILE_* config)."""
+    app.config.setdefault('PROFILING_ENABLED', False)
+    app.config.setdefault('PROFILE_SAMPLE_RATE', 0.0)
+    app.config.setdefault('PROFILE_SAMPLE_INTERVAL', 0.001)
+    app.config.setdefault('PROFILE_HISTORY', 50)
+    if not app.config['PROFILING_ENABLED']:
+        return
+
+    store = ProfileStore(app.config['PROFILE_HISTORY'])
+    app.extensions['profiles'] = store
+
+    @app.before_request
+    def _start_profile():
+        kind = _requested_kind(app)
+        if kind is None or request.path.startswith('/admin/profiles'):
+            return
+        profiler = None
+        if kind == 'cprofile':
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Newer Pythons allow only one cProfile per process at a time
+                kind, profiler = 'stacks', None
+        if kind == 'stacks':
+            profiler = StackSampler(threading.get_ident(), app.config['PROFILE_SAMPLE_INTERVAL'])
+            profiler.start()
+        g.profile = {'id': request.headers.get('X-Request-ID') or uuid.uuid4().hex,
+                     'kind': kind, 'profiler': profiler, 'start': time.perf_counter(), 'status': 500}
+
+    @app.after_request
+    def _tag_profile(response):
+        profile = g.get('profile')
+        if profile is not None:
+            profile['status'] = response.status_code
+            response.headers['X-Profile-Id'] = profile['id']
+        return response
+
+    @app.teardown_request
+    def _finish_profile(exc):
+        profile = g.pop('profile', None)
+        if profile is None:
+            return
+        profiler = profile['profiler']
+        if profile['kind'] == 'cprofile':
+            profiler.disable()
+            profiler.create_stats()
+            data = profiler.stats
+        else:
+            profiler.stop()
+            data = profiler.counts
+        store.add(Profile(profile['id'], profile['kind'], request.method, request.full_path.rstrip('?'),
+                          profile['status'], time.perf_counter() - profile['start'], data))
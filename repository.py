@@ -0,0 +1,833 @@
+"""
+Repository Module - storage backends behind one interface
+
+library_service, the routes and the catalog caches reach storage through the
+module-level functions at the bottom of this file, which delegate to the
+active Repository:
+
+- SqliteRepository: the database.py helpers against the DATABASE file (default)
+- InMemoryRepository: plain Python tables behind one lock; nothing is
+  persisted, which makes it handy for fast tests and demos
+
+Ad-hoc reads are written as Query objects (a table, equality / substring / IN /
+NULL conditions, ordering and a limit) rather than SQL, so the same read runs
+on either backend: SQLite compiles it to SQL, the in-memory backend evaluates
+it row by row. create_app picks the backend from STORAGE_BACKEND.
+
+Reporting, exports, loan archiving, the fee scheduler, group commit and the
+catalog snapshot work on the SQLite file directly and are not available on
+the in-memory backend.
+"""
+
+import json
+import re
+import string
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from itertools import count
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import database
+from database import (
+    Book, Loan, BOOK_COLUMNS, MAX_BORROWED_BOOKS, MAIN_BRANCH_ID, to_epoch_day, notify_book_changed,
+    BORROW_OK, BORROW_BOOK_MISSING, BORROW_UNAVAILABLE, BORROW_LIMIT_REACHED,
+    RETURN_OK, RETURN_NOT_BORROWED, HOLD_WAITING, HOLD_READY, HOLD_FULFILLED, HOLD_CANCELLED, HOLD_EXPIRED,
+    HOLD_PLACED, HOLD_BOOK_MISSING, HOLD_BOOK_AVAILABLE, HOLD_ALREADY_BORROWED, HOLD_EXISTS, HOLD_PICKUP_DAYS
+)
+from isbn_utils import normalize_isbn
+
+BOOK_FIELDS = tuple(BOOK_COLUMNS.split(', '))
+
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+# Dialect-neutral queries
+
+@dataclass(frozen=True)
+class Condition:
+    """One column test; build these with eq, contains, is_in and is_null."""
+    column: str
+    op: str
+    value: object = None
+
+
+@dataclass(frozen=True)
+class AnyOf:
+    """Matches when any of its conditions does."""
+    conditions: Tuple[Condition, ...]
+
+
+def eq(column: str, value) -> Condition:
+    return Condition(column, 'eq', value)
+
+def contains(column: str, text: str) -> Condition:
+    """Case-insensitive substring match."""
+    return Condition(column, 'contains', text)
+
+def is_in(column: str, values: Iterable) -> Condition:
+    return Condition(column, 'in', tuple(values))
+
+def is_null(column: str) -> Condition:
+    return Condition(column, 'is_null')
+
+def any_of(*conditions: Condition) -> AnyOf:
+    return AnyOf(conditions)
+
+
+@dataclass(frozen=True)
+class Query:
+    """
+    A single-table read: SELECT columns FROM table WHERE all of where
+    ORDER BY order_by LIMIT limit. Prefix an order_by column with '-' to sort
+    it descending.
+    """
+    table: str
+    columns: Tuple[str, ...]
+    where: Tuple[Union[Condition, AnyOf], ...] = ()
+    order_by: Tuple[str, ...] = ()
+    limit: Optional[int] = None
+
+
+def _identifier(name: str) -> str:
+    if not _IDENTIFIER.match(name):
+        raise ValueError(f'Invalid identifier in query: {name!r}')
+    return name
+
+def _condition_sql(condition, params: list) -> str:
+    if isinstance(condition, AnyOf):
+        return '(' + ' OR '.join(_condition_sql(c, params) for c in condition.conditions) + ')'
+    column = _identifier(condition.column)
+    if condition.op == 'eq':
+        params.append(condition.value)
+        return f'{column} = ?'
+    if condition.op == 'contains':
+        params.append(f'%{condition.value}%')
+        return f'{column} LIKE ?'
+    if condition.op == 'in':
+        # One parameter however many values, so large IN lists don't hit SQLite's variable limit
+        params.append(json.dumps(list(condition.value)))
+        return f'{column} IN (SELECT value FROM json_each(?))'
+    if condition.op == 'is_null':
+        return f'{column} IS NULL'
+    raise ValueError(f'Unknown query operator: {condition.op}')
+
+def compile_sqlite(query: Query) -> Tuple[str, tuple]:
+    """Compile a Query to SQLite SQL and its parameters."""
+    params = []
+    sql = f"SELECT {', '.join(map(_identifier, query.columns))} FROM {_identifier(query.table)}"
+    if query.where:
+        sql += ' WHERE ' + ' AND '.join(_condition_sql(c, params) for c in query.where)
+    if query.order_by:
+        sql += ' ORDER BY ' + ', '.join(
+            f'{_identifier(column[1:])} DESC' if column.startswith('-') else _identifier(column)
+            for column in query.order_by)
+    if query.limit is not None:
+        sql += ' LIMIT ?'
+        params.append(query.limit)
+    return sql, tuple(params)
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+def _ascii_lower(text: str) -> str:
+    return text.translate(_ASCII_LOWER)
+
+def _matches(row: Dict, condition) -> bool:
+    if isinstance(condition, AnyOf):
+        return any(_matches(row, c) for c in condition.conditions)
+    value = row[condition.column]
+    if condition.op == 'eq':
+        return value == condition.value
+    if condition.op == 'contains':
+        # Like SQLite's LIKE, only ASCII letters compare case-insensitively
+        return value is not None and _ascii_lower(condition.value) in _ascii_lower(value)
+    if condition.op == 'in':
+        return value in condition.value
+    if condition.op == 'is_null':
+        return value is None
+    raise ValueError(f'Unknown query operator: {condition.op}')
+
+def evaluate(query: Query, rows: Iterable[Dict]) -> List[Dict]:
+    """Run a Query over row dicts, with SQLite's ordering of NULLs (first when ascending)."""
+    result = [row for row in rows if all(_matches(row, c) for c in query.where)]
+    # Stable sorts, least significant key first
+    for column in reversed(query.order_by):
+        descending = column.startswith('-')
+        name = column.lstrip('-')
+        result.sort(key=lambda row: (row[name] is not None, row[name]), reverse=descending)
+    if query.limit is not None:
+        result = result[:query.limit]
+    return [{column: row[column] for column in query.columns} for row in result]
+
+
+# Backends
+
+class Repository(ABC):
+    """
+    Everything the circulation code needs from storage. Methods without a
+    docstring behave like the database.py helpers of the same name.
+    """
+
+    name = 'abstract'
+
+    @abstractmethod
+    def ensure_schema(self) -> bool:
+        """Create or upgrade the storage; returns True if anything had to change."""
+
+    @abstractmethod
+    def add_sample_data(self):
+        """Seed the demo catalog if it is empty."""
+
+    @abstractmethod
+    def conn_execute_read(self, query: Union[Query, str], params: tuple = ()) -> List[Dict]:
+        """Run a Query and return its rows as dicts (raw SQL strings: SQLite only)."""
+
+    @abstractmethod
+    def get_catalog_version(self) -> int:
+        """A counter that changes whenever a book is added, removed or renamed."""
+
+    @abstractmethod
+    def get_all_books(self, order_by: str = "title") -> List[Book]: ...
+
+    @abstractmethod
+    def get_book_by_id(self, book_id: int) -> Optional[Book]: ...
+
+    @abstractmethod
+    def get_book_by_isbn(self, isbn: str) -> Optional[Book]: ...
+
+    @abstractmethod
+    def isbn_may_exist(self, isbn: str) -> bool: ...
+
+    @abstractmethod
+    def insert_book(self, title: str, author: str, isbn: str, total_copies: int, available_copies: int,
+                    branch_id: int = MAIN_BRANCH_ID) -> bool: ...
+
+    @abstractmethod
+    def get_branches(self) -> List[Dict]: ...
+
+    @abstractmethod
+    def get_branch(self, branch_id: int) -> Optional[Dict]: ...
+
+    @abstractmethod
+    def insert_branch(self, code: str, name: str) -> Optional[int]: ...
+
+    @abstractmethod
+    def get_branch_books(self, branch_id: int, order_by: str = "title") -> List[Book]: ...
+
+    @abstractmethod
+    def get_book_holdings(self, book_id: int) -> List[Dict]: ...
+
+    @abstractmethod
+    def add_branch_copies(self, book_id: int, branch_id: int, copies: int) -> bool: ...
+
+    @abstractmethod
+    def get_patron_borrow_count(self, patron_id: str) -> int: ...
+
+    @abstractmethod
+    def get_patron_report(self, patron_id: str) -> Dict: ...
+
+    @abstractmethod
+    def get_ledger_late_fee(self, patron_id: str, book_id: int) -> Optional[Dict]: ...
+
+    @abstractmethod
+    def get_overdue_loans(self, as_of: Optional[datetime] = None, limit: Optional[int] = None) -> List[Dict]: ...
+
+    @abstractmethod
+    def borrow_book_transaction(self, patron_id: str, book_id: int, borrow_date: datetime, due_date: datetime,
+                                max_borrowed: int = MAX_BORROWED_BOOKS, branch_id: Optional[int] = None) -> str: ...
+
+    @abstractmethod
+    def return_book_transaction(self, patron_id: str, book_id: int, return_date: datetime,
+                                branch_id: Optional[int] = None) -> Tuple[str, Optional[str]]: ...
+
+    @abstractmethod
+    def place_hold_transaction(self, patron_id: str, book_id: int, now: Optional[datetime] = None) -> str: ...
+
+    @abstractmethod
+    def cancel_hold_transaction(self, patron_id: str, book_id: int,
+                                now: Optional[datetime] = None) -> Tuple[bool, Optional[str]]: ...
+
+    @abstractmethod
+    def expire_ready_holds(self, now: Optional[datetime] = None) -> List[Tuple[int, Optional[str]]]: ...
+
+    @abstractmethod
+    def get_hold(self, patron_id: str, book_id: int) -> Optional[Dict]: ...
+
+    @abstractmethod
+    def get_last_hold_status(self, patron_id: str, book_id: int) -> Optional[str]: ...
+
+
+class SqliteRepository(Repository):
+    """The database.py helpers, against the database.DATABASE file."""
+
+    name = 'sqlite'
+
+    def ensure_schema(self) -> bool:
+        return database.ensure_schema()
+
+    def add_sample_data(self):
+        database.add_sample_data()
+
+    def conn_execute_read(self, query, params=()):
+        if isinstance(query, Query):
+            query, params = compile_sqlite(query)
+        return database.conn_execute_read(query, params)
+
+    def get_catalog_version(self):
+        return database.get_catalog_version()
+
+    def get_all_books(self, order_by="title"):
+        return database.get_all_books(order_by)
+
+    def get_book_by_id(self, book_id):
+        return database.get_book_by_id(book_id)
+
+    def get_book_by_isbn(self, isbn):
+        return database.get_book_by_isbn(isbn)
+
+    def isbn_may_exist(self, isbn):
+        return database.isbn_may_exist(isbn)
+
+    def insert_book(self, title, author, isbn, total_copies, available_copies, branch_id=MAIN_BRANCH_ID):
+        return database.insert_book(title, author, isbn, total_copies, available_copies, branch_id)
+
+    def get_branches(self):
+        return database.get_branches()
+
+    def get_branch(self, branch_id):
+        return database.get_branch(branch_id)
+
+    def insert_branch(self, code, name):
+        return database.insert_branch(code, name)
+
+    def get_branch_books(self, branch_id, order_by="title"):
+        return database.get_branch_books(branch_id, order_by)
+
+    def get_book_holdings(self, book_id):
+        return database.get_book_holdings(book_id)
+
+    def add_branch_copies(self, book_id, branch_id, copies):
+        return database.add_branch_copies(book_id, branch_id, copies)
+
+    def get_patron_borrow_count(self, patron_id):
+        return database.get_patron_borrow_count(patron_id)
+
+    def get_patron_report(self, patron_id):
+        return database.get_patron_report(patron_id)
+
+    def get_ledger_late_fee(self, patron_id, book_id):
+        return database.get_ledger_late_fee(patron_id, book_id)
+
+    def get_overdue_loans(self, as_of=None, limit=None):
+        return database.get_overdue_loans(as_of, limit)
+
+    def borrow_book_transaction(self, patron_id, book_id, borrow_date, due_date,
+                                max_borrowed=MAX_BORROWED_BOOKS, branch_id=None):
+        return database.borrow_book_transaction(patron_id, book_id, borrow_date, due_date,
+                                                max_borrowed, branch_id)
+
+    def return_book_transaction(self, patron_id, book_id, return_date, branch_id=None):
+        return database.return_book_transaction(patron_id, book_id, return_date, branch_id)
+
+    def place_hold_transaction(self, patron_id, book_id, now=None):
+        return database.place_hold_transaction(patron_id, book_id, now)
+
+    def cancel_hold_transaction(self, patron_id, book_id, now=None):
+        return database.cancel_hold_transaction(patron_id, book_id, now)
+
+    def expire_ready_holds(self, now=None):
+        return database.expire_ready_holds(now)
+
+    def get_hold(self, patron_id, book_id):
+        return database.get_hold(patron_id, book_id)
+
+    def get_last_hold_status(self, patron_id, book_id):
+        return database.get_last_hold_status(patron_id, book_id)
+
+
+def _late_fee(days_overdue: int) -> float:
+    """Mirrors database.late_fee_sql: $0.50/day for 7 days, then $1.00/day, capped at $15.00."""
+    if days_overdue <= 0:
+        return 0.0
+    fee = days_overdue * 0.5 if days_overdue <= 7 else 3.5 + (days_overdue - 7) * 1.0
+    return min(15.0, fee)
+
+
+class InMemoryRepository(Repository):
+    """
+    The same tables as the SQLite schema, held as row dicts in Python.
+
+    One lock stands in for SQLite's write lock: each *_transaction method runs
+    its checks and writes while holding it. The books copy counts are kept in
+    step with holdings by the write methods, as the SQLite triggers do.
+    """
+
+    name = 'memory'
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._ids = {table: count(1) for table in ('books', 'branches', 'borrow_records', 'holds')}
+        self._books: Dict[int, Dict] = {}
+        self._books_by_isbn: Dict[str, int] = {}
+        self._branches: Dict[int, Dict] = {}
+        self._holdings: Dict[int, Dict[int, Dict]] = {}
+        self._loans: Dict[int, Dict] = {}
+        self._loans_by_patron: Dict[str, List[Dict]] = {}
+        self._holds: Dict[int, Dict] = {}
+        self._holds_by_book: Dict[int, List[Dict]] = {}
+        self._catalog_version = 0
+        self.insert_branch('MAIN', 'Main Library')
+
+    def _rows(self, table: str) -> Iterable[Dict]:
+        if table == 'books':
+            return self._books.values()
+        if table == 'branches':
+            return self._branches.values()
+        if table == 'holdings':
+            return [row for by_branch in self._holdings.values() for row in by_branch.values()]
+        if table == 'borrow_records':
+            return self._loans.values()
+        if table == 'holds':
+            return self._holds.values()
+        raise ValueError(f'Unknown table: {table}')
+
+    def _adjust_holding(self, book_id: int, branch_id: int, total: int = 0, available: int = 0):
+        """Change a branch's copies of a book and the book's library-wide counts together."""
+        holding = self._holdings.setdefault(book_id, {}).setdefault(
+            branch_id, {'book_id': book_id, 'branch_id': branch_id, 'total_copies': 0, 'available_copies': 0})
+        holding['total_copies'] += total
+        holding['available_copies'] += available
+        book = self._books[book_id]
+        book['total_copies'] += total
+        book['available_copies'] += available
+
+    def _active_hold(self, patron_id: str, book_id: int) -> Optional[Dict]:
+        for hold in self._holds_by_book.get(book_id, ()):
+            if hold['patron_id'] == patron_id and hold['status'] in (HOLD_WAITING, HOLD_READY):
+                return hold
+        return None
+
+    def _open_loan_count(self, patron_id: str) -> int:
+        return sum(loan['return_date'] is None for loan in self._loans_by_patron.get(patron_id, ()))
+
+    def _add_loan(self, patron_id: str, book_id: int, borrow_date: datetime, due_date: datetime,
+                  branch_id: Optional[int]):
+        loan = {'id': next(self._ids['borrow_records']), 'patron_id': patron_id, 'book_id': book_id,
+                'borrow_date': borrow_date.isoformat(), 'due_date': due_date.isoformat(), 'return_date': None,
+                'due_day': to_epoch_day(due_date), 'return_day': None, 'branch_id': branch_id}
+        self._loans[loan['id']] = loan
+        self._loans_by_patron.setdefault(patron_id, []).append(loan)
+
+    @staticmethod
+    def _book(row: Dict) -> Book:
+        return Book(*(row[field] for field in BOOK_FIELDS))
+
+    # Setup
+
+    def ensure_schema(self) -> bool:
+        return False
+
+    def add_sample_data(self):
+        with self._lock:
+            if self._books:
+                return
+            east_id = self.insert_branch('EAST', 'Eastside Branch')
+            for title, author, isbn, copies in (
+                ('The Great Gatsby', 'F. Scott Fitzgerald', '9780743273565', {MAIN_BRANCH_ID: 2, east_id: 1}),
+                ('To Kill a Mockingbird', 'Harper Lee', '9780061120084', {MAIN_BRANCH_ID: 2}),
+                ('1984', 'George Orwell', '9780451524935', {MAIN_BRANCH_ID: 1}),
+            ):
+                self.insert_book(title, author, isbn, 0, 0)
+                book_id = self._books_by_isbn[isbn]
+                for branch_id, copies_here in copies.items():
+                    self._adjust_holding(book_id, branch_id, copies_here, copies_here)
+
+            # 1984 is out with patron 123456
+            now = datetime.now()
+            self._add_loan('123456', 3, now - timedelta(days=5), now + timedelta(days=9), MAIN_BRANCH_ID)
+            self._adjust_holding(3, MAIN_BRANCH_ID, available=-1)
+        notify_book_changed(None)
+
+    def conn_execute_read(self, query, params=()):
+        if not isinstance(query, Query):
+            raise TypeError('The in-memory backend only runs Query objects, not SQL')
+        with self._lock:
+            return evaluate(query, self._rows(query.table))
+
+    # Books and branches
+
+    def get_all_books(self, order_by="title"):
+        with self._lock:
+            rows = sorted(self._books.values(), key=lambda row: row[order_by])
+            return [self._book(row) for row in rows]
+
+    def get_book_by_id(self, book_id):
+        with self._lock:
+            row = self._books.get(book_id)
+            return self._book(row) if row else None
+
+    def get_book_by_isbn(self, isbn):
+        with self._lock:
+            book_id = self._books_by_isbn.get(normalize_isbn(isbn)) or self._books_by_isbn.get(isbn)
+            return self._book(self._books[book_id]) if book_id else None
+
+    def get_catalog_version(self):
+        with self._lock:
+            return self._catalog_version
+
+    def isbn_may_exist(self, isbn):
+        return self.get_book_by_isbn(isbn) is not None
+
+    def insert_book(self, title, author, isbn, total_copies, available_copies, branch_id=MAIN_BRANCH_ID):
+        isbn_key = normalize_isbn(isbn)
+        with self._lock:
+            # Like the unique isbn and isbn_key indexes in SQLite
+            if isbn in self._books_by_isbn or isbn_key in self._books_by_isbn or branch_id not in self._branches:
+                return False
+            book_id = next(self._ids['books'])
+            self._books[book_id] = {'id': book_id, 'title': title, 'author': author, 'isbn': isbn,
+                                    'total_copies': 0, 'available_copies': 0, 'isbn_key': isbn_key}
+            self._books_by_isbn[isbn] = book_id
+            self._books_by_isbn[isbn_key] = book_id
+            self._catalog_version += 1
+            self._adjust_holding(book_id, branch_id, total_copies, available_copies)
+        notify_book_changed(book_id, inserted=True)
+        return True
+
+    def get_branches(self):
+        with self._lock:
+            return [dict(branch) for branch in self._branches.values()]
+
+    def get_branch(self, branch_id):
+        with self._lock:
+            branch = self._branches.get(branch_id)
+            return dict(branch) if branch else None
+
+    def insert_branch(self, code, name):
+        with self._lock:
+            if any(branch['code'] == code for branch in self._branches.values()):
+                return None
+            branch_id = next(self._ids['branches'])
+            self._branches[branch_id] = {'id': branch_id, 'code': code, 'name': name}
+            return branch_id
+
+    def get_branch_books(self, branch_id, order_by="title"):
+        with self._lock:
+            rows = [{**self._books[book_id], 'total_copies': by_branch[branch_id]['total_copies'],
+                     'available_copies': by_branch[branch_id]['available_copies']}
+                    for book_id, by_branch in self._holdings.items() if branch_id in by_branch]
+            rows.sort(key=lambda row: row[order_by])
+            return [self._book(row) for row in rows]
+
+    def get_book_holdings(self, book_id):
+        with self._lock:
+            return [{'branch_id': branch_id, 'code': self._branches[branch_id]['code'],
+                     'name': self._branches[branch_id]['name'],
+                     'total_copies': holding['total_copies'], 'available_copies': holding['available_copies']}
+                    for branch_id, holding in sorted(self._holdings.get(book_id, {}).items())]
+
+    def add_branch_copies(self, book_id, branch_id, copies):
+        with self._lock:
+            holding = self._holdings.get(book_id, {}).get(branch_id)
+            if holding:
+                ok = holding['available_copies'] + copies >= 0
+            else:
+                ok = copies > 0 and book_id in self._books and branch_id in self._branches
+            if ok:
+                self._adjust_holding(book_id, branch_id, copies, copies)
+        if ok:
+            notify_book_changed(book_id)
+        return ok
+
+    # Loans
+
+    def get_patron_borrow_count(self, patron_id):
+        with self._lock:
+            return self._open_loan_count(patron_id)
+
+    def get_patron_report(self, patron_id):
+        today = to_epoch_day(datetime.now())
+        with self._lock:
+            loans = sorted(self._loans_by_patron.get(patron_id, ()), key=lambda loan: loan['borrow_date'],
+                           reverse=True)
+            books = {loan['book_id']: self._books.get(loan['book_id']) for loan in loans}
+        loans = [loan for loan in loans if books[loan['book_id']]]
+
+        current, history, total_fees = [], [], 0.0
+        for loan in loans:
+            book = books[loan['book_id']]
+            history.append({'title': book['title'], 'author': book['author'], 'borrow_date': loan['borrow_date'],
+                            'due_date': loan['due_date'], 'return_date': loan['return_date']})
+            if loan['return_date'] is None:
+                fee = _late_fee(today - loan['due_day'])
+                total_fees += fee
+                current.append(Loan(loan['book_id'], book['title'], book['author'],
+                                    datetime.fromisoformat(loan['borrow_date']),
+                                    datetime.fromisoformat(loan['due_date']), fee > 0))
+        current.reverse()
+        return {'current': current, 'history': history, 'count': len(current),
+                'total_late_fees': round(total_fees, 2)}
+
+    def get_ledger_late_fee(self, patron_id, book_id):
+        # No background fee accrual here; callers fall back to computing the fee
+        return None
+
+    def get_overdue_loans(self, as_of=None, limit=None):
+        today = to_epoch_day(as_of or datetime.now())
+        with self._lock:
+            loans = sorted((loan for loan in self._loans.values()
+                            if loan['return_date'] is None and loan['due_day'] < today),
+                           key=lambda loan: (loan['due_day'], loan['id']))
+            # A negative limit means no limit, as in SQLite
+            if limit is not None and limit >= 0:
+                loans = loans[:limit]
+            return [{'id': loan['id'], 'patron_id': loan['patron_id'], 'book_id': loan['book_id'],
+                     'title': self._books[loan['book_id']]['title'],
+                     'author': self._books[loan['book_id']]['author'],
+                     'borrow_date': loan['borrow_date'], 'due_date': loan['due_date'],
+                     'days_overdue': today - loan['due_day']} for loan in loans]
+
+    def borrow_book_transaction(self, patron_id, book_id, borrow_date, due_date,
+                                max_borrowed=MAX_BORROWED_BOOKS, branch_id=None):
+        with self._lock:
+            expired = self._expire_ready_holds(borrow_date, book_id)
+            book = self._books.get(book_id)
+            hold = self._active_hold(patron_id, book_id)
+            if hold and hold['status'] != HOLD_READY:
+                hold = None
+            lending_branch = None
+            if hold:
+                lending_branch = hold['branch_id']
+            elif book and book['available_copies'] > 0:
+                shelves = [holding for holding in self._holdings.get(book_id, {}).values()
+                           if holding['available_copies'] > 0
+                           and (branch_id is None or holding['branch_id'] == branch_id)]
+                if shelves:
+                    lending_branch = min(shelves, key=lambda h: (-h['available_copies'], h['branch_id']))['branch_id']
+
+            if not book:
+                outcome = BORROW_BOOK_MISSING
+            elif not hold and lending_branch is None:
+                outcome = BORROW_UNAVAILABLE
+            elif self._open_loan_count(patron_id) >= max_borrowed:
+                outcome = BORROW_LIMIT_REACHED
+            else:
+                self._add_loan(patron_id, book_id, borrow_date, due_date, lending_branch)
+                if hold:
+                    hold['status'] = HOLD_FULFILLED
+                else:
+                    self._adjust_holding(book_id, lending_branch, available=-1)
+                outcome = BORROW_OK
+        if outcome == BORROW_OK or expired:
+            notify_book_changed(book_id)
+        return outcome
+
+    def _release_copy(self, book_id: int, branch_id: int, now: datetime) -> Optional[str]:
+        for hold in self._holds_by_book.get(book_id, ()):
+            if hold['status'] == HOLD_WAITING:
+                hold.update(status=HOLD_READY, ready_at=now.isoformat(), branch_id=branch_id)
+                return hold['patron_id']
+        self._adjust_holding(book_id, branch_id, available=1)
+        return None
+
+    def _expire_ready_holds(self, now: datetime, book_id: Optional[int] = None) -> List[Tuple[int, Optional[str]]]:
+        cutoff = (now - timedelta(days=HOLD_PICKUP_DAYS)).isoformat()
+        stale = sorted((hold for hold in (self._holds_by_book.get(book_id, ()) if book_id is not None
+                                          else self._holds.values())
+                        if hold['status'] == HOLD_READY and hold['ready_at'] <= cutoff),
+                       key=lambda hold: hold['ready_at'])
+        released = []
+        for hold in stale:
+            hold['status'] = HOLD_EXPIRED
+            released.append((hold['book_id'],
+                             self._release_copy(hold['book_id'], hold['branch_id'] or MAIN_BRANCH_ID, now)))
+        return released
+
+    def expire_ready_holds(self, now=None):
+        with self._lock:
+            released = self._expire_ready_holds(now or datetime.now())
+        for book_id in {book_id for book_id, _ in released}:
+            notify_book_changed(book_id)
+        return released
+
+    def return_book_transaction(self, patron_id, book_id, return_date, branch_id=None):
+        with self._lock:
+            loan = next((loan for loan in self._loans_by_patron.get(patron_id, ())
+                         if loan['book_id'] == book_id and loan['return_date'] is None), None)
+            if not loan:
+                return RETURN_NOT_BORROWED, None
+            loan['return_date'] = return_date.isoformat()
+            loan['return_day'] = to_epoch_day(return_date)
+            lending_branch = loan['branch_id'] or MAIN_BRANCH_ID
+            receiving_branch = branch_id or lending_branch
+            if receiving_branch != lending_branch:
+                self._adjust_holding(book_id, lending_branch, total=-1)
+                self._adjust_holding(book_id, receiving_branch, total=1)
+            ready_patron = self._release_copy(book_id, receiving_branch, return_date)
+        notify_book_changed(book_id)
+        return RETURN_OK, ready_patron
+
+    # Holds
+
+    def place_hold_transaction(self, patron_id, book_id, now=None):
+        now = now or datetime.now()
+        with self._lock:
+            expired = self._expire_ready_holds(now, book_id)
+            book = self._books.get(book_id)
+            if not book:
+                outcome = HOLD_BOOK_MISSING
+            elif book['available_copies'] > 0:
+                outcome = HOLD_BOOK_AVAILABLE
+            elif any(loan['book_id'] == book_id and loan['return_date'] is None
+                     for loan in self._loans_by_patron.get(patron_id, ())):
+                outcome = HOLD_ALREADY_BORROWED
+            elif self._active_hold(patron_id, book_id):
+                outcome = HOLD_EXISTS
+            else:
+                hold = {'id': next(self._ids['holds']), 'patron_id': patron_id, 'book_id': book_id,
+                        'status': HOLD_WAITING, 'created_at': now.isoformat(),
+                        'ready_at': None, 'branch_id': None}
+                self._holds[hold['id']] = hold
+                self._holds_by_book.setdefault(book_id, []).append(hold)
+                outcome = HOLD_PLACED
+        if expired:
+            notify_book_changed(book_id)
+        return outcome
+
+    def cancel_hold_transaction(self, patron_id, book_id, now=None):
+        released = False
+        ready_patron = None
+        with self._lock:
+            hold = self._active_hold(patron_id, book_id)
+            if hold:
+                was_ready = hold['status'] == HOLD_READY
+                hold['status'] = HOLD_CANCELLED
+                if was_ready:
+                    ready_patron = self._release_copy(book_id, hold['branch_id'] or MAIN_BRANCH_ID,
+                                                      now or datetime.now())
+                    released = True
+        if released:
+            notify_book_changed(book_id)
+        return hold is not None, ready_patron
+
+    def get_hold(self, patron_id, book_id):
+        with self._lock:
+            hold = self._active_hold(patron_id, book_id)
+            if not hold:
+                return None
+            position = 0
+            if hold['status'] == HOLD_WAITING:
+                position = sum(1 for other in self._holds_by_book[book_id]
+                               if other['status'] == HOLD_WAITING and other['id'] <= hold['id'])
+            return {'status': hold['status'], 'created_at': hold['created_at'], 'ready_at': hold['ready_at'],
+                    'branch_id': hold['branch_id'], 'position': position}
+
+    def get_last_hold_status(self, patron_id, book_id):
+        with self._lock:
+            holds = [hold for hold in self._holds_by_book.get(book_id, ()) if hold['patron_id'] == patron_id]
+            return max(holds, key=lambda hold: hold['id'])['status'] if holds else None
+
+
+BACKENDS = {
+    SqliteRepository.name: SqliteRepository,
+    InMemoryRepository.name: InMemoryRepository,
+}
+
+# The backend every function below goes through
+_repository: Repository = SqliteRepository()
+
+
+def configure_repository(backend: Union[str, Repository] = 'sqlite') -> Repository:
+    """
+    Switch storage backends: 'sqlite', 'memory' (a fresh, empty store) or a
+    Repository instance. Caches derived from the catalog are reset unless both
+    the old and new backend read the same SQLite file.
+    """
+    global _repository
+    if isinstance(backend, str):
+        if backend not in BACKENDS:
+            raise ValueError(f'Unknown storage backend: {backend}')
+        backend = BACKENDS[backend]()
+    previous, _repository = _repository, backend
+    if not (isinstance(previous, SqliteRepository) and isinstance(backend, SqliteRepository)):
+        # Caches built from the previous backend's catalog no longer apply
+        notify_book_changed(None)
+    return backend
+
+def get_repository() -> Repository:
+    """Get the active storage backend."""
+    return _repository
+
+
+# Shortcuts to the active backend; see Repository and the database.py helpers of the same name
+
+def conn_execute_read(query: Union[Query, str], params: tuple = ()) -> List[Dict]:
+    return _repository.conn_execute_read(query, params)
+
+def get_catalog_version() -> int:
+    return _repository.get_catalog_version()
+
+def get_all_books(order_by: str = "title") -> List[Book]:
+    return _repository.get_all_books(order_by)
+
+def get_book_by_id(book_id: int) -> Optional[Book]:
+    return _repository.get_book_by_id(book_id)
+
+def get_book_by_isbn(isbn: str) -> Optional[Book]:
+    return _repository.get_book_by_isbn(isbn)
+
+def isbn_may_exist(isbn: str) -> bool:
+    return _repository.isbn_may_exist(isbn)
+
+def insert_book(title: str, author: str, isbn: str, total_copies: int, available_copies: int,
+                branch_id: int = MAIN_BRANCH_ID) -> bool:
+    return _repository.insert_book(title, author, isbn, total_copies, available_copies, branch_id)
+
+def get_branches() -> List[Dict]:
+    return _repository.get_branches()
+
+def get_branch(branch_id: int) -> Optional[Dict]:
+    return _repository.get_branch(branch_id)
+
+def get_branch_books(branch_id: int, order_by: str = "title") -> List[Book]:
+    return _repository.get_branch_books(branch_id, order_by)
+
+def get_book_holdings(book_id: int) -> List[Dict]:
+    return _repository.get_book_holdings(book_id)
+
+def get_patron_borrow_count(patron_id: str) -> int:
+    return _repository.get_patron_borrow_count(patron_id)
+
+def get_patron_report(patron_id: str) -> Dict:
+    return _repository.get_patron_report(patron_id)
+
+def get_ledger_late_fee(patron_id: str, book_id: int) -> Optional[Dict]:
+    return _repository.get_ledger_late_fee(patron_id, book_id)
+
+def get_overdue_loans(as_of: Optional[datetime] = None, limit: Optional[int] = None) -> List[Dict]:
+    return _repository.get_overdue_loans(as_of, limit)
+
+def borrow_book_transaction(patron_id: str, book_id: int, borrow_date: datetime, due_date: datetime,
+                            max_borrowed: int = MAX_BORROWED_BOOKS, branch_id: Optional[int] = None) -> str:
+    return _repository.borrow_book_transaction(patron_id, book_id, borrow_date, due_date, max_borrowed, branch_id)
+
+def return_book_transaction(patron_id: str, book_id: int, return_date: datetime,
+                            branch_id: Optional[int] = None) -> Tuple[str, Optional[str]]:
+    return _repository.return_book_transaction(patron_id, book_id, return_date, branch_id)
+
+def place_hold_transaction(patron_id: str, book_id: int, now: Optional[datetime] = None) -> str:
+    return _repository.place_hold_transaction(patron_id, book_id, now)
+
+def cancel_hold_transaction(patron_id: str, book_id: int,
+                            now: Optional[datetime] = None) -> Tuple[bool, Optional[str]]:
+    return _repository.cancel_hold_transaction(patron_id, book_id, now)
+
+def expire_ready_holds(now: Optional[datetime] = None) -> List[Tuple[int, Optional[str]]]:
+    return _repository.expire_ready_holds(now)
+
+def get_hold(patron_id: str, book_id: int) -> Optional[Dict]:
+    return _repository.get_hold(patron_id, book_id)
+
+def get_last_hold_status(patron_id: str, book_id: int) -> Optional[str]:
+    return _repository.get_last_hold_status(patron_id, book_id)
@@ -2,14 +2,23 @@
 Routes Package - Initialize all route blueprints
 """
 
-from .catalog_routes import catalog_bp
-from .borrowing_routes import borrowing_bp
-from .search_routes import search_bp
-from .api_routes import api_bp
-
 def register_blueprints(app):
-    """Register all route blueprints with the Flask app."""
+    """
+    Register all route blueprints with the Flask app.
+
+    Blueprint modules are imported here rather than at package import so that
+    importing routes stays cheap for processes that never build an app.
+    """
+    from .catalog_routes import catalog_bp
+    from .borrowing_routes import borrowing_bp
+    from .search_routes import search_bp
+    from .api_routes import api_bp
+    from .export_routes import export_bp
+    from .admin_routes import admin_bp
+
     app.register_blueprint(catalog_bp)
     app.register_blueprint(borrowing_bp)
     app.register_blueprint(search_bp)
     app.register_blueprint(api_bp)
+    app.register_blueprint(export_bp)
+    app.register_blueprint(admin_bp)
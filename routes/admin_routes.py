@@ -0,0 +1,47 @@
+"""
+Admin Routes - request profiles captured by profiling.py
+"""
+
+from flask import Blueprint, Response, current_app, jsonify, request
+
+admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
+
+def _profile_store():
+    return current_app.extensions.get('profiles')
+
+@admin_bp.route('/profiles')
+def list_profiles():
+    """
+    List the slowest recently profiled requests (limit, default 20), slowest first.
+    """
+    store = _profile_store()
+    if store is None:
+        return jsonify({'error': 'Profiling is not enabled'}), 404
+    try:
+        limit = int(request.args.get('limit', 20))
+    except ValueError:
+        return jsonify({'error': 'Limit must be an integer'}), 400
+
+    extensions = {'cprofile': 'pstats', 'stacks': 'collapsed'}
+    return jsonify({'results': [
+        {**profile.summary(), 'download': f'/admin/profiles/{profile.id}.{extensions[profile.kind]}'}
+        for profile in store.slowest(limit)
+    ]})
+
+@admin_bp.route('/profiles/<profile_id>.<profile_format>')
+def download_profile(profile_id, profile_format):
+    """
+    Download one profile: .pstats for cProfile runs, .collapsed for sampled stacks.
+    """
+    store = _profile_store()
+    profile = store.get(profile_id) if store is not None else None
+    if profile is None:
+        return jsonify({'error': 'Profile not found'}), 404
+
+    if profile_format == 'pstats' and profile.kind == 'cprofile':
+        return Response(profile.pstats_bytes(), mimetype='application/octet-stream', headers={
+            'Content-Disposition': f'attachment; filename={profile_id}.pstats'
+        })
+    if profile_format == 'collapsed' and profile.kind == 'stacks':
+        return Response(profile.collapsed(), mimetype='text/plain')
+    return jsonify({'error': f'A {profile.kind} profile cannot be downloaded as {profile_format}'}), 404
@@ -2,11 +2,34 @@
 API Routes - JSON API endpoints
 """
 
-from flask import Blueprint, jsonify, request
-from services.library_service import calculate_late_fee_for_book, search_books_in_catalog
+import math
+import time
+
+from flask import Blueprint, current_app, jsonify, request
+from database import HOLD_CANCELLED, HOLD_EXPIRED, HOLD_FULFILLED, HOLD_WAITING
+from repository import (
+    get_hold, get_last_hold_status, get_book_by_id, get_book_holdings, get_branches, get_overdue_loans
+)
+from json_provider import stream_json_array
+from services.hold_notifier import hold_notifier, HOLD_RECHECK_INTERVAL
+from services.idempotency import IdempotencyKeyError, get_idempotency_key, run_idempotent
+from services.library_service import (
+    calculate_late_fee_for_book, search_books_in_catalog, get_patron_status_report, pay_late_fees,
+    place_hold, cancel_hold
+)
+from services.payment_service import get_payment_gateway
+from services.search_cache import search_cache
+from services.suggest_index import suggest_index, DEFAULT_LIMIT, MAX_LIMIT
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
+# Why a long-polled hold stopped being active, by its final status
+HOLD_ENDED_MESSAGES = {
+    HOLD_FULFILLED: 'Hold was fulfilled',
+    HOLD_EXPIRED: 'Hold expired before it was picked up',
+    HOLD_CANCELLED: 'Hold was cancelled',
+}
+
 @api_bp.route('/late_fee/<patron_id>/<int:book_id>')
 def get_late_fee(patron_id, book_id):
     """
@@ -16,11 +39,94 @@ def get_late_fee(patron_id, book_id):
     result = calculate_late_fee_for_book(patron_id, book_id)
     return jsonify(result), 501 if 'not implemented' in result.get('status', '') else 200
 
+@api_bp.route('/late_fee/<patron_id>/<int:book_id>/pay', methods=['POST'])
+def pay_late_fee(patron_id, book_id):
+    """
+    Pay the late fee for a book through the payment gateway.
+
+    A retry carrying the same Idempotency-Key gets the first attempt's result
+    instead of charging again.
+    """
+    try:
+        key = get_idempotency_key(request.headers, request.form)
+        success, message, transaction_id = run_idempotent(
+            key, ('pay', patron_id, book_id), pay_late_fees, patron_id, book_id)
+    except IdempotencyKeyError as exc:
+        return jsonify({'success': False, 'message': str(exc), 'transaction_id': None}), 422
+    return jsonify({
+        'success': success,
+        'message': message,
+        'transaction_id': transaction_id
+    }), 200 if success else 400
+
+@api_bp.route('/holds/<patron_id>/<int:book_id>', methods=['GET', 'POST', 'DELETE'])
+def hold_api(patron_id, book_id):
+    """
+    Place (POST), cancel (DELETE) or look up (GET) a patron's hold on a book.
+    """
+    if request.method != 'GET':
+        success, message = (place_hold if request.method == 'POST' else cancel_hold)(patron_id, book_id)
+        return jsonify({'success': success, 'message': message, 'hold': get_hold(patron_id, book_id)}), \
+            200 if success else 400
+
+    hold = get_hold(patron_id, book_id)
+    if hold is None:
+        return jsonify({'error': 'No active hold'}), 404
+    return jsonify(hold)
+
+@api_bp.route('/holds/<patron_id>/<int:book_id>/wait')
+def hold_wait_api(patron_id, book_id):
+    """
+    Long-poll until a hold is ready, instead of polling the catalog.
+
+    Returns the hold as soon as a returned copy is set aside for the patron,
+    or its current state (still waiting, with queue position) after `timeout`
+    seconds (default 30, at most 60); clients then simply ask again.
+    """
+    try:
+        timeout = float(request.args.get('timeout', 30))
+    except ValueError:
+        return jsonify({'error': 'Timeout must be a number'}), 400
+    if not math.isfinite(timeout):
+        return jsonify({'error': 'Timeout must be a number'}), 400
+    timeout = min(max(timeout, 0.0), 60.0)
+
+    deadline = time.monotonic() + timeout
+    # Watch before reading the hold so a notification in between isn't lost
+    with hold_notifier.watch(patron_id, book_id) as watch:
+        hold = get_hold(patron_id, book_id)
+        if hold is None:
+            return jsonify({'error': 'No active hold'}), 404
+
+        while hold is not None and hold['status'] == HOLD_WAITING:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            watch.wait(min(remaining, HOLD_RECHECK_INTERVAL))
+            hold = get_hold(patron_id, book_id)
+
+    if hold is None:
+        status = get_last_hold_status(patron_id, book_id)
+        return jsonify({'error': HOLD_ENDED_MESSAGES.get(status, 'No active hold'), 'status': status}), 404
+    return jsonify(hold)
+
+@api_bp.route('/patron/<patron_id>/status')
+def patron_status_api(patron_id):
+    """
+    Get a patron's current loans, late fee total and borrowing history.
+    API endpoint for R7: Patron Status Report
+    """
+    report = get_patron_status_report(patron_id)
+    return jsonify(report), 400 if report['status'] == 'Invalid patron ID' else 200
+
 @api_bp.route('/search')
 def search_books_api():
     """
     Search for books via API endpoint.
     Alternative API interface for R5: Book Search Functionality
+
+    Pass stream=1 to receive the bare results array as a streamed response, and
+    branch=<id> to search one branch's holdings.
     """
     search_term = request.args.get('q', '').strip()
     search_type = request.args.get('type', 'title')
@@ -28,8 +134,16 @@ def search_books_api():
     if not search_term:
         return jsonify({'error': 'Search term is required'}), 400
     
+    try:
+        branch_id = int(request.args['branch']) if 'branch' in request.args else None
+    except ValueError:
+        return jsonify({'error': 'Branch must be an integer'}), 400
+    
     # Use business logic function
-    books = search_books_in_catalog(search_term, search_type)
+    books = search_books_in_catalog(search_term, search_type, branch_id)
+
+    if request.args.get('stream'):
+        return stream_json_array(books, current_app.json)
     
     return jsonify({
         'search_term': search_term,
@@ -37,3 +151,78 @@ def search_books_api():
         'results': books,
         'count': len(books)
     })
+
+@api_bp.route('/branches')
+def branches_api():
+    """
+    List the library's branches.
+    """
+    return jsonify({'results': get_branches()})
+
+@api_bp.route('/books/<int:book_id>/availability')
+def book_availability_api(book_id):
+    """
+    A book's copies library-wide and at each branch that holds it.
+    """
+    book = get_book_by_id(book_id)
+    if book is None:
+        return jsonify({'error': 'Book not found'}), 404
+    return jsonify({
+        'book_id': book_id,
+        'total_copies': book.total_copies,
+        'available_copies': book.available_copies,
+        'branches': get_book_holdings(book_id)
+    })
+
+@api_bp.route('/suggest')
+def suggest_api():
+    """
+    Typeahead completions for titles and authors starting with q.
+    """
+    prefix = request.args.get('q', '').strip()
+    if not prefix:
+        return jsonify({'error': 'Search term is required'}), 400
+
+    try:
+        limit = int(request.args.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'Limit must be an integer'}), 400
+    limit = max(1, min(limit, MAX_LIMIT))
+
+    return jsonify({'query': prefix, **suggest_index.suggest(prefix, limit)})
+
+@api_bp.route('/search/stats')
+def search_cache_stats_api():
+    """
+    Report search cache counters (hits, misses, evictions, size) for tuning.
+    """
+    return jsonify(search_cache.stats())
+
+@api_bp.route('/payments/stats')
+def payment_stats_api():
+    """
+    Report payment gateway health: circuit breaker state, call/error counts and latencies.
+    """
+    return jsonify(get_payment_gateway().stats())
+
+@api_bp.route('/overdue')
+def overdue_loans_api():
+    """
+    List open loans past their due date, most overdue first.
+
+    Pass stream=1 to receive the bare results array as a streamed response.
+    """
+    try:
+        limit = int(request.args['limit']) if 'limit' in request.args else None
+    except ValueError:
+        return jsonify({'error': 'Limit must be an integer'}), 400
+
+    loans = get_overdue_loans(limit=limit)
+
+    if request.args.get('stream'):
+        return stream_json_array(loans, current_app.json)
+
+    return jsonify({
+        'results': loans,
+        'count': len(loans)
+    })
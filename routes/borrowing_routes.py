@@ -2,11 +2,29 @@
 Borrowing Routes - Book borrowing and returning endpoints
 """
 
+from typing import Optional, Tuple
+
 from flask import Blueprint, render_template, request, redirect, url_for, flash
-from services.library_service import borrow_book_by_patron, return_book_by_patron
+from repository import get_branches
+from services.idempotency import IdempotencyKeyError, get_idempotency_key, run_idempotent
+from services.library_service import borrow_book_by_patron, return_book_by_patron, place_hold
 
 borrowing_bp = Blueprint('borrowing', __name__)
 
+def _form_branch_id() -> Optional[int]:
+    """The optional branch_id form field; None when absent or not a number."""
+    try:
+        return int(request.form['branch_id'])
+    except (KeyError, ValueError):
+        return None
+
+def _run_once(fingerprint: tuple, fn, *args) -> Tuple[bool, str]:
+    """Run a circulation call at most once per client idempotency key."""
+    try:
+        return run_idempotent(get_idempotency_key(request.headers, request.form), fingerprint, fn, *args)
+    except IdempotencyKeyError as exc:
+        return False, str(exc)
+
 @borrowing_bp.route('/borrow', methods=['POST'])
 def borrow_book():
     """
@@ -22,7 +40,27 @@ def borrow_book():
         return redirect(url_for('catalog.catalog'))
     
     # Use business logic function
-    success, message = borrow_book_by_patron(patron_id, book_id)
+    branch_id = _form_branch_id()
+    success, message = _run_once(('borrow', patron_id, book_id, branch_id),
+                                 borrow_book_by_patron, patron_id, book_id, branch_id)
+    
+    flash(message, 'success' if success else 'error')
+    return redirect(url_for('catalog.catalog', branch=branch_id))
+
+@borrowing_bp.route('/hold', methods=['POST'])
+def hold_book():
+    """
+    Place a hold on an unavailable book.
+    """
+    patron_id = request.form.get('patron_id', '').strip()
+    
+    try:
+        book_id = int(request.form.get('book_id', ''))
+    except (ValueError, TypeError):
+        flash('Invalid book ID.', 'error')
+        return redirect(url_for('catalog.catalog'))
+    
+    success, message = place_hold(patron_id, book_id)
     
     flash(message, 'success' if success else 'error')
     return redirect(url_for('catalog.catalog'))
@@ -33,8 +71,9 @@ def return_book():
     Process book return.
     Web interface for R3: Book Return Processing
     """
+    branches = get_branches()
     if request.method == 'GET':
-        return render_template('return_book.html')
+        return render_template('return_book.html', branches=branches)
     
     patron_id = request.form.get('patron_id', '').strip()
     
@@ -42,10 +81,12 @@ def return_book():
         book_id = int(request.form.get('book_id', ''))
     except (ValueError, TypeError):
         flash('Invalid book ID.', 'error')
-        return render_template('return_book.html')
+        return render_template('return_book.html', branches=branches)
     
     # Use business logic function
-    success, message = return_book_by_patron(patron_id, book_id)
+    branch_id = _form_branch_id()
+    success, message = _run_once(('return', patron_id, book_id, branch_id),
+                                 return_book_by_patron, patron_id, book_id, branch_id)
     
     flash(message, 'success' if success else 'error')
-    return render_template('return_book.html')
+    return render_template('return_book.html', branches=branches)
@@ -2,12 +2,59 @@
 Catalog Routes - Book catalog related endpoints
 """
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash
-from database import get_all_books
+import json
+from typing import Dict, Optional, Tuple
+
+from flask import (Blueprint, Response, current_app, render_template, request, redirect, url_for, flash,
+                   stream_with_context)
+from markupsafe import Markup
+from database import Book, register_book_change_listener
+from repository import get_all_books, get_branch, get_branch_books, get_branches
+from services.availability_feed import availability_broker
 from services.library_service import add_book_to_catalog
 
 catalog_bp = Blueprint('catalog', __name__)
 
+
+class RowFragmentCache:
+    """
+    Rendered catalog table rows, keyed by book id.
+
+    Each entry remembers the availability it was rendered with, so a row whose
+    copies changed is re-rendered even if an invalidation was missed. Write
+    paths in database.py evict entries through the book change listener.
+    """
+
+    def __init__(self):
+        self._rows: Dict[int, Tuple[Tuple[int, int], Markup]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, book) -> Markup:
+        """Get the cached row for a book, rendering it on a miss."""
+        version = (book.available_copies, book.total_copies)
+        entry = self._rows.get(book.id)
+        if entry is not None and entry[0] == version:
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        template = current_app.jinja_env.get_template('_catalog_row.html')
+        row = Markup(template.render(book=book))
+        self._rows[book.id] = (version, row)
+        return row
+
+    def invalidate(self, book_id: Optional[int] = None, inserted: bool = False):
+        """Drop one book's row, or every row when book_id is None."""
+        if book_id is None:
+            self._rows.clear()
+        else:
+            self._rows.pop(book_id, None)
+
+
+row_cache = RowFragmentCache()
+register_book_change_listener(row_cache.invalidate)
+
 @catalog_bp.route('/')
 def index():
     """Home page redirects to catalog."""
@@ -18,9 +65,60 @@ def catalog():
     """
     Display all books in the catalog.
     Implements R2: Book Catalog Display
+
+    With ?branch=<id>, lists only that branch's books and copy counts. Branch
+    rows are rendered per request; the row cache and live feed cover the
+    library-wide view.
+    """
+    branches = get_branches()
+    branch_id = request.args.get('branch', type=int)
+    branch = get_branch(branch_id) if branch_id is not None else None
+    if branch:
+        template = current_app.jinja_env.get_template('_catalog_row.html')
+        rows = [Markup(template.render(book=book, branch=branch)) for book in get_branch_books(branch['id'])]
+        return render_template('catalog.html', rows=rows, branches=branches, branch=branch)
+
+    # Taken before reading the books, so the live feed replays anything after it
+    feed_seq = availability_broker.last_seq
+    rows = [row_cache.render(book) for book in get_all_books()]
+    return render_template('catalog.html', rows=rows, feed_seq=feed_seq, branches=branches, branch=None)
+
+@catalog_bp.route('/catalog/stream')
+def catalog_stream():
     """
-    books = get_all_books()
-    return render_template('catalog.html', books=books)
+    Server-Sent Events feed of catalog availability changes.
+
+    Each "availability" event carries a book's current copy counts plus its
+    re-rendered catalog row; "resync" asks the client to reload the catalog
+    (it fell too far behind, or the whole catalog changed). Resumes from the
+    Last-Event-ID header or the since query parameter.
+    """
+    last_seq = request.headers.get('Last-Event-ID') or request.args.get('since')
+    try:
+        last_seq = int(last_seq) if last_seq else None
+    except ValueError:
+        last_seq = None
+    heartbeat = current_app.config.get('SSE_HEARTBEAT', 15.0)
+    subscription = availability_broker.subscribe(last_seq)
+
+    def generate():
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                resync, events = subscription.next_batch(heartbeat)
+                if resync:
+                    yield 'event: resync\ndata: {}\n\n'
+                for event in events:
+                    book = Book(*(event[key] for key in Book.__slots__))
+                    data = {**dict(book), 'html': str(row_cache.render(book)), 'inserted': event['inserted']}
+                    yield f"id: {event['seq']}\nevent: availability\ndata: {json.dumps(data)}\n\n"
+                if not resync and not events:
+                    yield ': keepalive\n\n'
+        finally:
+            availability_broker.unsubscribe(subscription)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @catalog_bp.route('/add_book', methods=['GET', 'POST'])
 def add_book():
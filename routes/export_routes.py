@@ -0,0 +1,44 @@
+"""
+Export Routes - streaming catalog and loan dumps for auditors
+"""
+
+from datetime import date
+
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+
+from repository import get_repository
+from services.export_service import DATASETS, EXPORT_FORMATS, iter_export
+
+export_bp = Blueprint('export', __name__, url_prefix='/export')
+
+@export_bp.route('/<dataset>.<export_format>')
+def export_dataset(dataset, export_format):
+    """
+    Stream the books or loans table as CSV or JSON Lines.
+
+    Filters (query string): available=1 (books); patron, from, to
+    (YYYY-MM-DD, inclusive borrow dates) and archived=1 (loans).
+    """
+    if dataset not in DATASETS or export_format not in EXPORT_FORMATS:
+        return jsonify({'error': 'Unknown export'}), 404
+    if get_repository().name != 'sqlite':
+        return jsonify({'error': 'Exports need the SQLite storage backend'}), 501
+
+    filters = {}
+    if dataset == 'books':
+        filters['available_only'] = bool(request.args.get('available'))
+    else:
+        try:
+            if request.args.get('from'):
+                filters['start'] = date.fromisoformat(request.args['from'])
+            if request.args.get('to'):
+                filters['end'] = date.fromisoformat(request.args['to'])
+        except ValueError:
+            return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+        filters['patron_id'] = request.args.get('patron') or None
+        filters['include_archived'] = bool(request.args.get('archived'))
+
+    chunks = iter_export(dataset, export_format, dumps=current_app.json.dumps_bytes, **filters)
+    return Response(stream_with_context(chunks), mimetype=EXPORT_FORMATS[export_format], headers={
+        'Content-Disposition': f'attachment; filename={dataset}.{export_format}'
+    })
@@ -3,6 +3,7 @@ Search Routes - Book search functionality
 """
 
 from flask import Blueprint, render_template, request, flash
+from repository import get_branches
 from services.library_service import search_books_in_catalog
 
 search_bp = Blueprint('search', __name__)
@@ -15,14 +16,18 @@ def search_books():
     """
     search_term = request.args.get('q', '').strip()
     search_type = request.args.get('type', 'title')
+    branch_id = request.args.get('branch', type=int)
+    branches = get_branches()
     
     if not search_term:
-        return render_template('search.html', books=[], search_term='', search_type=search_type)
+        return render_template('search.html', books=[], search_term='', search_type=search_type,
+                               branches=branches, branch_id=branch_id)
     
     # Use business logic function
-    books = search_books_in_catalog(search_term, search_type)
+    books = search_books_in_catalog(search_term, search_type, branch_id)
     
     if not books:
         flash('No books found under search criteria.', 'error')
     
-    return render_template('search.html', books=books, search_term=search_term, search_type=search_type)
+    return render_template('search.html', books=books, search_term=search_term, search_type=search_type,
+                           branches=branches, branch_id=branch_id)
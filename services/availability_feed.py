@@ -0,0 +1,147 @@
+"""
+Availability Feed Module - in-process pub/sub of per-book availability changes
+
+The broker listens for book changes (borrows, returns, holds, update_book_availability,
+insert_book) and publishes the book's current copy counts to every subscriber;
+routes/catalog_routes.py streams them to browsers as Server-Sent Events.
+
+Backpressure: events carry absolute state, so a subscriber's pending queue keeps
+only the latest event per book. A slow client therefore never sees stale
+counts, and its queue is bounded by max_pending distinct books. Past that the
+queue is dropped and the client is told to resync (reload the catalog) instead
+of the publisher blocking or memory growing. Recent events are kept in a short
+history so a reconnecting client (Last-Event-ID) can catch up without a reload.
+"""
+
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Tuple
+
+from database import register_book_change_listener
+from repository import get_book_by_id
+
+
+class Subscription:
+    """One listener's bounded, per-book coalescing queue of pending events."""
+
+    def __init__(self, max_pending: int):
+        self.max_pending = max_pending
+        self._cond = threading.Condition()
+        self._pending: "OrderedDict[int, Dict]" = OrderedDict()
+        self._resync = False
+
+    def offer(self, event: Dict) -> bool:
+        """Queue an event without blocking; returns False if this event overflowed the queue."""
+        with self._cond:
+            if self._resync:
+                # The client reloads everything anyway
+                return True
+            book_id = event['id']
+            if book_id not in self._pending and len(self._pending) >= self.max_pending:
+                self._pending.clear()
+                self._resync = True
+                self._cond.notify()
+                return False
+            self._pending.pop(book_id, None)
+            self._pending[book_id] = event
+            self._cond.notify()
+            return True
+
+    def request_resync(self):
+        with self._cond:
+            self._pending.clear()
+            self._resync = True
+            self._cond.notify()
+
+    def next_batch(self, timeout: float) -> Tuple[bool, List[Dict]]:
+        """
+        Wait up to timeout for events.
+
+        Returns:
+            tuple: (whether the client must resync, events in publish order)
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._pending or self._resync, timeout)
+            resync, events = self._resync, list(self._pending.values())
+            self._pending.clear()
+            self._resync = False
+            return resync, events
+
+
+class AvailabilityBroker:
+    """Fan-out of book availability events to subscribers."""
+
+    def __init__(self, max_pending: int = 256, history: int = 1024):
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._subscribers: List[Subscription] = []
+        self._history: "deque[Dict]" = deque(maxlen=history)
+        self.last_seq = 0
+        self._counters = dict.fromkeys(('published', 'resyncs'), 0)
+
+    def subscribe(self, last_seq: Optional[int] = None) -> Subscription:
+        """
+        Start receiving events, replaying those after last_seq if given.
+
+        If last_seq is older than the retained history the subscription starts
+        with a resync.
+        """
+        subscription = Subscription(self.max_pending)
+        with self._lock:
+            if last_seq is not None and last_seq < self.last_seq:
+                oldest = self._history[0]['seq'] if self._history else self.last_seq + 1
+                if last_seq + 1 < oldest:
+                    subscription.request_resync()
+                else:
+                    for event in self._history:
+                        if event['seq'] > last_seq:
+                            subscription.offer(event)
+            self._subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+
+    def publish(self, book: Dict, inserted: bool = False) -> Dict:
+        """Send a book's current state to every subscriber."""
+        with self._lock:
+            self.last_seq += 1
+            event = {**book, 'seq': self.last_seq, 'inserted': inserted}
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+            self._counters['published'] += 1
+        dropped = sum(not subscription.offer(event) for subscription in subscribers)
+        if dropped:
+            with self._lock:
+                self._counters['resyncs'] += dropped
+        return event
+
+    def resync_all(self):
+        """Tell every subscriber to reload, e.g. after the whole catalog changed."""
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self._history.clear()
+        for subscription in subscribers:
+            subscription.request_resync()
+
+    def on_book_changed(self, book_id: Optional[int], inserted: bool = False):
+        """Book change listener: publish the book's fresh copy counts."""
+        if not self._subscribers:
+            return
+        if book_id is None:
+            self.resync_all()
+            return
+        book = get_book_by_id(book_id)
+        if book is not None:
+            self.publish(dict(book), inserted)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {**self._counters, 'subscribers': len(self._subscribers), 'last_seq': self.last_seq}
+
+
+# Shared by every request in this process
+availability_broker = AvailabilityBroker()
+register_book_change_listener(availability_broker.on_book_changed)
@@ -0,0 +1,234 @@
+"""
+Catalog Snapshot Module - memory-mapped, read-only copy of the catalog for search
+
+The exporter writes the books' static columns (id, title, author, isbn) to a
+compact columnar file: one int64 id array, then for each string column a uint32
+offsets array and a UTF-8 string heap, rows sorted by title. Worker processes
+map the same file read-only, so it is shared through the page cache, and a
+title/author search is a byte scan over the heap (mmap.find) with no per-row
+Python objects until a row actually matches.
+
+The file carries the catalog version it was built from (catalog_meta.version,
+bumped by triggers on books). A reader that sees a newer version re-exports to
+a temporary file and swaps it in with os.replace, so other readers only ever
+see a complete snapshot. Availability changes on every borrow, so copy counts
+are not part of the snapshot and are read from SQLite for the matching rows.
+"""
+
+import mmap
+import os
+import struct
+import threading
+from bisect import bisect_right
+from typing import Dict, List, Optional
+
+from database import get_db_connection, get_catalog_version
+
+MAGIC = b'LIBSNAP1'
+STRING_COLUMNS = ('title', 'author', 'isbn', 'title_key', 'author_key')
+
+# magic, catalog version, row count, then the start of each section:
+# ids, and an (offsets, heap) pair per string column, and the end of the file
+HEADER = struct.Struct(f'<8sQQ{2 + 2 * len(STRING_COLUMNS)}Q')
+
+# Largest number of ids bound into one copy-count lookup
+LOOKUP_CHUNK = 500
+
+
+def _align(size: int) -> int:
+    return (size + 7) & ~7
+
+
+def export_snapshot(path: str) -> int:
+    """
+    Write the current catalog to a snapshot file, atomically replacing any old one.
+
+    Args:
+        path: destination file
+
+    Returns:
+        int: the catalog version the snapshot was built from
+    """
+    conn = get_db_connection()
+    try:
+        # Read the version and the rows in one transaction so they agree
+        conn.execute('BEGIN')
+        version = get_catalog_version(conn)
+        rows = conn.execute('SELECT id, title, author, isbn FROM books ORDER BY title, id').fetchall()
+        conn.execute('COMMIT')
+    finally:
+        conn.close()
+
+    ids = struct.pack(f'<{len(rows)}q', *(row['id'] for row in rows))
+    columns = {
+        'title': [row['title'] for row in rows],
+        'author': [row['author'] for row in rows],
+        'isbn': [row['isbn'] for row in rows],
+    }
+    sections = [ids]
+    for name in STRING_COLUMNS:
+        if name.endswith('_key'):
+            # Lowercased ASCII only, the same case folding SQLite's LIKE applies
+            values = [value.encode('utf-8').lower() for value in columns[name[:-4]]]
+        else:
+            values = [value.encode('utf-8') for value in columns[name]]
+        offsets = [0]
+        for value in values:
+            offsets.append(offsets[-1] + len(value))
+        sections.append(struct.pack(f'<{len(offsets)}I', *offsets))
+        sections.append(b''.join(values))
+
+    starts = []
+    position = HEADER.size
+    for section in sections:
+        starts.append(position)
+        position = _align(position + len(section))
+    starts.append(position)
+
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, version, len(rows), *starts))
+        for start, section in zip(starts, sections):
+            f.seek(start)
+            f.write(section)
+        f.truncate(position)
+    os.replace(tmp_path, path)
+    return version
+
+
+class CatalogSnapshot:
+    """A read-only mapping of one snapshot file."""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.version, self.count, *starts = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a catalog snapshot')
+
+        view = memoryview(self._mmap)
+        self.ids = view[starts[0]:starts[0] + 8 * self.count].cast('q')
+        self._offsets = {}
+        self._heaps = {}
+        for i, name in enumerate(STRING_COLUMNS):
+            offsets_start, heap_start = starts[1 + 2 * i], starts[2 + 2 * i]
+            self._offsets[name] = view[offsets_start:offsets_start + 4 * (self.count + 1)].cast('I')
+            self._heaps[name] = heap_start
+
+    def value(self, column: str, row: int) -> str:
+        """Decode one string cell."""
+        offsets, heap = self._offsets[column], self._heaps[column]
+        return self._mmap[heap + offsets[row]:heap + offsets[row + 1]].decode('utf-8')
+
+    def find_rows(self, column: str, needle: bytes) -> List[int]:
+        """Get the row numbers (in title order) whose column contains needle."""
+        offsets, heap = self._offsets[column], self._heaps[column]
+        end = heap + offsets[self.count]
+        rows = []
+        position = self._mmap.find(needle, heap, end)
+        while position != -1:
+            row = bisect_right(offsets, position - heap) - 1
+            row_end = heap + offsets[row + 1]
+            # A match straddling two rows is not a match; any later one in this
+            # row would straddle too, so either way resume at the next row
+            if position + len(needle) <= row_end:
+                rows.append(row)
+            position = self._mmap.find(needle, row_end, end)
+        return rows
+
+
+class SnapshotSearch:
+    """
+    Title/author search over a catalog snapshot, refreshed when the catalog changes.
+
+    Disabled until configure() is given a path; search() returns None whenever
+    the snapshot cannot answer a query, and callers fall back to SQLite.
+    """
+
+    def __init__(self):
+        self.path: Optional[str] = None
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._lock = threading.Lock()
+        self.refreshes = 0
+
+    def configure(self, path: Optional[str]):
+        """Serve searches from the snapshot at path (None disables it)."""
+        with self._lock:
+            self.path = path
+            self._snapshot = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    def _current(self, version: int) -> CatalogSnapshot:
+        """Get a snapshot built from the given catalog version, exporting one if needed."""
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        with self._lock:
+            if self._snapshot is not None and self._snapshot.version == version:
+                return self._snapshot
+            # Another worker may already have written the current version
+            try:
+                snapshot = CatalogSnapshot(self.path)
+            except (OSError, ValueError, struct.error):
+                snapshot = None
+            if snapshot is None or snapshot.version != version:
+                export_snapshot(self.path)
+                snapshot = CatalogSnapshot(self.path)
+                self.refreshes += 1
+            # Superseded mappings are released once no search still holds them
+            self._snapshot = snapshot
+            return snapshot
+
+    def search(self, search_type: str, search_term: str) -> Optional[List[Dict]]:
+        """
+        Search titles or authors for a term, folding ASCII case only (like SQLite's LIKE).
+
+        Returns:
+            Optional[List[Dict]]: rows in the same shape and order as the SQLite
+                search, or None if the snapshot backend does not handle the query
+        """
+        if not self.enabled or search_type not in ('title', 'author'):
+            return None
+        # LIKE wildcards inside the term only mean something to SQLite
+        if not search_term or '%' in search_term or '_' in search_term:
+            return None
+
+        conn = get_db_connection()
+        try:
+            snapshot = self._current(get_catalog_version(conn))
+            rows = snapshot.find_rows(f'{search_type}_key', search_term.encode('utf-8').lower())
+            ids = [snapshot.ids[row] for row in rows]
+
+            conn.row_factory = None
+            counts = {}
+            for i in range(0, len(ids), LOOKUP_CHUNK):
+                chunk = ids[i:i + LOOKUP_CHUNK]
+                placeholders = ', '.join('?' * len(chunk))
+                cursor = conn.execute(f'''
+                    SELECT id, total_copies, available_copies FROM books WHERE id IN ({placeholders})
+                ''', chunk)
+                counts.update((book_id, (total, available)) for book_id, total, available in cursor)
+        finally:
+            conn.close()
+
+        results = []
+        for row, book_id in zip(rows, ids):
+            if book_id not in counts:
+                continue
+            total_copies, available_copies = counts[book_id]
+            results.append({
+                'id': book_id,
+                'title': snapshot.value('title', row),
+                'author': snapshot.value('author', row),
+                'isbn': snapshot.value('isbn', row),
+                'total_copies': total_copies,
+                'available_copies': available_copies,
+            })
+        return results
+
+
+# Shared by every request in this process; configured from create_app
+snapshot_search = SnapshotSearch()
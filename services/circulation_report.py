@@ -0,0 +1,204 @@
+"""
+Circulation Report Module - library-wide loan statistics
+
+Scans borrow_records (and the yearly archive tables) in parallel: the id range
+of each table is split into chunks, a process pool aggregates each chunk into
+NumPy histograms and Counters, and the partial results are merged into:
+
+- loans per title, with utilization (available_copies / total_copies)
+- loans per day (by borrow date)
+- the patrons with the most overdue days (late returns and open overdue loans)
+
+Workers open their own read-only SQLite connections, so the scan scales with
+cores instead of serializing on one connection.
+"""
+
+import csv
+import json
+import os
+import sqlite3
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import database
+from database import EPOCH, EPOCH_DAY_SQL, get_archive_tables, get_db_connection, to_epoch_day
+
+# Chunks per worker, so a slow chunk does not leave the other workers idle
+CHUNKS_PER_WORKER = 4
+
+
+@dataclass
+class PartialReport:
+    """Aggregates over one chunk of loans; merge() combines two of them."""
+    loans_per_book: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int64))
+    loans_per_day: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int64))
+    overdue_days: Counter = field(default_factory=Counter)
+    overdue_loans: Counter = field(default_factory=Counter)
+    loans: int = 0
+
+    def merge(self, other: 'PartialReport') -> 'PartialReport':
+        self.loans_per_book = _add_histograms(self.loans_per_book, other.loans_per_book)
+        self.loans_per_day = _add_histograms(self.loans_per_day, other.loans_per_day)
+        self.overdue_days.update(other.overdue_days)
+        self.overdue_loans.update(other.overdue_loans)
+        self.loans += other.loans
+        return self
+
+
+def _add_histograms(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    if len(a) < len(b):
+        a, b = b, a
+    result = a.copy()
+    result[:len(b)] += b
+    return result
+
+
+def split_id_ranges(conn, workers: int) -> List[Tuple[str, int, int]]:
+    """Split every loan table's id range into roughly equal (table, lo, hi) chunks."""
+    tables = ['borrow_records'] + get_archive_tables(conn)
+    bounds = []
+    for table in tables:
+        lo, hi = conn.execute(f'SELECT MIN(id), MAX(id) FROM {table}').fetchone()
+        if lo is not None:
+            bounds.append((table, lo, hi))
+
+    total = sum(hi - lo + 1 for _, lo, hi in bounds)
+    chunk_size = max(1, -(-total // (workers * CHUNKS_PER_WORKER)))
+    ranges = []
+    for table, lo, hi in bounds:
+        for start in range(lo, hi + 1, chunk_size):
+            ranges.append((table, start, min(hi, start + chunk_size - 1)))
+    return ranges
+
+
+def scan_range(db_path: str, table: str, lo: int, hi: int, today: int) -> PartialReport:
+    """Aggregate loans with lo <= id <= hi in one table. Runs in a worker process."""
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    try:
+        rows = conn.execute(f'''
+            SELECT book_id, patron_id, {EPOCH_DAY_SQL.format(column='borrow_date')},
+                   COALESCE(COALESCE(return_day, :today) - due_day, 0)
+            FROM {table}
+            WHERE id BETWEEN :lo AND :hi
+        ''', {'lo': lo, 'hi': hi, 'today': today}).fetchall()
+    finally:
+        conn.close()
+
+    partial = PartialReport()
+    if not rows:
+        return partial
+
+    book_ids, patron_ids, borrow_days, days_late = zip(*rows)
+    partial.loans = len(rows)
+    partial.loans_per_book = np.bincount(np.asarray(book_ids, dtype=np.int64))
+    partial.loans_per_day = np.bincount(np.asarray(borrow_days, dtype=np.int64))
+
+    # Returned late, or still out past the due date
+    days_late = np.asarray(days_late, dtype=np.int64)
+    for i in np.flatnonzero(days_late > 0):
+        partial.overdue_days[patron_ids[i]] += int(days_late[i])
+        partial.overdue_loans[patron_ids[i]] += 1
+    return partial
+
+
+def _scan_task(task) -> PartialReport:
+    return scan_range(*task)
+
+
+def generate_circulation_report(workers: Optional[int] = None, top: int = 20,
+                                as_of: Optional[datetime] = None) -> Dict:
+    """
+    Build library-wide circulation statistics.
+
+    Args:
+        workers: worker processes (default: CPU count); 1 scans in this process
+        top: how many overdue patrons to list
+        as_of: when open loans are measured as overdue (default: now)
+
+    Returns:
+        dict: {'generated_at', 'loans', 'titles': [...], 'daily': [...], 'overdue_patrons': [...]}
+    """
+    workers = workers or os.cpu_count() or 1
+    as_of = as_of or datetime.now()
+    today = to_epoch_day(as_of)
+    db_path = os.path.abspath(database.DATABASE)
+
+    conn = get_db_connection()
+    try:
+        tasks = [(db_path, table, lo, hi, today) for table, lo, hi in split_id_ranges(conn, workers)]
+        books = conn.execute('''
+            SELECT id, title, author, total_copies, available_copies FROM books ORDER BY id
+        ''').fetchall()
+    finally:
+        conn.close()
+
+    total = PartialReport()
+    if workers == 1 or len(tasks) <= 1:
+        for partial in map(_scan_task, tasks):
+            total.merge(partial)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for partial in pool.map(_scan_task, tasks):
+                total.merge(partial)
+
+    titles = []
+    for book in books:
+        loans = int(total.loans_per_book[book['id']]) if book['id'] < len(total.loans_per_book) else 0
+        titles.append({
+            'book_id': book['id'],
+            'title': book['title'],
+            'author': book['author'],
+            'loans': loans,
+            'total_copies': book['total_copies'],
+            'available_copies': book['available_copies'],
+            'utilization': round(book['available_copies'] / book['total_copies'], 4)
+            if book['total_copies'] else None,
+        })
+    titles.sort(key=lambda row: (-row['loans'], row['book_id']))
+
+    daily = [{'date': (EPOCH + timedelta(days=int(day))).isoformat(), 'loans': int(total.loans_per_day[day])}
+             for day in np.flatnonzero(total.loans_per_day)]
+
+    overdue_patrons = [{'patron_id': patron_id, 'overdue_days': days,
+                        'overdue_loans': total.overdue_loans[patron_id]}
+                       for patron_id, days in total.overdue_days.most_common(top)]
+
+    return {
+        'generated_at': as_of.isoformat(),
+        'loans': total.loans,
+        'titles': titles,
+        'daily': daily,
+        'overdue_patrons': overdue_patrons,
+    }
+
+
+def write_report_json(report: Dict, path: str):
+    """Write the whole report as one JSON document."""
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+
+def write_report_csv(report: Dict, directory: str) -> List[str]:
+    """
+    Write each report section to its own CSV file in directory.
+
+    Returns:
+        List[str]: the files written (titles.csv, daily.csv, overdue_patrons.csv)
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for section in ('titles', 'daily', 'overdue_patrons'):
+        path = os.path.join(directory, f'{section}.csv')
+        rows = report[section]
+        with open(path, 'w', newline='') as f:
+            if rows:
+                writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+                writer.writeheader()
+                writer.writerows(rows)
+        paths.append(path)
+    return paths
@@ -0,0 +1,143 @@
+"""
+Export Service Module - streaming CSV / JSON Lines dumps of catalog and loans
+
+Rows come from iter_row_batches (SQLite fetchmany) and are encoded one batch
+at a time, so an export holds a single batch in memory whatever the table
+size. The same generator backs the /export endpoints (as a chunked response)
+and the `flask export` command (written to a file).
+"""
+
+import csv
+import io
+import json
+import sys
+from datetime import date, timedelta
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from database import BOOK_COLUMNS, borrow_records_source, get_db_connection, iter_row_batches
+
+EXPORT_BATCH_SIZE = 1000
+
+DATASETS = ('books', 'loans')
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+LOAN_EXPORT_COLUMNS = ('id', 'patron_id', 'book_id', 'title', 'borrow_date', 'due_date', 'return_date')
+
+
+def export_query(dataset: str, available_only: bool = False, patron_id: Optional[str] = None,
+                 start: Optional[date] = None, end: Optional[date] = None,
+                 include_archived: bool = False) -> Tuple[List[str], str, tuple]:
+    """
+    Build the query for an export.
+
+    Args:
+        dataset: 'books' or 'loans'
+        available_only: books only; skip books with no copies on the shelf
+        patron_id: loans only; one patron's loans
+        start, end: loans only; borrow date range, both ends inclusive
+        include_archived: loans only; also dump the yearly archive tables
+
+    Returns:
+        tuple: (column names, SQL, parameters)
+    """
+    if dataset == 'books':
+        where = 'WHERE available_copies > 0' if available_only else ''
+        return BOOK_COLUMNS.split(', '), f'SELECT {BOOK_COLUMNS} FROM books {where} ORDER BY id', ()
+
+    if dataset != 'loans':
+        raise ValueError(f'Unknown export dataset: {dataset}')
+
+    conditions, params = [], []
+    if patron_id:
+        conditions.append('br.patron_id = ?')
+        params.append(patron_id)
+    # ISO timestamps sort as text, so date bounds compare directly
+    if start:
+        conditions.append('br.borrow_date >= ?')
+        params.append(start.isoformat())
+    if end:
+        conditions.append('br.borrow_date < ?')
+        params.append((end + timedelta(days=1)).isoformat())
+
+    conn = get_db_connection()
+    source = borrow_records_source(conn, include_archived)
+    conn.close()
+
+    where = ('WHERE ' + ' AND '.join(conditions)) if conditions else ''
+    # Archives are unioned in table by table; sorting them would mean a full-size temp b-tree
+    order = '' if include_archived else 'ORDER BY br.id'
+    columns = ', '.join(f'b.{c}' if c == 'title' else f'br.{c}' for c in LOAN_EXPORT_COLUMNS)
+    sql = f'SELECT {columns} FROM {source} br LEFT JOIN books b ON b.id = br.book_id {where} {order}'
+    return list(LOAN_EXPORT_COLUMNS), sql, tuple(params)
+
+
+def _csv_encoder(columns: List[str]):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def encode(rows) -> bytes:
+        writer.writerows(rows)
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    return encode([columns]), encode
+
+
+def _jsonl_encoder(columns: List[str], dumps: Callable[[Dict], bytes]):
+    def encode(rows) -> bytes:
+        return b''.join(dumps(dict(zip(columns, row))) + b'\n' for row in rows)
+
+    return b'', encode
+
+
+def iter_export(dataset: str, export_format: str, batch_size: int = EXPORT_BATCH_SIZE,
+                dumps: Optional[Callable[[Dict], bytes]] = None, **filters) -> Iterator[bytes]:
+    """
+    Yield an export as encoded byte chunks: a CSV header (if any), then one chunk per batch.
+
+    Args:
+        dataset: 'books' or 'loans'
+        export_format: 'csv' or 'jsonl'
+        batch_size: rows fetched and encoded at a time
+        dumps: encodes one row dict as JSON bytes (default: stdlib json)
+        **filters: see export_query
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f'Unknown export format: {export_format}')
+    columns, sql, params = export_query(dataset, **filters)
+
+    if export_format == 'csv':
+        header, encode = _csv_encoder(columns)
+    else:
+        header, encode = _jsonl_encoder(
+            columns, dumps or (lambda row: json.dumps(row, separators=(',', ':')).encode()))
+
+    if header:
+        yield header
+    for batch in iter_row_batches(sql, params, batch_size):
+        yield encode(batch)
+
+
+def export_to_file(path: str, dataset: str, export_format: str, **kwargs) -> int:
+    """
+    Write an export to path ('-' for stdout), chunk by chunk.
+
+    Returns:
+        int: bytes written
+    """
+    written = 0
+    out = open(path, 'wb') if path != '-' else None
+    try:
+        target = out or sys.stdout.buffer
+        for chunk in iter_export(dataset, export_format, **kwargs):
+            target.write(chunk)
+            written += len(chunk)
+    finally:
+        if out:
+            out.close()
+    return written
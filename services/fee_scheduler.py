@@ -0,0 +1,66 @@
+"""
+Fee Scheduler Module - Background late fee accrual
+
+Runs accrue_late_fees, and expires ready holds nobody picked up, on a fixed
+interval in a daemon thread. When several
+worker processes start a scheduler, a lease row in scheduler_leases elects a
+single leader; the others keep trying and take over if its lease expires.
+"""
+
+import os
+import socket
+import threading
+from typing import Optional
+
+from database import accrue_late_fees, acquire_scheduler_lease, release_scheduler_lease
+from services.library_service import expire_uncollected_holds
+
+LEASE_NAME = 'fee_accrual'
+
+
+class FeeAccrualScheduler:
+    """Periodically writes accrued late fees to the fee_ledger table."""
+
+    def __init__(self, interval: float = 300.0, owner: Optional[str] = None):
+        self.interval = interval
+        self.owner = owner or f'{socket.gethostname()}:{os.getpid()}:{id(self)}'
+        # A leader that stops renewing loses the lease after a few missed runs
+        self.lease_seconds = interval * 3
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self) -> Optional[int]:
+        """
+        Accrue fees and expire uncollected holds if this worker holds the lease.
+
+        Returns:
+            Optional[int]: ledger rows written, or None if another worker leads
+        """
+        if not acquire_scheduler_lease(LEASE_NAME, self.owner, self.lease_seconds):
+            return None
+        expire_uncollected_holds()
+        return accrue_late_fees()
+
+    def start(self):
+        """Start running in a daemon thread, once immediately and then every interval."""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='fee-accrual', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the thread and hand the lease to the next worker."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            release_scheduler_lease(LEASE_NAME, self.owner)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                # A failed run (e.g. database busy) is retried on the next tick
+                pass
+            self._stop.wait(self.interval)
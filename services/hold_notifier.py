@@ -0,0 +1,97 @@
+"""
+Hold Notifier Module - wakes long-poll requests when a hold becomes ready
+
+return_book_by_patron and cancel_hold call notify() after the transaction that
+set a copy aside commits. Waiters watch a per-(patron, book) condition, so a
+notification only wakes the requests watching that hold, and a hold nobody is
+watching costs nothing. Notifications are in-process; waiters also re-check
+the database every HOLD_RECHECK_INTERVAL seconds so a return handled by
+another worker process is still seen.
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Tuple
+
+# Longest a waiter sleeps before re-reading its hold from the database
+HOLD_RECHECK_INTERVAL = 5.0
+
+
+class _Watched:
+    """A hold someone is watching: its condition, watcher count and notification count."""
+    __slots__ = ('condition', 'watchers', 'generation')
+
+    def __init__(self, lock: threading.Lock):
+        self.condition = threading.Condition(lock)
+        self.watchers = 0
+        self.generation = 0
+
+
+class HoldWatch:
+    """One request's registration on a hold, from HoldNotifier.watch()."""
+
+    def __init__(self, notifier: 'HoldNotifier', watched: _Watched):
+        self._notifier = notifier
+        self._watched = watched
+        self._seen = watched.generation
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Block until the hold is notified (since the watch began or the last
+        wait returned), or timeout.
+
+        Returns:
+            bool: True if a notification arrived
+        """
+        watched = self._watched
+        with self._notifier._lock:
+            notified = watched.condition.wait_for(lambda: watched.generation != self._seen, timeout)
+            self._seen = watched.generation
+            return notified
+
+
+class HoldNotifier:
+    """Per-hold conditions that long-poll requests can wait on while they watch the hold."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._watched: Dict[Tuple[str, int], _Watched] = {}
+
+    @contextmanager
+    def watch(self, patron_id: str, book_id: int) -> Iterator[HoldWatch]:
+        """
+        Watch a hold for notifications. Start watching before reading the hold,
+        so a notification in between is not lost; the hold's entry is dropped
+        when its last watcher leaves.
+        """
+        key = (patron_id, book_id)
+        with self._lock:
+            watched = self._watched.get(key)
+            if watched is None:
+                watched = self._watched[key] = _Watched(self._lock)
+            watched.watchers += 1
+            watch = HoldWatch(self, watched)
+        try:
+            yield watch
+        finally:
+            with self._lock:
+                watched.watchers -= 1
+                if not watched.watchers:
+                    del self._watched[key]
+
+    def watched(self) -> int:
+        """Number of holds currently being watched."""
+        with self._lock:
+            return len(self._watched)
+
+    def notify(self, patron_id: str, book_id: int):
+        """Wake everyone watching this patron's hold for this book."""
+        with self._lock:
+            watched = self._watched.get((patron_id, book_id))
+            if watched is not None:
+                watched.generation += 1
+                watched.condition.notify_all()
+
+
+# Shared by every request in this process
+hold_notifier = HoldNotifier()
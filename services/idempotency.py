@@ -0,0 +1,169 @@
+"""
+Idempotency Module - replay-safe handling of retried POSTs
+
+Kiosks retry /borrow, /return and late fee payments when a response times
+out. A client that sends an Idempotency-Key (header, or idempotency_key form
+field) gets the first attempt's result back for every retry with that key
+instead of a second loan, return or charge.
+
+The store keeps each key's successful result (not the rendered response) for
+a TTL, so a replayed form post flashes the same message and a replayed payment
+returns the same transaction id. A failure ("Payment service is busy",
+"Database error", a refused borrow) changed nothing, so it is forgotten like
+an exception and the client's retry runs the call again. Duplicates that
+arrive while the first attempt is still running wait for it rather than
+running concurrently. A key reused for a different request (other patron,
+book or endpoint) is refused.
+
+The store lives in one process: a retry that lands on another worker runs
+the write again.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyKeyError(Exception):
+    """The client's idempotency key cannot be used for this request."""
+
+
+class _Entry:
+    __slots__ = ('fingerprint', 'expires', 'done', 'result', 'failed')
+
+    def __init__(self, fingerprint: Hashable, expires: float):
+        self.fingerprint = fingerprint
+        self.expires = expires
+        self.done = threading.Event()
+        self.result = None
+        self.failed = False
+
+
+class IdempotencyStore:
+    """
+    Thread-safe map of recent idempotency keys to their results.
+
+    Entries are kept in creation order, so expired ones are evicted from the
+    front on every insert; past max_keys the oldest go first regardless of age.
+    A call that raises, or whose result retain rejects (by default every result
+    is kept), is forgotten, letting the client's retry run it again.
+    """
+
+    def __init__(self, max_keys: int = 10000, ttl: float = 3600.0, clock=time.monotonic,
+                 retain: Optional[Callable[[object], bool]] = None):
+        self.max_keys = max_keys
+        self.ttl = ttl
+        self._clock = clock
+        self._retain = retain
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._counters = dict.fromkeys(('executed', 'replayed', 'waited', 'conflicts', 'evictions'), 0)
+
+    def configure(self, max_keys: Optional[int] = None, ttl: Optional[float] = None):
+        """Change the size limit and/or TTL, forgetting every key seen so far."""
+        with self._lock:
+            if max_keys is not None:
+                self.max_keys = max_keys
+            if ttl is not None:
+                self.ttl = ttl
+            self._entries.clear()
+
+    def run(self, key: str, fingerprint: Hashable, fn: Callable, *args, **kwargs):
+        """
+        Call fn(*args, **kwargs) once per key and return its result for every call with that key.
+
+        Args:
+            key: the client's idempotency key
+            fingerprint: what the request was for, e.g. (endpoint, patron_id, book_id)
+
+        Raises:
+            IdempotencyKeyError: the key was first used with a different fingerprint
+        """
+        while True:
+            with self._lock:
+                now = self._clock()
+                entry = self._entries.get(key)
+                if entry is None or entry.expires <= now:
+                    self._entries.pop(key, None)
+                    self._evict(now)
+                    entry = _Entry(fingerprint, now + self.ttl)
+                    self._entries[key] = entry
+                    owner = True
+                else:
+                    if entry.fingerprint != fingerprint:
+                        self._counters['conflicts'] += 1
+                        raise IdempotencyKeyError("This idempotency key was already used for a different request.")
+                    owner = False
+                    self._counters['replayed' if entry.done.is_set() else 'waited'] += 1
+
+            if owner:
+                return self._execute(key, entry, fn, args, kwargs)
+            entry.done.wait()
+            if not entry.failed:
+                return entry.result
+            # The first attempt raised or failed and was forgotten; run it again
+
+    def _execute(self, key: str, entry: _Entry, fn: Callable, args: Tuple, kwargs: Dict):
+        try:
+            entry.result = fn(*args, **kwargs)
+        except BaseException:
+            self._forget(key, entry)
+            raise
+        else:
+            if self._retain is not None and not self._retain(entry.result):
+                self._forget(key, entry)
+        finally:
+            entry.done.set()
+        with self._lock:
+            self._counters['executed'] += 1
+        return entry.result
+
+    def _forget(self, key: str, entry: _Entry):
+        entry.failed = True
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {**self._counters, 'size': len(self._entries), 'max_keys': self.max_keys, 'ttl': self.ttl}
+
+    def _evict(self, now: float):
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry.expires > now and len(self._entries) < self.max_keys:
+                break
+            del self._entries[key]
+            self._counters['evictions'] += 1
+
+
+def get_idempotency_key(headers, form) -> Optional[str]:
+    """
+    The request's Idempotency-Key header, or its idempotency_key form field.
+
+    Raises:
+        IdempotencyKeyError: the key is longer than MAX_KEY_LENGTH
+    """
+    key = (headers.get('Idempotency-Key') or form.get('idempotency_key') or '').strip()
+    if len(key) > MAX_KEY_LENGTH:
+        raise IdempotencyKeyError(f"Idempotency key must be at most {MAX_KEY_LENGTH} characters.")
+    return key or None
+
+
+def run_idempotent(key: Optional[str], fingerprint: Hashable, fn: Callable, *args, **kwargs):
+    """Run fn through idempotency_store when the client sent a key, otherwise just call it."""
+    if not key:
+        return fn(*args, **kwargs)
+    return idempotency_store.run(key, fingerprint, fn, *args, **kwargs)
+
+
+def succeeded(result) -> bool:
+    """Circulation and payment calls return (success, message, ...); only successes are kept."""
+    return bool(result[0])
+
+
+# Shared by every request in this process
+idempotency_store = IdempotencyStore(retain=succeeded)
@@ -6,12 +6,22 @@ Contains all the core business logic for the Library Management System
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 from database import (
-    get_db_connection, get_book_by_id, get_book_by_isbn, get_patron_borrowed_books,
-    get_patron_borrow_count, insert_book, insert_borrow_record,
-    update_book_availability, update_borrow_record_return_date, get_all_books,
-    conn_execute_read
+    to_epoch_day, MAX_BORROWED_BOOKS, BORROW_OK, BORROW_BOOK_MISSING, BORROW_UNAVAILABLE,
+    BORROW_LIMIT_REACHED, RETURN_OK, RETURN_NOT_BORROWED, HOLD_READY, HOLD_PLACED, HOLD_BOOK_MISSING, HOLD_BOOK_AVAILABLE,
+    HOLD_ALREADY_BORROWED, HOLD_EXISTS
 )
-from services.payment_service import PaymentGateway
+# Storage goes through the configured backend (SQLite or in-memory)
+from repository import (
+    Query, eq, contains, is_in, any_of, BOOK_FIELDS, conn_execute_read, get_book_by_id, get_book_by_isbn,
+    get_patron_borrow_count, insert_book, borrow_book_transaction, isbn_may_exist,
+    get_ledger_late_fee, get_patron_report, return_book_transaction, place_hold_transaction,
+    cancel_hold_transaction, expire_ready_holds, get_hold, get_branch
+)
+from isbn_utils import normalize_isbn
+from services.payment_service import PaymentGateway, get_payment_gateway
+from services.search_cache import search_cache, normalize_search_key
+from services.catalog_snapshot import snapshot_search
+from services.hold_notifier import hold_notifier
 
 def add_book_to_catalog(title: str, author: str, isbn: str, total_copies: int) -> Tuple[bool, str]:
     """
@@ -21,7 +31,7 @@ def add_book_to_catalog(title: str, author: str, isbn: str, total_copies: int) -
     Args:
         title: Book title (max 200 chars)
         author: Book author (max 100 chars)
-        isbn: 13-digit ISBN
+        isbn: 13-digit ISBN (hyphens allowed; a valid ISBN-10 is converted)
         total_copies: Number of copies (positive integer)
         
     Returns:
@@ -40,25 +50,29 @@ def add_book_to_catalog(title: str, author: str, isbn: str, total_copies: int) -
     if len(author.strip()) > 100:
         return False, "Author must be less than 100 characters."
     
+    # Hyphenated and ISBN-10 forms are stored as their 13-digit key
+    isbn = normalize_isbn(isbn)
     if len(isbn) != 13:
         return False, "ISBN must be exactly 13 digits."
     
     if not isinstance(total_copies, int) or total_copies <= 0:
         return False, "Total copies must be a positive integer."
     
-    # Check for duplicate ISBN
-    existing = get_book_by_isbn(isbn)
-    if existing:
+    # Check for duplicate ISBN; the Bloom filter rules out most new ISBNs without a query
+    if isbn_may_exist(isbn) and get_book_by_isbn(isbn):
         return False, "A book with this ISBN already exists."
     
     # Insert new book
     success = insert_book(title.strip(), author.strip(), isbn, total_copies, total_copies)
     if success:
         return True, f'Book "{title.strip()}" has been successfully added to the catalog.'
+    elif get_book_by_isbn(isbn):
+        # Another worker added it first and the unique isbn_key index refused this one
+        return False, "A book with this ISBN already exists."
     else:
         return False, "Database error occurred while adding the book."
 
-def borrow_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
+def borrow_book_by_patron(patron_id: str, book_id: int, branch_id: Optional[int] = None) -> Tuple[bool, str]:
     """
     Allow a patron to borrow a book.
     Implements R3 as per requirements  
@@ -66,6 +80,7 @@ def borrow_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     Args:
         patron_id: 6-digit library card ID
         book_id: ID of the book to borrow
+        branch_id: branch lending the copy (default: whichever has one on the shelf)
         
     Returns:
         tuple: (success: bool, message: str)
@@ -74,36 +89,45 @@ def borrow_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
         return False, "Invalid patron ID. Must be exactly 6 digits."
     
-    # Check if book exists and is available
+    if branch_id is not None and not get_branch(branch_id):
+        return False, "This branch does not exist."
+    
+    # Check if book exists and is available (anywhere; the transaction checks the branch)
     book = get_book_by_id(book_id)
     if not book:
         return False, "This book does not exist."
     
-    if book['available_copies'] <= 0:
+    # A patron whose hold is ready borrows the copy set aside for them
+    if book['available_copies'] <= 0 and (get_hold(patron_id, book_id) or {}).get('status') != HOLD_READY:
         return False, "This book is currently not available."
     
     # Check patron's current borrowed books count
     current_borrowed = get_patron_borrow_count(patron_id)
     
-    if current_borrowed > 5:
+    if current_borrowed >= MAX_BORROWED_BOOKS:
         return False, "You have reached the maximum borrowing limit of 5 books."
     
     # Create borrow record
     borrow_date = datetime.now()
     due_date = borrow_date + timedelta(days=14)
     
-    # Insert borrow record and update availability
-    borrow_success = insert_borrow_record(patron_id, book_id, borrow_date, due_date)
-    if not borrow_success:
+    # The checks above are a cheap early exit; the transaction re-checks both
+    # limits under the write lock so concurrent requests can't overshoot them
+    outcome = borrow_book_transaction(patron_id, book_id, borrow_date, due_date, branch_id=branch_id)
+    if outcome == BORROW_BOOK_MISSING:
+        return False, "This book does not exist."
+    if outcome == BORROW_UNAVAILABLE and branch_id is not None:
+        return False, "This book is currently not available at this branch."
+    if outcome == BORROW_UNAVAILABLE:
+        return False, "This book is currently not available."
+    if outcome == BORROW_LIMIT_REACHED:
+        return False, "You have reached the maximum borrowing limit of 5 books."
+    if outcome != BORROW_OK:
         return False, "Database error occurred while creating borrow record."
     
-    availability_success = update_book_availability(book_id, -1)
-    if not availability_success:
-        return False, "Database error occurred while updating book availability."
-    
     return True, f'Successfully borrowed "{book["title"]}". Due date: {due_date.strftime("%Y-%m-%d")}.'
 
-def return_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
+def return_book_by_patron(patron_id: str, book_id: int, branch_id: Optional[int] = None) -> Tuple[bool, str]:
     """
     Process book return by a patron.
     Implements R4 as per requirements
@@ -111,6 +135,7 @@ def return_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     Args:
         patron_id: 6-digit library card ID
         book_id: ID of the book to return
+        branch_id: branch the book is returned to (default: the one that lent it)
 
     Returns:
         tuple: (success: bool, message: str)
@@ -118,16 +143,21 @@ def return_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
         return False, "Invalid patron ID. Must be exactly 6 digits."
 
-    if book_id not in [book['id'] for book in get_all_books()]:
+    if branch_id is not None and not get_branch(branch_id):
+        return False, "This branch does not exist."
+
+    if not get_book_by_id(book_id):
         return False, "Book not found."
 
-    if book_id not in [book['book_id'] for book in get_patron_borrowed_books(patron_id)]:
+    # Closing the loan and handing the copy to the next hold (or the shelf)
+    # happen in one transaction, so a returned copy is never up for grabs twice
+    outcome, ready_patron = return_book_transaction(patron_id, book_id, datetime.now(), branch_id)
+    if outcome == RETURN_NOT_BORROWED:
         return False, "Book not borrowed by patron."
-
-    if not update_borrow_record_return_date(patron_id, book_id, datetime.now()):
+    if outcome != RETURN_OK:
         return False, "Unable to update record."
-    if not update_book_availability(book_id, 1):
-        return False, "Unable to update book availability."
+    if ready_patron:
+        hold_notifier.notify(ready_patron, book_id)
 
     fee_info = calculate_late_fee_for_book(patron_id, book_id)
     if fee_info['fee_amount'] > 0:
@@ -135,6 +165,73 @@ def return_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     else:
         return True, "Book returned successfully. No late fee."
 
+def place_hold(patron_id: str, book_id: int) -> Tuple[bool, str]:
+    """
+    Join the hold queue for a book that has no copies on the shelf.
+
+    Holds are served first come, first served: each returned copy is set aside
+    for the oldest waiting hold.
+
+    Args:
+        patron_id: 6-digit library card ID
+        book_id: ID of the book to reserve
+
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+        return False, "Invalid patron ID. Must be exactly 6 digits."
+
+    outcome = place_hold_transaction(patron_id, book_id)
+    if outcome == HOLD_BOOK_MISSING:
+        return False, "This book does not exist."
+    if outcome == HOLD_BOOK_AVAILABLE:
+        return False, "This book is available now; borrow it instead."
+    if outcome == HOLD_ALREADY_BORROWED:
+        return False, "You already have this book borrowed."
+    if outcome == HOLD_EXISTS:
+        return False, "You already have a hold on this book."
+    if outcome != HOLD_PLACED:
+        return False, "Database error occurred while placing hold."
+
+    position = get_hold(patron_id, book_id)['position']
+    return True, f"Hold placed. You are number {position} in the queue."
+
+def cancel_hold(patron_id: str, book_id: int) -> Tuple[bool, str]:
+    """
+    Cancel a patron's hold on a book.
+
+    Args:
+        patron_id: 6-digit library card ID
+        book_id: ID of the reserved book
+
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+        return False, "Invalid patron ID. Must be exactly 6 digits."
+
+    cancelled, ready_patron = cancel_hold_transaction(patron_id, book_id)
+    if not cancelled:
+        return False, "No hold found for this book."
+    if ready_patron:
+        hold_notifier.notify(ready_patron, book_id)
+    return True, "Hold cancelled."
+
+def expire_uncollected_holds() -> int:
+    """
+    Expire ready holds not picked up within HOLD_PICKUP_DAYS, handing each copy
+    to the next waiting hold (whose long-poll is woken) or back to the shelf.
+
+    Returns:
+        int: number of holds expired
+    """
+    released = expire_ready_holds()
+    for book_id, ready_patron in released:
+        if ready_patron:
+            hold_notifier.notify(ready_patron, book_id)
+    return len(released)
+
 def calculate_late_fee_for_book(patron_id: str, book_id: int) -> Dict:
     """
     Calculate late fees for a specific book.
@@ -166,27 +263,34 @@ def calculate_late_fee_for_book(patron_id: str, book_id: int) -> Dict:
         fee_json['status'] = 'Invalid patron ID'
         return fee_json
 
-    book_exists = conn_execute_read('SELECT 1 FROM books WHERE id = ?', (book_id,))
+    book_exists = conn_execute_read(Query('books', ('id',), (eq('id', book_id),)))
     if not book_exists:
         fee_json['status'] = 'Book not found'
         return fee_json
 
-    record_list = conn_execute_read('''
-        SELECT borrow_date, due_date, return_date
-        FROM borrow_records
-        WHERE patron_id = ? AND book_id = ?
-        ORDER BY id DESC LIMIT 1
-    ''', (patron_id, book_id,))
+    record_list = conn_execute_read(Query(
+        'borrow_records', ('borrow_date', 'due_date', 'return_date', 'due_day', 'return_day'),
+        (eq('patron_id', patron_id), eq('book_id', book_id)),
+        order_by=('-id',), limit=1))
     record = record_list[0] if record_list else None
 
     if not record:
         fee_json['status'] = 'No corresponding borrow record found'
         return fee_json
 
-    due_date = datetime.fromisoformat(record['due_date'])
-    return_date = datetime.fromisoformat(record['return_date']) if record['return_date'] else datetime.now()
+    # Prefer the precomputed epoch days; fall back to parsing the ISO text
+    due_day = record.get('due_day')
+    if due_day is None:
+        due_day = to_epoch_day(datetime.fromisoformat(record['due_date']))
 
-    days_overdue = max(0, (return_date.date() - due_date.date()).days)
+    if not record['return_date']:
+        return_day = to_epoch_day(datetime.now())
+    elif record.get('return_day') is not None:
+        return_day = record['return_day']
+    else:
+        return_day = to_epoch_day(datetime.fromisoformat(record['return_date']))
+
+    days_overdue = max(0, return_day - due_day)
     if days_overdue <= 0:
         fee_json['status'] = 'On time'
         return fee_json
@@ -200,14 +304,19 @@ def calculate_late_fee_for_book(patron_id: str, book_id: int) -> Dict:
     fee_json['fee_amount'], fee_json['days_overdue'], fee_json['status'] = round(fee, 2), days_overdue, 'Overdue'
     return fee_json
 
-def search_books_in_catalog(search_term: str, search_type: str) -> List[Dict]:
+def search_books_in_catalog(search_term: str, search_type: str, branch_id: Optional[int] = None) -> List[Dict]:
     """
     Search for books in the catalog.
     Implements R6 as per requirements
 
+    Results are cached per normalized (search_type, term, branch) in search_cache. When a
+    catalog snapshot is configured, title and author searches scan it instead of SQLite.
+
     Args:
         search_term: a string containing the search content
         search_type: author, title, or isbn
+        branch_id: only books this branch holds, each with the branch's
+            branch_total_copies and branch_available_copies as well
 
     Returns:
         List[Dict]: [
@@ -216,22 +325,40 @@ def search_books_in_catalog(search_term: str, search_type: str) -> List[Dict]:
         ]
     """
 
-    query = ""
-    param = ""
+    # The normalized term is only the cache key; LIKE and the snapshot fold ASCII case themselves
+    key = normalize_search_key(search_type, search_term)
+    search_term = search_term.strip()
 
     if search_type == 'title':
-        query = "SELECT * FROM books WHERE title LIKE ? ORDER BY title"
-        param = f"%{search_term}%"
+        condition = contains('title', search_term)
     elif search_type == 'author':
-        query = "SELECT * FROM books WHERE author LIKE ? ORDER BY title"
-        param = f"%{search_term}%"
+        condition = contains('author', search_term)
     elif search_type == 'isbn':
-        query = "SELECT * FROM books WHERE isbn = ? ORDER BY title"
-        param = search_term
+        condition = any_of(eq('isbn_key', normalize_isbn(search_term)), eq('isbn', search_term))
     else:
         return []
 
-    return conn_execute_read(query, (param,))
+    if branch_id is not None:
+        key = key + (branch_id,)
+
+    generation = search_cache.generation
+    cached = search_cache.get(key)
+    if cached is not None:
+        return cached
+
+    # The snapshot has no holdings, so branch searches always read the repository
+    results = snapshot_search.search(search_type, search_term) if branch_id is None else None
+    if results is None:
+        results = conn_execute_read(Query('books', BOOK_FIELDS, (condition,), order_by=('title',)))
+    if branch_id is not None and results:
+        holdings = {row['book_id']: row for row in conn_execute_read(Query(
+            'holdings', ('book_id', 'total_copies', 'available_copies'),
+            (eq('branch_id', branch_id), is_in('book_id', [book['id'] for book in results]))))}
+        results = [{**book, 'branch_total_copies': holdings[book['id']]['total_copies'],
+                    'branch_available_copies': holdings[book['id']]['available_copies']}
+                   for book in results if book['id'] in holdings]
+    search_cache.put(key, results, generation)
+    return results
 
 def get_patron_status_report(patron_id: str) -> Dict:
     """
@@ -239,6 +366,8 @@ def get_patron_status_report(patron_id: str) -> Dict:
     
     Implements R7 as per requirements
 
+    Loans, fees and history come from a single set-based query (see get_patron_report).
+
     Args:
         patron_id: 6-digit library card ID
 
@@ -265,29 +394,14 @@ def get_patron_status_report(patron_id: str) -> Dict:
         return_block['status'] = "Invalid patron ID"
         return return_block
 
-    current = get_patron_borrowed_books(patron_id)
-
-    total_late_fees = 0.0
-    for book in current:
-        fee_info = calculate_late_fee_for_book(patron_id, book['book_id'])
-        total_late_fees += fee_info['fee_amount']
-
-    count = get_patron_borrow_count(patron_id)
-
-    history = conn_execute_read('''
-        SELECT b.title, b.author, br.borrow_date, br.due_date, br.return_date
-        FROM borrow_records br
-        JOIN books b ON br.book_id = b.id
-        WHERE br.patron_id = ?
-        ORDER BY br.borrow_date DESC
-    ''', (patron_id,))
+    report = get_patron_report(patron_id)
 
     return_block['status'] = "success"
     return_block['patron_id'] = patron_id
-    return_block['currently_borrowed_count'] = count
-    return_block['currently_borrowed_books'] = current
-    return_block['total_late_fees'] = round(total_late_fees, 2)
-    return_block['total_late_fees'] = history
+    return_block['currently_borrowed_count'] = report['count']
+    return_block['currently_borrowed_books'] = report['current']
+    return_block['total_late_fees'] = report['total_late_fees']
+    return_block['borrowing_history'] = report['history']
 
     return return_block
 
@@ -319,8 +433,8 @@ def pay_late_fees(patron_id: str, book_id: int,
     if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
         return False, "Invalid patron ID. Must be exactly 6 digits.", None
 
-    # Calculate late fee first
-    fee_info = calculate_late_fee_for_book(patron_id, book_id)
+    # Calculate late fee first, preferring the scheduler's precomputed ledger
+    fee_info = get_ledger_late_fee(patron_id, book_id) or calculate_late_fee_for_book(patron_id, book_id)
 
     # Check if there's a fee to pay
     if not fee_info or 'fee_amount' not in fee_info:
@@ -336,9 +450,9 @@ def pay_late_fees(patron_id: str, book_id: int,
     if not book:
         return False, "Book not found.", None
 
-    # Use provided gateway or create new one
+    # Use provided gateway or the shared one
     if payment_gateway is None:
-        payment_gateway = PaymentGateway()
+        payment_gateway = get_payment_gateway()
 
     # Process payment through external gateway
     # THIS IS WHAT YOU SHOULD MOCK IN THEIR TESTS!
@@ -385,9 +499,9 @@ def refund_late_fee_payment(transaction_id: str, amount: float,
     if amount > 15.00:  # Maximum late fee per book
         return False, "Refund amount exceeds maximum late fee."
 
-    # Use provided gateway or create new one
+    # Use provided gateway or the shared one
     if payment_gateway is None:
-        payment_gateway = PaymentGateway()
+        payment_gateway = get_payment_gateway()
 
     # Process refund through external gateway
     # THIS IS WHAT YOU SHOULD MOCK IN YOUR TESTS!
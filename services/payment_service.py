@@ -4,11 +4,16 @@ This module simulates integration with an external payment processing API.
 
 For Assignment 3: You will learn to mock this service in their tests
 since we cannot make actual payment API calls during testing.
+
+Application code goes through get_payment_gateway(), a long-lived GatewayClient
+that adds rate limiting, a circuit breaker and call metrics in front of either
+the simulated gateway or HttpPaymentGateway (see configure_payment_gateway).
 """
 
-#import requests
-from typing import Dict, Tuple
+import threading
 import time
+from collections import deque
+from typing import Dict, Optional, Tuple
 
 
 class PaymentGateway:
@@ -132,3 +137,299 @@ class PaymentGateway:
             "amount": 10.50,
             "timestamp": time.time()
         }
+
+
+class PaymentGatewayError(Exception):
+    """The gateway could not be reached or failed on its side (as opposed to declining)."""
+
+
+class HttpPaymentGateway(PaymentGateway):
+    """
+    PaymentGateway that makes the real HTTP calls against base_url.
+
+    One requests.Session (and so one keep-alive connection pool) is shared by
+    every call. Declines come back as normal (False, ...) results; timeouts,
+    connection errors and 5xx responses raise PaymentGatewayError. Only the
+    read-only status check is retried, since charges and refunds are not
+    idempotent on the gateway side.
+    """
+
+    def __init__(self, base_url: str, api_key: str = "test_key_12345",
+                 timeout: Tuple[float, float] = (2.0, 5.0), pool_size: int = 10):
+        # Imported here so only processes configured with PAYMENT_GATEWAY_URL pay for requests
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        super().__init__(api_key)
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers['Authorization'] = f'Bearer {api_key}'
+        retry = Retry(total=2, backoff_factor=0.1, allowed_methods=frozenset(['GET']),
+                      status_forcelist=(502, 503, 504))
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _request(self, method: str, path: str, **kwargs) -> Tuple[int, Dict]:
+        import requests
+
+        try:
+            response = self.session.request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+        except requests.RequestException as e:
+            raise PaymentGatewayError(f'{type(e).__name__}: {e}') from e
+        if response.status_code >= 500:
+            raise PaymentGatewayError(f'gateway returned HTTP {response.status_code}')
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        return response.status_code, body
+
+    def process_payment(self, patron_id: str, amount: float, description: str = "") -> Tuple[bool, str, str]:
+        status, body = self._request('POST', '/charges', json={
+            "customer_id": patron_id,
+            "amount": amount,
+            "currency": "usd",
+            "description": description
+        })
+        if status >= 400:
+            return False, "", body.get('message', f'Payment declined (HTTP {status})')
+        return True, body.get('transaction_id', ''), body.get('message', 'Payment processed')
+
+    def refund_payment(self, transaction_id: str, amount: float) -> Tuple[bool, str]:
+        status, body = self._request('POST', '/refunds', json={
+            "transaction_id": transaction_id,
+            "amount": amount
+        })
+        if status >= 400:
+            return False, body.get('message', f'Refund declined (HTTP {status})')
+        return True, body.get('message', 'Refund processed')
+
+    def verify_payment_status(self, transaction_id: str) -> Dict:
+        status, body = self._request('GET', f'/charges/{transaction_id}')
+        if status == 404:
+            return {"status": "not_found", "message": "Transaction not found"}
+        return body
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts of up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Take tokens if available, without waiting."""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < tokens:
+                return False
+            self._tokens -= tokens
+            return True
+
+
+class CircuitBreaker:
+    """
+    Fail fast while a dependency is failing.
+
+    Closed: calls go through, consecutive failures are counted. After
+    failure_threshold of them the breaker opens and rejects calls for
+    reset_timeout seconds, then lets a single trial call through (half-open);
+    its success closes the breaker, its failure opens it again.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if self._clock() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+
+
+class GatewayMetrics:
+    """Per-operation call counts and recent latencies."""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._window = window
+        self._operations: Dict[str, Dict] = {}
+
+    def _operation(self, name: str) -> Dict:
+        if name not in self._operations:
+            self._operations[name] = {
+                'calls': 0, 'errors': 0, 'rejected': 0, 'throttled': 0,
+                'latencies': deque(maxlen=self._window)
+            }
+        return self._operations[name]
+
+    def record(self, name: str, outcome: str, latency: Optional[float] = None):
+        """Count one call; outcome is 'ok', 'error', 'rejected' or 'throttled'."""
+        with self._lock:
+            operation = self._operation(name)
+            if outcome in ('ok', 'error'):
+                operation['calls'] += 1
+                operation['latencies'].append(latency)
+            if outcome != 'ok':
+                operation[{'error': 'errors'}.get(outcome, outcome)] += 1
+
+    def snapshot(self) -> Dict:
+        """Counts plus p50/p95/max latency (ms) over the recent window, per operation."""
+        with self._lock:
+            result = {}
+            for name, operation in self._operations.items():
+                latencies = sorted(operation['latencies'])
+                stats = {key: operation[key] for key in ('calls', 'errors', 'rejected', 'throttled')}
+                if latencies:
+                    stats['p50_ms'] = round(latencies[len(latencies) // 2] * 1000, 2)
+                    stats['p95_ms'] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 2)
+                    stats['max_ms'] = round(latencies[-1] * 1000, 2)
+                result[name] = stats
+            return result
+
+
+class GatewayClient(PaymentGateway):
+    """
+    Long-lived front for a PaymentGateway, shared by every request in a process.
+
+    Each call first takes a token from the rate limiter and checks the circuit
+    breaker; either refusing means an immediate failure result instead of a
+    call that would queue behind a degraded gateway. Exceptions from the
+    gateway count as breaker failures and are returned as failure results;
+    declines are normal answers and do not trip the breaker.
+    """
+
+    def __init__(self, gateway: PaymentGateway, breaker: Optional[CircuitBreaker] = None,
+                 limiter: Optional[TokenBucket] = None, metrics: Optional[GatewayMetrics] = None):
+        self.gateway = gateway
+        self.api_key = gateway.api_key
+        self.base_url = gateway.base_url
+        self.breaker = breaker or CircuitBreaker()
+        self.limiter = limiter or TokenBucket(rate=50, capacity=100)
+        self.metrics = metrics or GatewayMetrics()
+
+    def _call(self, name: str, failure, *args, **kwargs):
+        if not self.limiter.try_acquire():
+            self.metrics.record(name, 'throttled')
+            return failure("Payment service is busy, please try again shortly")
+        if not self.breaker.allow():
+            self.metrics.record(name, 'rejected')
+            return failure("Payment service is temporarily unavailable")
+
+        start = time.perf_counter()
+        try:
+            result = getattr(self.gateway, name)(*args, **kwargs)
+        except Exception as e:
+            self.breaker.record_failure()
+            self.metrics.record(name, 'error', time.perf_counter() - start)
+            return failure(f"Payment gateway error: {e}")
+        self.breaker.record_success()
+        self.metrics.record(name, 'ok', time.perf_counter() - start)
+        return result
+
+    def process_payment(self, patron_id: str, amount: float, description: str = "") -> Tuple[bool, str, str]:
+        return self._call('process_payment', lambda message: (False, "", message),
+                          patron_id, amount, description)
+
+    def refund_payment(self, transaction_id: str, amount: float) -> Tuple[bool, str]:
+        return self._call('refund_payment', lambda message: (False, message), transaction_id, amount)
+
+    def verify_payment_status(self, transaction_id: str) -> Dict:
+        return self._call('verify_payment_status', lambda message: {"status": "unavailable", "message": message},
+                          transaction_id)
+
+    def stats(self) -> Dict:
+        """Breaker state plus per-operation metrics."""
+        return {'circuit': self.breaker.state, 'operations': self.metrics.snapshot()}
+
+
+_default_gateway = None
+
+
+def configure_payment_gateway(base_url: Optional[str] = None, api_key: str = "test_key_12345",
+                              timeout: Tuple[float, float] = (2.0, 5.0), rate: float = 50,
+                              burst: Optional[float] = None, failure_threshold: int = 5,
+                              reset_timeout: float = 30.0) -> GatewayClient:
+    """
+    Replace the shared gateway client.
+
+    Args:
+        base_url: gateway URL for real HTTP calls; None keeps the simulated gateway
+        api_key: gateway credentials
+        timeout: (connect, read) timeout in seconds for HTTP calls
+        rate, burst: token bucket refill rate (calls/second) and size
+        failure_threshold, reset_timeout: circuit breaker settings
+
+    Returns:
+        GatewayClient: the new shared client
+    """
+    global _default_gateway
+    gateway = HttpPaymentGateway(base_url, api_key, timeout) if base_url else PaymentGateway(api_key)
+    _default_gateway = GatewayClient(
+        gateway,
+        breaker=CircuitBreaker(failure_threshold, reset_timeout),
+        limiter=TokenBucket(rate, burst if burst is not None else 2 * rate))
+    return _default_gateway
+
+
+def get_payment_gateway() -> GatewayClient:
+    """
+    Get the shared gateway client, constructing it on first use.
+
+    Callers that don't inject their own gateway share this instance (and its
+    connection pool, breaker and rate limiter) instead of building one per payment.
+    """
+    if _default_gateway is None:
+        return configure_payment_gateway()
+    return _default_gateway
@@ -0,0 +1,134 @@
+"""
+Search Cache Module - LRU/TTL cache for catalog search results
+
+Shared by the /search page and /api/search since both go through
+search_books_in_catalog. Keys are normalized so "Harry", " harry " and
+"HARRY" hit the same entry. Only ASCII letters are folded, matching SQLite's
+LIKE: "Émile" and "émile" find different books, so they get different keys.
+"""
+
+import string
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from database import register_book_change_listener
+
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def normalize_search_key(search_type: str, search_term: str) -> Tuple[str, str]:
+    """Get the cache key for a search: (search_type, trimmed term with ASCII letters lowercased)."""
+    return search_type, search_term.strip().translate(_ASCII_LOWER)
+
+
+class SearchCache:
+    """
+    Thread-safe LRU cache of search results with a time-to-live.
+
+    Inserting a book clears the cache, since the new book may match any cached
+    term. An availability change only drops the entries whose results contain
+    that book, found through a reverse index of book id -> keys.
+
+    Every invalidation bumps `generation`. Callers read it before running a
+    query and pass it to put(), which drops results computed across an
+    invalidation instead of caching stale counts until the TTL runs out.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 60.0, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, List[Dict]]]" = OrderedDict()
+        self._keys_by_book: Dict[int, set] = {}
+        self.generation = 0
+        self._counters = dict.fromkeys(('hits', 'misses', 'evictions', 'expirations', 'invalidations'), 0)
+
+    def configure(self, max_entries: Optional[int] = None, ttl: Optional[float] = None):
+        """Change the size limit and/or TTL, dropping anything cached so far."""
+        with self._lock:
+            if max_entries is not None:
+                self.max_entries = max_entries
+            if ttl is not None:
+                self.ttl = ttl
+            self._clear()
+
+    def get(self, key: Tuple[str, str]) -> Optional[List[Dict]]:
+        """Get cached results for a key, or None on a miss or expired entry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters['misses'] += 1
+                return None
+            if entry[0] <= self._clock():
+                self._remove(key)
+                self._counters['expirations'] += 1
+                self._counters['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters['hits'] += 1
+            return list(entry[1])
+
+    def put(self, key: Tuple[str, str], results: List[Dict], generation: Optional[int] = None):
+        """
+        Cache results for a key, evicting the least recently used entries past the limit.
+
+        With a generation (read before the query ran), results are skipped if the
+        cache was invalidated since.
+        """
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (self._clock() + self.ttl, list(results))
+            for book in results:
+                self._keys_by_book.setdefault(book['id'], set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self._counters['evictions'] += 1
+
+    def invalidate(self, book_id: Optional[int] = None, inserted: bool = False):
+        """Drop entries affected by a change to one book, or everything for None/inserts."""
+        with self._lock:
+            self.generation += 1
+            self._counters['invalidations'] += 1
+            if book_id is None or inserted:
+                self._clear()
+                return
+            for key in list(self._keys_by_book.get(book_id, ())):
+                self._remove(key)
+
+    def stats(self) -> Dict:
+        """Get hit/miss/eviction counters and current size for tuning."""
+        with self._lock:
+            lookups = self._counters['hits'] + self._counters['misses']
+            return {
+                **self._counters,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hit_rate': round(self._counters['hits'] / lookups, 4) if lookups else 0.0,
+            }
+
+    def _remove(self, key):
+        _, results = self._entries.pop(key)
+        for book in results:
+            keys = self._keys_by_book.get(book['id'])
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_book[book['id']]
+
+    def _clear(self):
+        self._entries.clear()
+        self._keys_by_book.clear()
+
+
+search_cache = SearchCache()
+register_book_change_listener(search_cache.invalidate)
@@ -0,0 +1,122 @@
+"""
+Suggest Index Module - In-memory prefix index for typeahead completions
+
+Titles and authors are kept in sorted arrays of (lowercase, original) pairs,
+so completing a prefix is a bisect plus a short forward scan. The index is
+built from the books table on first use and updated incrementally when
+books are inserted; a periodic catalog version check picks up inserts made by
+other processes.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional
+
+from database import register_book_change_listener
+from repository import Query, conn_execute_read, get_book_by_id, get_catalog_version
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+VERSION_CHECK_INTERVAL = 1.0
+
+
+class PrefixIndex:
+    """Sorted array of distinct strings supporting case-insensitive prefix lookups."""
+
+    def __init__(self, values: Iterable[str] = ()):
+        self._entries = sorted({(value.lower(), value) for value in values})
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, value: str):
+        """Add a string, keeping the array sorted; duplicates are ignored."""
+        entry = (value.lower(), value)
+        i = bisect_left(self._entries, entry)
+        if i == len(self._entries) or self._entries[i] != entry:
+            self._entries.insert(i, entry)
+
+    def complete(self, prefix: str, limit: int = DEFAULT_LIMIT) -> List[str]:
+        """Get up to limit strings starting with prefix (case-insensitive), in order."""
+        prefix = prefix.lower()
+        matches = []
+        i = bisect_left(self._entries, (prefix,))
+        while i < len(self._entries) and len(matches) < limit:
+            key, value = self._entries[i]
+            if not key.startswith(prefix):
+                break
+            matches.append(value)
+            i += 1
+        return matches
+
+
+class SuggestIndex:
+    """
+    Title and author completions for the catalog, kept in step with inserts.
+
+    Inserts made by this process are applied incrementally. Every
+    check_interval seconds a lookup also compares the catalog version with
+    the one the index was built at, so books added by other workers show up
+    after a rebuild.
+    """
+
+    def __init__(self, check_interval: float = VERSION_CHECK_INTERVAL, clock=time.monotonic):
+        self.check_interval = check_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._titles: Optional[PrefixIndex] = None
+        self._authors: Optional[PrefixIndex] = None
+        self._version: Optional[int] = None
+        self._checked_at = 0.0
+
+    def rebuild(self):
+        """Load every title and author from the books table."""
+        with self._lock:
+            self._rebuild()
+
+    def _rebuild(self):
+        # Version first: a book inserted after it was read only makes the next check rebuild again
+        version = get_catalog_version()
+        rows = conn_execute_read(Query('books', ('title', 'author')))
+        self._titles = PrefixIndex(row['title'] for row in rows)
+        self._authors = PrefixIndex(row['author'] for row in rows)
+        self._version = version
+        self._checked_at = self._clock()
+
+    def suggest(self, prefix: str, limit: int = DEFAULT_LIMIT) -> Dict[str, List[str]]:
+        """Get title and author completions for a prefix."""
+        with self._lock:
+            if self._titles is None:
+                self._rebuild()
+            elif self._clock() - self._checked_at >= self.check_interval:
+                self._checked_at = self._clock()
+                if get_catalog_version() != self._version:
+                    self._rebuild()
+            return {
+                'titles': self._titles.complete(prefix, limit),
+                'authors': self._authors.complete(prefix, limit),
+            }
+
+    def on_book_changed(self, book_id: Optional[int], inserted: bool = False):
+        """Book change listener: add inserted books, drop the index on a full reset."""
+        if book_id is None:
+            with self._lock:
+                self._titles = self._authors = self._version = None
+            return
+        if not inserted:
+            return
+
+        book = get_book_by_id(book_id)
+        if book:
+            # A rebuild in progress holds the lock, so the book is added once it is installed
+            with self._lock:
+                if self._titles is not None:
+                    self._titles.add(book.title)
+                    self._authors.add(book.author)
+                    # The insert bumped the catalog version by one
+                    self._version += 1
+
+
+suggest_index = SuggestIndex()
+register_book_change_listener(suggest_index.on_book_changed)
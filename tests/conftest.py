@@ -1,7 +1,9 @@
 import subprocess
 import time
 import os
+import shutil
 import sys
+import tempfile
 import signal
 import pytest
 import requests
@@ -33,4 +35,44 @@ def live_server():
     yield url
 
     # Kill Flask server when tests finish
-    os.killpg(os.getpgid(proc.pid), signal.SIGTERM)
\ No newline at end of file
+    os.killpg(os.getpgid(proc.pid), signal.SIGTERM)
+
+@pytest.fixture(scope="session", autouse=True)
+def test_database():
+    """
+    Point the app at a scratch database for the whole session instead of library.db.
+
+    Each pytest-xdist worker gets its own file, on tmpfs (/dev/shm) where available
+    so commits never wait on the disk. The schema and sample data are built once
+    and kept as an in-memory snapshot that every test starts from.
+    """
+    import database
+
+    shm = '/dev/shm'
+    worker = os.environ.get('PYTEST_XDIST_WORKER', 'main')
+    directory = tempfile.mkdtemp(prefix=f'library-test-{worker}-',
+                                 dir=shm if os.access(shm, os.W_OK) else None)
+    original = database.DATABASE
+    database.DATABASE = os.path.join(directory, 'library.db')
+    database.init_database()
+    database.add_sample_data()
+    snapshot = database.snapshot_database()
+
+    yield snapshot
+
+    snapshot.close()
+    database.DATABASE = original
+    shutil.rmtree(directory, ignore_errors=True)
+
+@pytest.fixture(autouse=True)
+def clean_db(test_database):
+    """Restore the sample-data snapshot (every table, archives included) before each test."""
+    from database import restore_database
+
+    restore_database(test_database)
+    yield
+
+@pytest.fixture
+def fresh_db(clean_db):
+    """Older name for clean_db, kept for the original test modules."""
+    yield
@@ -2,28 +2,14 @@ import pytest
 from datetime import datetime, timedelta
 
 from services.library_service import (
-    add_book_to_catalog, get_all_books, borrow_book_by_patron, return_book_by_patron,
+    add_book_to_catalog, borrow_book_by_patron, return_book_by_patron,
     calculate_late_fee_for_book, search_books_in_catalog, get_patron_status_report, get_book_by_isbn
 )
-from database import init_database, insert_book, get_db_connection, add_sample_data
+from database import init_database, insert_book, get_db_connection, add_sample_data, get_all_books
 from services.library_service import *
 
 # Tests written by ChatGPT for comparison purposes
 
-# ------------------------
-# Test Setup Fixture
-# ------------------------
-@pytest.fixture(autouse=True)
-def fresh_db():
-    conn = get_db_connection()
-    conn.execute('''DROP TABLE books''')
-    conn.execute('''DROP TABLE borrow_records''')
-    conn.close()
-
-    init_database()
-    add_sample_data()
-    yield
-
 # ========================
 # R1: Add Book to Catalog
 # ========================
@@ -2,17 +2,6 @@ import pytest
 from services.library_service import *
 from database import *
 
-@pytest.fixture
-def fresh_db():
-    conn = get_db_connection()
-    conn.execute('''DROP TABLE books''')
-    conn.execute('''DROP TABLE borrow_records''')
-    conn.close()
-
-    init_database()
-    add_sample_data()
-    yield
-
 def test_add_1(fresh_db):
     success, message = add_book_to_catalog("Test Book", "Test Author", "1234567890123", 5)
     assert success == True
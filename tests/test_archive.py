@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+
+from database import *
+from services.library_service import *
+
+
+def _closed_loan(patron_id, book_id, borrowed_days_ago, returned_days_ago):
+    now = datetime.now()
+    conn = get_db_connection()
+    conn.execute('''
+        INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (patron_id, book_id,
+          (now - timedelta(days=borrowed_days_ago)).isoformat(),
+          (now - timedelta(days=borrowed_days_ago - 14)).isoformat(),
+          (now - timedelta(days=returned_days_ago)).isoformat()))
+    conn.commit()
+    conn.close()
+
+def test_archive_moves_only_old_closed_loans(clean_db):
+    _closed_loan("000001", 1, 400, 390)
+    _closed_loan("000001", 2, 20, 10)
+    borrow_book_by_patron("000001", 1)
+
+    moved = archive_closed_loans()
+    assert moved == 1
+
+    hot = conn_execute_read('SELECT * FROM borrow_records WHERE patron_id = ?', ("000001",))
+    assert len(hot) == 2
+    assert get_patron_borrow_count("000001") == 1
+
+def test_archive_partitions_by_borrow_year(clean_db):
+    _closed_loan("000001", 1, 400, 390)
+    archive_closed_loans()
+
+    year = (datetime.now() - timedelta(days=400)).year
+    conn = get_db_connection()
+    assert archive_table_name(year) in get_archive_tables(conn)
+    conn.close()
+
+def test_history_unions_archives(clean_db):
+    _closed_loan("000001", 1, 400, 390)
+    _closed_loan("000001", 2, 20, 10)
+    archive_closed_loans()
+
+    assert len(get_patron_borrow_history("000001")) == 2
+    assert len(get_patron_borrow_history("000001", include_archived=False)) == 1
+
+def test_archive_nothing_to_move(clean_db):
+    assert archive_closed_loans() == 0
+    assert get_patron_borrow_history("123456")[0]['title'] == '1984'
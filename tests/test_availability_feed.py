@@ -0,0 +1,80 @@
+import json
+
+from app import create_app
+from database import *
+from services.availability_feed import AvailabilityBroker, availability_broker
+from services.library_service import borrow_book_by_patron, return_book_by_patron
+
+
+def _book(book_id, available=1):
+    return {'id': book_id, 'title': 'T', 'author': 'A', 'isbn': '9780000000000',
+            'total_copies': 3, 'available_copies': available}
+
+def test_pending_events_coalesce_per_book():
+    broker = AvailabilityBroker(max_pending=10)
+    subscription = broker.subscribe()
+    broker.publish(_book(1, 3))
+    broker.publish(_book(2, 1))
+    broker.publish(_book(1, 2))
+
+    resync, events = subscription.next_batch(0)
+    assert not resync
+    assert [(e['id'], e['available_copies']) for e in events] == [(2, 1), (1, 2)]
+    assert subscription.next_batch(0) == (False, [])
+
+def test_slow_subscriber_overflows_into_resync():
+    broker = AvailabilityBroker(max_pending=2)
+    slow = broker.subscribe()
+    for book_id in range(1, 6):
+        broker.publish(_book(book_id))
+
+    assert slow.next_batch(0) == (True, [])
+    broker.publish(_book(9))
+    assert [e['id'] for e in slow.next_batch(0)[1]] == [9]
+    assert broker.stats()['resyncs'] == 1
+
+def test_reconnect_replays_history():
+    broker = AvailabilityBroker(history=3)
+    for book_id in range(1, 6):
+        broker.publish(_book(book_id))
+
+    resync, events = broker.subscribe(last_seq=3).next_batch(0)
+    assert not resync and [e['seq'] for e in events] == [4, 5]
+    assert broker.subscribe(last_seq=1).next_batch(0) == (True, [])
+    assert broker.subscribe(last_seq=5).next_batch(0) == (False, [])
+
+def test_circulation_publishes_availability(clean_db):
+    subscription = availability_broker.subscribe()
+    try:
+        borrow_book_by_patron("000001", 1)
+        return_book_by_patron("123456", 3)
+        _, events = subscription.next_batch(1)
+        assert [(e['id'], e['available_copies']) for e in events] == [(1, 2), (3, 1)]
+    finally:
+        availability_broker.unsubscribe(subscription)
+
+def test_catalog_stream_sends_rendered_rows(clean_db):
+    client = create_app({'SSE_HEARTBEAT': 0.05}).test_client()
+    since = availability_broker.last_seq
+    response = client.get(f'/catalog/stream?since={since}')
+    assert response.mimetype == 'text/event-stream'
+    chunks = iter(response.response)
+    assert next(chunks).startswith(b'retry:')
+
+    borrow_book_by_patron("000001", 1)
+    chunk = next(chunks)
+    while chunk.startswith(b':'):
+        chunk = next(chunks)
+    fields = dict(line.split(': ', 1) for line in chunk.decode().strip().split('\n'))
+    assert fields['event'] == 'availability'
+    assert int(fields['id']) == since + 1
+    data = json.loads(fields['data'])
+    assert data['available_copies'] == 2
+    assert 'data-book-id="1"' in data['html'] and '2/3 Available' in data['html']
+
+    response.close()
+    assert availability_broker.stats()['subscribers'] == 0
+
+def test_catalog_page_subscribes_from_render_point(clean_db):
+    page = create_app().test_client().get('/catalog').data.decode()
+    assert f'/catalog/stream?since={availability_broker.last_seq}' in page
@@ -0,0 +1,123 @@
+from app import create_app
+from database import *
+from services.library_service import *
+
+
+def _branch(code):
+    return next(branch['id'] for branch in get_branches() if branch['code'] == code)
+
+def _holdings(book_id):
+    return {row['code']: (row['total_copies'], row['available_copies']) for row in get_book_holdings(book_id)}
+
+def _assert_aggregates_match_holdings():
+    mismatched = conn_execute_read('''
+        SELECT b.id FROM books b JOIN holdings h ON h.book_id = b.id
+        GROUP BY b.id
+        HAVING b.total_copies != SUM(h.total_copies) OR b.available_copies != SUM(h.available_copies)
+    ''')
+    assert mismatched == []
+
+def test_sample_copies_are_split_across_branches(clean_db):
+    assert _holdings(1) == {'MAIN': (2, 2), 'EAST': (1, 1)}
+    assert _holdings(3) == {'MAIN': (1, 0)}
+    assert get_book_by_id(1)['total_copies'] == 3
+    _assert_aggregates_match_holdings()
+
+def test_borrow_at_branch(clean_db):
+    east = _branch('EAST')
+    assert borrow_book_by_patron("000001", 1, east)[0] is True
+    assert borrow_book_by_patron("000002", 1, east) == (
+        False, "This book is currently not available at this branch.")
+    assert borrow_book_by_patron("000002", 2, east)[1] == "This book is currently not available at this branch."
+    assert borrow_book_by_patron("000002", 1, 99) == (False, "This branch does not exist.")
+
+    assert _holdings(1) == {'MAIN': (2, 2), 'EAST': (1, 0)}
+    assert get_book_by_id(1)['available_copies'] == 2
+    loans = conn_execute_read("SELECT branch_id FROM borrow_records WHERE patron_id = '000001'")
+    assert loans == [{'branch_id': east}]
+    _assert_aggregates_match_holdings()
+
+def test_borrow_anywhere_drains_every_branch(clean_db):
+    for patron in ("000001", "000002", "000003"):
+        assert borrow_book_by_patron(patron, 1)[0] is True
+    assert borrow_book_by_patron("000004", 1) == (False, "This book is currently not available.")
+    assert _holdings(1) == {'MAIN': (2, 0), 'EAST': (1, 0)}
+    _assert_aggregates_match_holdings()
+
+def test_return_to_other_branch_moves_copy(clean_db):
+    east = _branch('EAST')
+    assert return_book_by_patron("123456", 3, east)[0] is True
+    assert _holdings(3) == {'MAIN': (0, 0), 'EAST': (1, 1)}
+    assert get_book_by_id(3)['available_copies'] == 1
+
+    borrow_book_by_patron("000001", 1, east)
+    assert return_book_by_patron("000001", 1)[0] is True
+    assert _holdings(1) == {'MAIN': (2, 2), 'EAST': (1, 1)}
+    _assert_aggregates_match_holdings()
+
+def test_ready_hold_waits_at_return_branch(clean_db):
+    east = _branch('EAST')
+    place_hold("000001", 3)
+    return_book_by_patron("123456", 3, east)
+    assert get_hold("000001", 3)['branch_id'] == east
+
+    cancel_hold("000001", 3)
+    assert _holdings(3) == {'MAIN': (0, 0), 'EAST': (1, 1)}
+    _assert_aggregates_match_holdings()
+
+def test_stock_and_withdraw_copies(clean_db):
+    east = _branch('EAST')
+    assert add_branch_copies(2, east, 3) is True
+    assert add_branch_copies(2, east, -4) is False
+    assert add_branch_copies(2, east, -1) is True
+    assert add_branch_copies(99, east, 1) is False
+    assert add_branch_copies(2, 99, 1) is False
+    assert _holdings(2) == {'MAIN': (2, 2), 'EAST': (2, 2)}
+    assert get_book_by_id(2)['total_copies'] == 4
+    _assert_aggregates_match_holdings()
+
+def test_new_branch_and_book(clean_db):
+    north = insert_branch('NORTH', 'Northside Branch')
+    assert insert_branch('NORTH', 'Duplicate') is None
+    insert_book("Branch Book", "Author", "9781000000501", 4, 4, north)
+    book = get_book_by_isbn("9781000000501")
+    assert _holdings(book['id']) == {'NORTH': (4, 4)}
+    assert [b['id'] for b in get_branch_books(north)] == [book['id']]
+
+def test_books_without_holdings_move_to_main_branch(clean_db):
+    conn = get_db_connection()
+    conn.execute('''
+        INSERT INTO books (title, author, isbn, total_copies, available_copies)
+        VALUES ('Legacy', 'Author', '9781000000502', 5, 4)
+    ''')
+    conn.commit()
+    conn.close()
+
+    init_database()
+    book = get_book_by_isbn("9781000000502")
+    assert (book['total_copies'], book['available_copies']) == (5, 4)
+    assert _holdings(book['id']) == {'MAIN': (5, 4)}
+
+def test_branch_search(clean_db):
+    east = _branch('EAST')
+    results = search_books_in_catalog("gatsby", "title", east)
+    assert [(r['id'], r['branch_available_copies'], r['available_copies']) for r in results] == [(1, 1, 3)]
+    assert search_books_in_catalog("1984", "title", east) == []
+    assert len(search_books_in_catalog("1984", "title")) == 1
+
+def test_branch_routes(clean_db):
+    client = create_app().test_client()
+    east = _branch('EAST')
+
+    response = client.get('/api/books/1/availability')
+    assert response.get_json()['available_copies'] == 3
+    assert [b['code'] for b in response.get_json()['branches']] == ['MAIN', 'EAST']
+    assert client.get('/api/books/99/availability').status_code == 404
+    assert len(client.get('/api/branches').get_json()['results']) == 2
+
+    page = client.get(f'/catalog?branch={east}').get_data(as_text=True)
+    assert 'The Great Gatsby' in page and '1984' not in page
+    assert f'name="branch_id" value="{east}"' in page
+
+    client.post('/borrow', data={'patron_id': '000001', 'book_id': '1', 'branch_id': str(east)})
+    assert _holdings(1)['EAST'] == (1, 0)
@@ -0,0 +1,31 @@
+from app import create_app
+from database import *
+from routes.catalog_routes import row_cache
+from services.library_service import *
+
+
+def test_catalog_rows_cached_between_requests(clean_db):
+    client = create_app().test_client()
+    first = client.get('/catalog').data
+
+    hits = row_cache.hits
+    second = client.get('/catalog').data
+    assert second == first
+    assert row_cache.hits == hits + 3
+
+def test_borrow_invalidates_row(clean_db):
+    client = create_app().test_client()
+    assert b'3/3 Available' in client.get('/catalog').data
+
+    borrow_book_by_patron("000001", 1)
+    assert b'2/3 Available' in client.get('/catalog').data
+
+def test_row_html_is_escaped(clean_db):
+    insert_book('<b>Bold</b>', 'Author', '9781111111111', 1, 1)
+    data = create_app().test_client().get('/catalog').data
+    assert b'&lt;b&gt;Bold&lt;/b&gt;' in data
+
+def test_schema_reset_clears_rows(clean_db):
+    create_app().test_client().get('/catalog')
+    init_database()
+    assert row_cache._rows == {}
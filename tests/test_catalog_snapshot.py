@@ -0,0 +1,70 @@
+import pytest
+
+from database import *
+from services.catalog_snapshot import CatalogSnapshot, export_snapshot, snapshot_search
+from services.library_service import search_books_in_catalog, borrow_book_by_patron
+from services.search_cache import search_cache
+
+
+@pytest.fixture
+def snapshot(clean_db, tmp_path):
+    path = str(tmp_path / 'catalog.snap')
+    snapshot_search.configure(path)
+    search_cache.configure()
+    yield path
+    snapshot_search.configure(None)
+    search_cache.configure()
+
+def test_export_round_trip(clean_db, tmp_path):
+    path = str(tmp_path / 'catalog.snap')
+    version = export_snapshot(path)
+    snap = CatalogSnapshot(path)
+
+    assert snap.version == version == get_catalog_version()
+    books = get_all_books('title')
+    assert list(snap.ids) == [book.id for book in books]
+    assert [snap.value('isbn', row) for row in range(snap.count)] == [book.isbn for book in books]
+
+def test_find_rows_ignores_matches_across_rows(clean_db, tmp_path):
+    insert_book('abc', 'Author', '9781000000001', 1, 1)
+    insert_book('def', 'Author', '9781000000002', 1, 1)
+    path = str(tmp_path / 'catalog.snap')
+    export_snapshot(path)
+    snap = CatalogSnapshot(path)
+
+    # "abc" and "def" sit next to each other in the title heap
+    assert snap.find_rows('title_key', b'cd') == []
+    assert [snap.value('title', row) for row in snap.find_rows('title_key', b'de')] == ['def']
+
+@pytest.mark.parametrize('search_type, term', [
+    ('title', 'the'), ('title', 'GREAT'), ('author', 'lee'), ('author', 'nobody'), ('title', 'e'),
+])
+def test_snapshot_matches_sqlite(snapshot, search_type, term):
+    snapshot_search.configure(None)
+    expected = search_books_in_catalog(term, search_type)
+    snapshot_search.configure(snapshot)
+
+    assert snapshot_search.search(search_type, term.lower()) == expected
+
+def test_snapshot_refreshes_on_new_book(snapshot):
+    assert search_books_in_catalog('snapshot', 'title') == []
+    refreshes = snapshot_search.refreshes
+
+    insert_book('Snapshot Stories', 'Author', '9781000000003', 2, 2)
+    result = search_books_in_catalog('snapshot', 'title')
+    assert [book['title'] for book in result] == ['Snapshot Stories']
+    assert snapshot_search.refreshes == refreshes + 1
+
+def test_availability_is_live_without_refresh(snapshot):
+    before = search_books_in_catalog('gatsby', 'title')[0]['available_copies']
+    refreshes = snapshot_search.refreshes
+
+    borrow_book_by_patron('123456', 1)
+    search_cache.configure()
+    assert search_books_in_catalog('gatsby', 'title')[0]['available_copies'] == before - 1
+    assert snapshot_search.refreshes == refreshes
+
+def test_other_searches_fall_back(snapshot):
+    assert snapshot_search.search('isbn', '9780451524935') is None
+    assert snapshot_search.search('title', '1_84') is None
+    assert len(search_books_in_catalog('9780451524935', 'isbn')) == 1
@@ -0,0 +1,89 @@
+import csv
+import json
+import os
+from datetime import datetime, timedelta
+
+from app import create_app
+from database import *
+from services.circulation_report import *
+
+
+def _loan(patron_id, book_id, borrowed_days_ago, returned_days_ago=None):
+    now = datetime.now()
+    conn = get_db_connection()
+    conn.execute('''
+        INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (patron_id, book_id,
+          (now - timedelta(days=borrowed_days_ago)).isoformat(),
+          (now - timedelta(days=borrowed_days_ago - 14)).isoformat(),
+          (now - timedelta(days=returned_days_ago)).isoformat() if returned_days_ago is not None else None))
+    conn.commit()
+    conn.close()
+
+def _seed():
+    _loan('000001', 1, 30, 10)     # returned 6 days late
+    _loan('000001', 2, 20)         # still out, 6 days overdue
+    _loan('000002', 1, 40, 30)     # returned on time
+    _loan('000003', 2, 16)         # still out, 2 days overdue
+    for _ in range(5):
+        _loan('000004', 1, 3, 1)
+
+def test_report_counts(clean_db):
+    _seed()
+    report = generate_circulation_report(workers=1)
+
+    assert report['loans'] == 10  # includes the sample 1984 loan
+    titles = {row['book_id']: row for row in report['titles']}
+    assert titles[1]['loans'] == 7
+    assert titles[2]['loans'] == 2
+    assert titles[3]['utilization'] == 0.0
+    assert report['titles'][0]['book_id'] == 1
+
+    assert sum(day['loans'] for day in report['daily']) == 10
+    three_days_ago = (datetime.now() - timedelta(days=3)).date().isoformat()
+    assert {'date': three_days_ago, 'loans': 5} in report['daily']
+
+    assert report['overdue_patrons'] == [
+        {'patron_id': '000001', 'overdue_days': 12, 'overdue_loans': 2},
+        {'patron_id': '000003', 'overdue_days': 2, 'overdue_loans': 1},
+    ]
+
+def test_parallel_matches_serial_and_reads_archives(clean_db):
+    _seed()
+    _loan('000005', 3, 400, 380)
+    archive_closed_loans()
+
+    serial = generate_circulation_report(workers=1)
+    parallel = generate_circulation_report(workers=3)
+    assert parallel['loans'] == serial['loans'] == 11
+    assert parallel['titles'] == serial['titles']
+    assert parallel['daily'] == serial['daily']
+    assert parallel['overdue_patrons'] == serial['overdue_patrons']
+
+def test_id_ranges_cover_table(clean_db):
+    for i in range(37):
+        _loan('000001', 1, 5, 1)
+    conn = get_db_connection()
+    ranges = split_id_ranges(conn, workers=2)
+    conn.close()
+
+    covered = [i for _, lo, hi in ranges for i in range(lo, hi + 1)]
+    assert covered == list(range(1, 39))
+
+def test_report_cli_writes_json_and_csv(clean_db, tmp_path):
+    _seed()
+    runner = create_app().test_cli_runner()
+
+    json_path = str(tmp_path / 'report.json')
+    result = runner.invoke(args=['circulation-report', '--workers', '1', '--output', json_path])
+    assert result.exit_code == 0
+    with open(json_path) as f:
+        assert json.load(f)['loans'] == 10
+
+    csv_dir = str(tmp_path / 'csv')
+    result = runner.invoke(args=['circulation-report', '--workers', '1', '--format', 'csv', '--output', csv_dir])
+    assert result.exit_code == 0
+    assert sorted(os.listdir(csv_dir)) == ['daily.csv', 'overdue_patrons.csv', 'titles.csv']
+    with open(os.path.join(csv_dir, 'overdue_patrons.csv')) as f:
+        assert next(csv.DictReader(f))['patron_id'] == '000001'
@@ -0,0 +1,58 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from database import *
+from services.library_service import *
+
+EXPECTED_FAILURES = (
+    "This book is currently not available.",
+    "You have reached the maximum borrowing limit of 5 books.",
+)
+
+
+def _fire(requests, workers=32):
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda args: borrow_book_by_patron(*args), requests))
+
+def _book_id(isbn):
+    return get_book_by_isbn(isbn)['id']
+
+def test_same_patron_same_book_respects_limit(clean_db):
+    insert_book("Plenty", "Author", "9781000000001", 20, 20)
+    book_id = _book_id("9781000000001")
+
+    results = _fire([("000001", book_id)] * 2000)
+
+    assert sum(success for success, _ in results) == MAX_BORROWED_BOOKS
+    assert all(message in EXPECTED_FAILURES for success, message in results if not success)
+    assert get_patron_borrow_count("000001") == MAX_BORROWED_BOOKS
+    assert get_book_by_id(book_id)['available_copies'] == 20 - MAX_BORROWED_BOOKS
+
+def test_many_patrons_never_oversubscribe_book(clean_db):
+    insert_book("Scarce", "Author", "9781000000002", 3, 3)
+    book_id = _book_id("9781000000002")
+
+    results = _fire([(f"{i % 400:06d}", book_id) for i in range(2000)])
+
+    assert sum(success for success, _ in results) == 3
+    assert get_book_by_id(book_id)['available_copies'] == 0
+    loans = conn_execute_read('SELECT COUNT(*) AS count FROM borrow_records WHERE book_id = ?', (book_id,))
+    assert loans[0]['count'] == 3
+
+def test_limit_across_books(clean_db):
+    book_ids = []
+    for i in range(10):
+        insert_book(f"Book {i}", "Author", f"97810000001{i:02d}", 50, 50)
+        book_ids.append(_book_id(f"97810000001{i:02d}"))
+
+    results = _fire([("000002", book_ids[i % 10]) for i in range(1000)])
+
+    assert sum(success for success, _ in results) == MAX_BORROWED_BOOKS
+    total_available = sum(get_book_by_id(book_id)['available_copies'] for book_id in book_ids)
+    assert total_available == 500 - MAX_BORROWED_BOOKS
+
+def test_borrow_transaction_outcomes(clean_db):
+    now = datetime.now()
+    assert borrow_book_transaction("000003", 999, now, now) == BORROW_BOOK_MISSING
+    assert borrow_book_transaction("000003", 3, now, now) == BORROW_UNAVAILABLE
+    assert borrow_book_transaction("000003", 1, now, now, max_borrowed=0) == BORROW_LIMIT_REACHED
+    assert borrow_book_transaction("000003", 1, now, now) == BORROW_OK
@@ -0,0 +1,34 @@
+import os
+
+import database
+from database import *
+
+
+def test_tests_do_not_touch_library_db():
+    repo_db = os.path.join(os.path.dirname(__file__), '..', 'library.db')
+    assert os.path.realpath(database.DATABASE) != os.path.realpath(repo_db)
+
+def test_restore_undoes_every_change(test_database):
+    conn = get_db_connection()
+    conn.execute('CREATE TABLE scratch (id INTEGER)')
+    conn.execute('DELETE FROM borrow_records')
+    conn.commit()
+    conn.close()
+    insert_book("Snapshot Book", "Author", "9781000000701", 1, 1)
+
+    restore_database(test_database)
+    tables = [row['name'] for row in conn_execute_read("SELECT name FROM sqlite_master WHERE type = 'table'")]
+    assert 'scratch' not in tables
+    assert get_book_by_isbn("9781000000701") is None
+    assert get_patron_borrow_count("123456") == 1
+    assert ensure_schema() is False
+
+def test_snapshot_is_a_private_copy(test_database):
+    snapshot = snapshot_database()
+    try:
+        insert_book("After Snapshot", "Author", "9781000000702", 1, 1)
+        restore_database(snapshot)
+        assert get_book_by_isbn("9781000000702") is None
+        assert get_book_by_id(1)['title'] == "The Great Gatsby"
+    finally:
+        snapshot.close()
@@ -0,0 +1,83 @@
+import csv
+import io
+import json
+from datetime import date, datetime, timedelta
+
+from app import create_app
+from database import *
+from services.export_service import *
+
+
+def _loan(patron_id, book_id, borrowed, returned=None):
+    conn = get_db_connection()
+    conn.execute('''
+        INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (patron_id, book_id, borrowed.isoformat(), (borrowed + timedelta(days=14)).isoformat(),
+          returned.isoformat() if returned else None))
+    conn.commit()
+    conn.close()
+
+def _client():
+    return create_app().test_client()
+
+def test_row_batches_are_bounded(clean_db):
+    for i in range(25):
+        insert_book(f'Batch {i}', 'Author', f'{9781000000000 + i}', 1, 1)
+    batches = list(iter_row_batches('SELECT id FROM books', (), batch_size=10))
+    assert [len(batch) for batch in batches] == [10, 10, 8]
+
+def test_books_csv_with_available_filter(clean_db):
+    rows = list(csv.reader(io.StringIO(b''.join(iter_export('books', 'csv')).decode())))
+    assert rows[0] == ['id', 'title', 'author', 'isbn', 'total_copies', 'available_copies']
+    assert len(rows) == 4
+
+    available = b''.join(iter_export('books', 'csv', available_only=True)).decode()
+    assert '1984' not in available
+    assert 'The Great Gatsby' in available
+
+def test_loans_jsonl_filters(clean_db):
+    _loan('000001', 1, datetime(2024, 1, 10), datetime(2024, 1, 20))
+    _loan('000001', 2, datetime(2024, 3, 5))
+    _loan('000002', 1, datetime(2024, 3, 31, 18, 0))
+
+    def export(**filters):
+        data = b''.join(iter_export('loans', 'jsonl', **filters)).decode()
+        return [json.loads(line) for line in data.splitlines()]
+
+    assert [loan['book_id'] for loan in export(patron_id='000001')] == [1, 2]
+    march = export(start=date(2024, 3, 1), end=date(2024, 3, 31))
+    assert [loan['patron_id'] for loan in march] == ['000001', '000002']
+    assert march[0]['title'] == 'To Kill a Mockingbird'
+    assert march[0]['return_date'] is None
+
+def test_loans_export_includes_archives(clean_db):
+    _loan('000003', 1, datetime(2020, 5, 1), datetime(2020, 5, 10))
+    archive_closed_loans()
+    assert export_query('loans')[1].count('UNION') == 0
+
+    data = b''.join(iter_export('loans', 'csv', patron_id='000003', include_archived=True)).decode()
+    assert len(data.splitlines()) == 2
+    assert b''.join(iter_export('loans', 'csv', patron_id='000003')).decode().count('\n') == 1
+
+def test_export_endpoint_streams(clean_db):
+    response = _client().get('/export/books.jsonl')
+    assert response.is_streamed
+    assert response.mimetype == 'application/x-ndjson'
+    assert 'attachment' in response.headers['Content-Disposition']
+    assert len(response.data.splitlines()) == 3
+
+def test_export_endpoint_validation(clean_db):
+    client = _client()
+    assert client.get('/export/patrons.csv').status_code == 404
+    assert client.get('/export/books.xml').status_code == 404
+    assert client.get('/export/loans.csv?from=yesterday').status_code == 400
+
+def test_export_cli(clean_db, tmp_path):
+    path = str(tmp_path / 'loans.csv')
+    result = create_app().test_cli_runner().invoke(
+        args=['export', 'loans', '--output', path, '--patron', '123456'])
+    assert result.exit_code == 0
+    with open(path) as f:
+        rows = list(csv.DictReader(f))
+    assert [row['title'] for row in rows] == ['1984']
@@ -0,0 +1,88 @@
+import time
+from datetime import datetime, timedelta
+from unittest.mock import Mock
+
+from database import *
+from services.fee_scheduler import FeeAccrualScheduler
+from services.library_service import *
+
+
+def _loan(patron_id, book_id, due_days_ago, returned_days_ago=None):
+    now = datetime.now()
+    due = now - timedelta(days=due_days_ago)
+    returned = (now - timedelta(days=returned_days_ago)).isoformat() if returned_days_ago is not None else None
+    conn = get_db_connection()
+    conn.execute('''
+        INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (patron_id, book_id, (due - timedelta(days=14)).isoformat(), due.isoformat(), returned))
+    conn.commit()
+    conn.close()
+
+def _ledger():
+    return conn_execute_read('SELECT * FROM fee_ledger ORDER BY borrow_record_id')
+
+def test_accrual_matches_on_demand_calculation(clean_db):
+    _loan("000001", 1, 3)
+    _loan("000001", 2, 10)
+    _loan("000002", 1, 30)
+
+    assert accrue_late_fees() == 3
+    fees = {(row['patron_id'], row['book_id']): row['fee_amount'] for row in _ledger()}
+    for (patron_id, book_id), fee in fees.items():
+        assert fee == calculate_late_fee_for_book(patron_id, book_id)['fee_amount']
+    assert fees[("000002", 1)] == 15.0
+
+def test_accrual_is_incremental(clean_db):
+    _loan("000001", 1, 3)
+    assert accrue_late_fees() == 1
+    assert accrue_late_fees() == 0
+
+    tomorrow = datetime.now() + timedelta(days=1)
+    assert accrue_late_fees(tomorrow) == 1
+    assert _ledger()[0]['days_overdue'] == 4
+
+def test_late_return_fee_is_final(clean_db):
+    _loan("000001", 1, 10, returned_days_ago=5)
+    accrue_late_fees()
+    assert _ledger()[0]['days_overdue'] == 5
+
+def test_payment_uses_ledger(clean_db, mocker):
+    _loan("000001", 1, 10)
+    _loan("000001", 2, -5)
+    accrue_late_fees()
+    calculate = mocker.patch('services.library_service.calculate_late_fee_for_book')
+
+    gateway = Mock(spec=PaymentGateway)
+    gateway.process_payment.return_value = (True, "txn_1", "ok")
+    success, _, _ = pay_late_fees("000001", 1, payment_gateway=gateway)
+    assert success
+    assert gateway.process_payment.call_args.kwargs['amount'] == 6.5
+    calculate.assert_not_called()
+
+def test_stale_ledger_falls_back(clean_db):
+    _loan("000001", 1, 10)
+    assert get_ledger_late_fee("000001", 1) is None
+
+def test_single_leader(clean_db):
+    leader = FeeAccrualScheduler(interval=60, owner="worker-a")
+    follower = FeeAccrualScheduler(interval=60, owner="worker-b")
+    _loan("000001", 1, 3)
+
+    assert leader.run_once() == 1
+    assert follower.run_once() is None
+
+    release_scheduler_lease('fee_accrual', "worker-a")
+    assert follower.run_once() == 0
+    assert leader.run_once() is None
+
+def test_scheduler_thread_runs(clean_db):
+    _loan("000001", 1, 3)
+    scheduler = FeeAccrualScheduler(interval=60)
+    scheduler.start()
+    for _ in range(100):
+        if _ledger():
+            break
+        time.sleep(0.02)
+    scheduler.stop()
+    assert len(_ledger()) == 1
@@ -0,0 +1,72 @@
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from database import *
+from services.library_service import *
+
+
+@pytest.fixture
+def group_commit(clean_db):
+    writer = enable_group_commit(max_delay=0.005)
+    yield writer
+    disable_group_commit()
+
+def test_concurrent_writes_are_batched(group_commit):
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(lambda _: update_book_availability(1, 1), range(400)))
+
+    assert all(results)
+    assert get_book_by_id(1)['available_copies'] == 403
+    assert group_commit.statements == 400
+    assert group_commit.batches < 400
+
+def test_failed_statement_does_not_undo_batch(group_commit):
+    bad = group_commit.submit('INSERT INTO books (title) VALUES (?)', ('No author',))
+    good = group_commit.submit('UPDATE books SET available_copies = 0 WHERE id = ?', (1,))
+
+    assert good.result() == 1
+    with pytest.raises(sqlite3.IntegrityError):
+        bad.result()
+    assert get_book_by_id(1)['available_copies'] == 0
+
+def test_circulation_through_writer(group_commit):
+    assert borrow_book_by_patron("000001", 1)[0]
+    success, message = return_book_by_patron("000001", 1)
+    assert success
+    assert return_book_by_patron("000001", 1) == (False, "Book not borrowed by patron.")
+    assert get_patron_borrow_count("000001") == 0
+    assert get_book_by_id(1)['available_copies'] == 3
+    assert group_commit.statements == 3
+    assert group_commit.batches == 3
+
+def test_concurrent_borrows_share_batches(group_commit):
+    add_book_to_catalog("Plenty", "Author", "9781000000601", 40)
+    book_id = get_book_by_isbn("9781000000601")['id']
+    patrons = [f"{i:06d}" for i in range(100, 140)]
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(lambda patron: borrow_book_by_patron(patron, book_id)[0], patrons))
+
+    assert all(results)
+    assert get_book_by_id(book_id)['available_copies'] == 0
+    assert group_commit.statements == 40
+    assert group_commit.batches < 40
+
+def test_failed_transaction_is_undone(group_commit):
+    def half_done(conn):
+        conn.execute('UPDATE books SET available_copies = 0 WHERE id = 1')
+        raise sqlite3.IntegrityError('refused')
+
+    with pytest.raises(sqlite3.IntegrityError):
+        run_write_transaction(half_done)
+    assert get_book_by_id(1)['available_copies'] == 3
+
+def test_disable_flushes_pending_writes(clean_db):
+    writer = enable_group_commit(max_delay=0.05)
+    futures = [writer.submit('UPDATE books SET available_copies = available_copies + 1 WHERE id = 1')
+               for _ in range(10)]
+    disable_group_commit()
+
+    assert all(future.result() == 1 for future in futures)
+    assert get_book_by_id(1)['available_copies'] == 13
@@ -0,0 +1,153 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import routes.api_routes
+from app import create_app
+from database import *
+from services.library_service import *
+from services.hold_notifier import hold_notifier
+
+
+def test_hold_only_for_unavailable_books(clean_db):
+    assert place_hold("000001", 1) == (False, "This book is available now; borrow it instead.")
+    assert place_hold("000001", 99)[1] == "This book does not exist."
+    assert place_hold("123456", 3)[1] == "You already have this book borrowed."
+    assert place_hold("12", 3)[0] is False
+
+def test_queue_is_fifo(clean_db):
+    assert place_hold("000001", 3) == (True, "Hold placed. You are number 1 in the queue.")
+    assert place_hold("000002", 3) == (True, "Hold placed. You are number 2 in the queue.")
+    assert place_hold("000001", 3)[1] == "You already have a hold on this book."
+
+    success, _ = return_book_by_patron("123456", 3)
+    assert success
+    assert get_hold("000001", 3)['status'] == HOLD_READY
+    assert get_hold("000002", 3)['position'] == 1
+    # The copy is set aside, not put back on the shelf
+    assert get_book_by_id(3)['available_copies'] == 0
+
+def test_ready_hold_borrows_set_aside_copy(clean_db):
+    place_hold("000001", 3)
+    place_hold("000002", 3)
+    return_book_by_patron("123456", 3)
+
+    assert borrow_book_by_patron("000002", 3) == (False, "This book is currently not available.")
+    assert borrow_book_by_patron("000001", 3)[0] is True
+    assert get_hold("000001", 3) is None
+    assert get_book_by_id(3)['available_copies'] == 0
+
+    return_book_by_patron("000001", 3)
+    assert get_hold("000002", 3)['status'] == HOLD_READY
+
+def test_return_without_holds_restocks(clean_db):
+    return_book_by_patron("123456", 3)
+    assert get_book_by_id(3)['available_copies'] == 1
+
+def test_cancel_ready_hold_passes_copy_on(clean_db):
+    place_hold("000001", 3)
+    place_hold("000002", 3)
+    return_book_by_patron("123456", 3)
+
+    assert cancel_hold("000001", 3) == (True, "Hold cancelled.")
+    assert get_hold("000002", 3)['status'] == HOLD_READY
+    assert cancel_hold("000002", 3)[0] is True
+    assert get_book_by_id(3)['available_copies'] == 1
+    assert cancel_hold("000002", 3) == (False, "No hold found for this book.")
+
+def test_hold_api_and_long_poll(clean_db):
+    client = create_app().test_client()
+    response = client.post('/api/holds/000001/3')
+    assert response.status_code == 200
+    assert response.get_json()['hold']['position'] == 1
+
+    timed_out = client.get('/api/holds/000001/3/wait?timeout=0.1').get_json()
+    assert timed_out['status'] == HOLD_WAITING
+    for timeout in ('nan', 'inf', 'abc'):
+        assert client.get(f'/api/holds/000001/3/wait?timeout={timeout}').status_code == 400
+    assert client.get('/api/holds/000001/3/wait?timeout=-5').get_json()['status'] == HOLD_WAITING
+
+    result = {}
+    def wait():
+        start = time.monotonic()
+        result['hold'] = create_app().test_client().get('/api/holds/000001/3/wait?timeout=10').get_json()
+        result['elapsed'] = time.monotonic() - start
+
+    waiter = threading.Thread(target=wait)
+    waiter.start()
+    time.sleep(0.2)
+    return_book_by_patron("123456", 3)
+    waiter.join(timeout=10)
+
+    assert result['hold']['status'] == HOLD_READY
+    assert result['elapsed'] < 2
+    assert hold_notifier.watched() == 0
+    assert client.get('/api/holds/000002/3/wait').status_code == 404
+
+def test_wait_reports_why_hold_ended(clean_db, monkeypatch):
+    monkeypatch.setattr(routes.api_routes, 'HOLD_RECHECK_INTERVAL', 0.05)
+    client = create_app().test_client()
+    place_hold("000001", 3)
+    place_hold("000002", 3)
+
+    result = {}
+    waiter = threading.Thread(target=lambda: result.update(
+        response=client.get('/api/holds/000002/3/wait?timeout=10')))
+    waiter.start()
+    time.sleep(0.2)
+    cancel_hold("000002", 3)
+    waiter.join(timeout=10)
+    assert result['response'].status_code == 404
+    assert result['response'].get_json() == {'error': 'Hold was cancelled', 'status': HOLD_CANCELLED}
+
+    # Picked up between two rechecks: the poll still reports what happened
+    return_book_by_patron("123456", 3)
+    assert borrow_book_by_patron("000001", 3)[0] is True
+    polls = [{'status': HOLD_WAITING, 'position': 1}, None]
+    monkeypatch.setattr(routes.api_routes, 'get_hold', lambda patron_id, book_id: polls.pop(0))
+    response = client.get('/api/holds/000001/3/wait?timeout=10')
+    assert response.get_json() == {'error': 'Hold was fulfilled', 'status': HOLD_FULFILLED}
+    assert hold_notifier.watched() == 0
+
+def test_hold_form_on_catalog(clean_db):
+    client = create_app().test_client()
+    assert b'Place Hold' in client.get('/catalog').data
+    response = client.post('/hold', data={'patron_id': '000001', 'book_id': '3'}, follow_redirects=True)
+    assert b'number 1 in the queue' in response.data
+
+def _age_ready_holds(days):
+    conn = get_db_connection()
+    conn.execute('UPDATE holds SET ready_at = ? WHERE status = ?',
+                 ((datetime.now() - timedelta(days=days)).isoformat(), HOLD_READY))
+    conn.commit()
+    conn.close()
+
+def test_uncollected_hold_expires_to_next_in_queue(clean_db, monkeypatch):
+    place_hold("000001", 3)
+    place_hold("000002", 3)
+    return_book_by_patron("123456", 3)
+
+    _age_ready_holds(HOLD_PICKUP_DAYS - 1)
+    assert expire_uncollected_holds() == 0
+    _age_ready_holds(HOLD_PICKUP_DAYS + 1)
+    notified = []
+    monkeypatch.setattr(hold_notifier, 'notify', lambda patron_id, book_id: notified.append((patron_id, book_id)))
+    assert expire_uncollected_holds() == 1
+    assert get_hold("000001", 3) is None
+    assert get_hold("000002", 3)['status'] == HOLD_READY
+    assert notified == [("000002", 3)]
+
+    _age_ready_holds(HOLD_PICKUP_DAYS + 1)
+    assert expire_uncollected_holds() == 1
+    assert get_book_by_id(3)['available_copies'] == 1
+
+def test_new_hold_expires_stale_hold_first(clean_db):
+    place_hold("000001", 3)
+    return_book_by_patron("123456", 3)
+    _age_ready_holds(HOLD_PICKUP_DAYS + 1)
+
+    assert place_hold("000002", 3) == (False, "This book is available now; borrow it instead.")
+    assert get_hold("000001", 3) is None
+    assert borrow_book_by_patron("000002", 3)[0] is True
+    statuses = conn_execute_read('SELECT status FROM holds WHERE patron_id = ?', ("000001",))
+    assert statuses == [{'status': HOLD_EXPIRED}]
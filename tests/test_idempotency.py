@@ -0,0 +1,123 @@
+import threading
+import time
+import uuid
+
+import pytest
+
+import routes.api_routes
+from app import create_app
+from repository import conn_execute_read
+from services.idempotency import IdempotencyKeyError, IdempotencyStore
+
+
+def _concurrently(count, fn):
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def worker(i):
+        barrier.wait()
+        results[i] = fn()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def _open_loans(patron_id):
+    return conn_execute_read('SELECT id FROM borrow_records WHERE patron_id = ? AND return_date IS NULL',
+                             (patron_id,))
+
+def test_concurrent_duplicate_borrows_write_once(clean_db):
+    app = create_app()
+    key = uuid.uuid4().hex
+    form = {'patron_id': '000001', 'book_id': '1'}
+
+    responses = _concurrently(8, lambda: app.test_client().post(
+        '/borrow', data=form, headers={'Idempotency-Key': key}, follow_redirects=True))
+    assert all(b'Successfully borrowed' in response.data for response in responses)
+    assert len(_open_loans('000001')) == 1
+
+    retry = app.test_client().post('/borrow', data={**form, 'idempotency_key': key}, follow_redirects=True)
+    assert b'Successfully borrowed' in retry.data
+    assert len(_open_loans('000001')) == 1
+
+    # Without a key a repeat post is a new request
+    app.test_client().post('/borrow', data=form)
+    assert len(_open_loans('000001')) == 2
+
+def test_duplicate_return_replays_result(clean_db):
+    client = create_app().test_client()
+    form = {'patron_id': '123456', 'book_id': '3', 'idempotency_key': uuid.uuid4().hex}
+    first, second = (client.post('/return', data=form).get_data(as_text=True) for _ in range(2))
+    assert 'Book returned successfully' in first and 'Book returned successfully' in second
+
+    reused = client.post('/return', data={**form, 'book_id': '1'}).get_data(as_text=True)
+    assert 'already used for a different request' in reused
+
+def test_concurrent_duplicate_payments_charge_once(clean_db, monkeypatch):
+    calls = []
+
+    def slow_payment(patron_id, book_id):
+        calls.append((patron_id, book_id))
+        time.sleep(0.05)
+        return True, "Payment successful!", f"txn_{len(calls)}"
+
+    monkeypatch.setattr(routes.api_routes, 'pay_late_fees', slow_payment)
+    app = create_app()
+    headers = {'Idempotency-Key': uuid.uuid4().hex}
+
+    responses = _concurrently(6, lambda: app.test_client().post('/api/late_fee/123456/3/pay', headers=headers))
+    assert calls == [('123456', 3)]
+    assert {response.get_json()['transaction_id'] for response in responses} == {'txn_1'}
+
+    response = app.test_client().post('/api/late_fee/123456/2/pay', headers=headers)
+    assert response.status_code == 422
+    response = app.test_client().post('/api/late_fee/123456/3/pay', headers={'Idempotency-Key': 'k' * 256})
+    assert response.status_code == 422 and len(calls) == 1
+
+def test_temporary_failure_is_not_replayed(clean_db, monkeypatch):
+    outcomes = [(False, "Payment service is busy, please try again shortly", None),
+                (True, "Payment successful!", "txn_1")]
+    monkeypatch.setattr(routes.api_routes, 'pay_late_fees', lambda patron_id, book_id: outcomes.pop(0))
+    client = create_app().test_client()
+    headers = {'Idempotency-Key': uuid.uuid4().hex}
+
+    busy = client.post('/api/late_fee/123456/3/pay', headers=headers)
+    assert busy.status_code == 400
+    for _ in range(2):
+        retry = client.post('/api/late_fee/123456/3/pay', headers=headers)
+        assert retry.status_code == 200 and retry.get_json()['transaction_id'] == 'txn_1'
+
+def test_store_expires_and_bounds_keys():
+    now = [0.0]
+    store = IdempotencyStore(max_keys=2, ttl=10, clock=lambda: now[0])
+    calls = []
+    run = lambda key: store.run(key, 'fp', lambda: calls.append(key) or len(calls))
+
+    assert run('a') == run('a') == 1
+    now[0] = 11
+    assert run('a') == 2
+    run('b')
+    run('c')
+    assert store.stats()['size'] == 2
+    assert run('a') == 5
+
+    with pytest.raises(IdempotencyKeyError):
+        store.run('c', 'other', lambda: None)
+
+def test_failed_call_is_retried():
+    store = IdempotencyStore()
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError('gateway timeout')
+        return 'ok'
+
+    with pytest.raises(ConnectionError):
+        store.run('key', 'fp', flaky)
+    assert store.run('key', 'fp', flaky) == 'ok'
+    assert store.run('key', 'fp', flaky) == 'ok' and len(attempts) == 2
@@ -0,0 +1,80 @@
+from database import *
+from services.library_service import *
+from isbn_utils import *
+
+
+def test_normalize_isbn_forms():
+    assert normalize_isbn("978-0-7432-7356-5") == "9780743273565"
+    assert normalize_isbn("0-7432-7356-7") == "9780743273565"
+    assert normalize_isbn("080442957x") == "9780804429573"
+    # Bad ISBN-10 checksum is only cleaned, never converted
+    assert normalize_isbn("0743273560") == "0743273560"
+
+def test_isbn_checksums():
+    assert is_valid_isbn("978-0-451-52493-5")
+    assert is_valid_isbn("0451524934")
+    assert not is_valid_isbn("9780451524936")
+    assert not is_valid_isbn("12345")
+
+def test_lookup_by_any_form(clean_db):
+    assert get_book_by_isbn("978-0-451-52493-5")['title'] == '1984'
+    assert get_book_by_isbn("0451524934")['title'] == '1984'
+    assert search_books_in_catalog("0-06-112008-1", "isbn")[0]['title'] == 'To Kill a Mockingbird'
+
+def test_duplicate_detected_across_forms(clean_db):
+    success, message = add_book_to_catalog("Copy", "Author", "0-7432-7356-7", 1)
+    assert success is False
+    assert "already exists" in message
+
+def test_hyphenated_isbn_stored_normalized(clean_db):
+    success, _ = add_book_to_catalog("Hyphens", "Author", "978-1-4028-9462-6", 1)
+    assert success is True
+    assert get_book_by_isbn("9781402894626")['isbn'] == "9781402894626"
+
+def test_bloom_filter_no_false_negatives():
+    bloom = BloomFilter(1000)
+    for i in range(1000):
+        bloom.add(str(9780000000000 + i))
+    assert all(bloom.might_contain(str(9780000000000 + i)) for i in range(1000))
+    false_positives = sum(bloom.might_contain(str(9790000000000 + i)) for i in range(10000))
+    assert false_positives < 300
+
+def test_isbn_may_exist_tracks_inserts(clean_db):
+    assert isbn_may_exist("9780743273565")
+    assert not isbn_may_exist("9781111111116")
+    insert_book("New", "Author", "9781111111116", 1, 1)
+    assert isbn_may_exist("978-1-111-11111-6")
+
+def test_database_refuses_second_form_of_isbn(clean_db, monkeypatch):
+    assert insert_book("Copy", "Author", "978-0-7432-7356-5", 1, 1) is False
+    # Two workers racing past the Bloom filter: the unique index still decides
+    monkeypatch.setattr('services.library_service.isbn_may_exist', lambda isbn: False)
+    assert add_book_to_catalog("Copy", "Author", "0-7432-7356-7", 1) == (
+        False, "A book with this ISBN already exists.")
+
+def test_upgrade_merges_duplicate_isbn_keys(clean_db):
+    conn = get_db_connection()
+    conn.execute('DROP INDEX idx_books_isbn_key')
+    conn.execute('CREATE INDEX idx_books_isbn_key ON books (isbn_key)')
+    duplicate_id = conn.execute('''
+        INSERT INTO books (title, author, isbn, total_copies, available_copies, isbn_key)
+        VALUES ('The Great Gatsby', 'F. Scott Fitzgerald', '978-0-7432-7356-5', 0, 0, '9780743273565')
+    ''').lastrowid
+    conn.execute('INSERT INTO holdings (book_id, branch_id, total_copies, available_copies) VALUES (?, 1, 2, 1)',
+                 (duplicate_id,))
+    conn.execute('''
+        INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, branch_id)
+        VALUES ('000001', ?, '2024-01-01T00:00:00', '2024-01-15T00:00:00', 1)
+    ''', (duplicate_id,))
+    conn.execute('PRAGMA user_version = 0')
+    conn.commit()
+    conn.close()
+
+    assert ensure_schema() is True
+    book = get_book_by_isbn("978-0-7432-7356-5")
+    assert book['id'] == 1
+    assert (book['total_copies'], book['available_copies']) == (5, 4)
+    assert get_book_by_id(duplicate_id) is None
+    assert get_patron_borrow_count("000001") == 1
+    assert get_patron_borrowed_books("000001")[0]['title'] == 'The Great Gatsby'
+    assert insert_book("Copy", "Author", "978-0-7432-7356-5", 1, 1) is False
@@ -0,0 +1,56 @@
+import gzip
+import json
+
+from app import create_app
+from database import *
+
+
+def _client():
+    return create_app().test_client()
+
+def test_search_api_json_body(clean_db):
+    response = _client().get('/api/search?q=gatsby')
+    data = json.loads(response.data)
+    assert response.mimetype == 'application/json'
+    assert data['count'] == 1
+    assert data['results'][0]['isbn'] == '9780743273565'
+
+def test_search_api_streamed_array(clean_db):
+    for i in range(1200):
+        insert_book(f'Stream Book {i}', 'Author', f'{9781000000000 + i}', 1, 1)
+
+    response = _client().get('/api/search?q=stream&stream=1')
+    assert response.is_streamed
+    results = json.loads(response.data)
+    assert len(results) == 1200
+    assert results[0]['title'] == 'Stream Book 0'
+
+def test_streamed_array_empty(clean_db):
+    response = _client().get('/api/search?q=nothing-matches&stream=1')
+    assert json.loads(response.data) == []
+
+def test_gzip_negotiated(clean_db):
+    for i in range(50):
+        insert_book(f'Gzip Book {i}', 'Author', f'{9782000000000 + i}', 1, 1)
+    client = _client()
+
+    response = client.get('/api/search?q=gzip', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(response.data))['count'] == 50
+
+    streamed = client.get('/api/search?q=gzip&stream=1', headers={'Accept-Encoding': 'gzip'})
+    assert len(json.loads(gzip.decompress(streamed.data))) == 50
+
+    plain = client.get('/api/search?q=gzip')
+    assert 'Content-Encoding' not in plain.headers
+
+def test_small_responses_not_compressed(clean_db):
+    response = _client().get('/api/search?q=1984', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert 'Accept-Encoding' in response.headers['Vary']
+
+def test_pay_late_fee_api_rejects_without_fee(clean_db):
+    response = _client().post('/api/late_fee/000000/1/pay')
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+    assert response.get_json()['transaction_id'] is None
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+from app import create_app
+from database import *
+from services.library_service import *
+
+
+def _open_loan(patron_id, book_id, due_days_ago):
+    due = datetime.now() - timedelta(days=due_days_ago)
+    conn = get_db_connection()
+    conn.execute('''
+        INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
+        VALUES (?, ?, ?, ?)
+    ''', (patron_id, book_id, (due - timedelta(days=14)).isoformat(), due.isoformat()))
+    conn.commit()
+    conn.close()
+
+def test_epoch_days_written_on_insert_and_return(clean_db):
+    borrow_book_by_patron("000001", 1)
+    record = conn_execute_read('SELECT * FROM borrow_records WHERE patron_id = ?', ("000001",))[0]
+    assert record['due_day'] == to_epoch_day(datetime.fromisoformat(record['due_date']))
+    assert record['return_day'] is None
+
+    return_book_by_patron("000001", 1)
+    record = conn_execute_read('SELECT * FROM borrow_records WHERE patron_id = ?', ("000001",))[0]
+    assert record['return_day'] == to_epoch_day(datetime.now())
+
+def test_migration_backfills_existing_rows(clean_db):
+    conn = get_db_connection()
+    conn.execute('UPDATE borrow_records SET due_day = NULL')
+    conn.commit()
+    conn.close()
+
+    init_database()
+    record = conn_execute_read('SELECT * FROM borrow_records WHERE patron_id = ?', ("123456",))[0]
+    assert record['due_day'] == to_epoch_day(datetime.fromisoformat(record['due_date']))
+
+def test_overdue_loans_range(clean_db):
+    _open_loan("000001", 1, 10)
+    _open_loan("000002", 2, 3)
+    _open_loan("000003", 2, -3)
+
+    overdue = get_overdue_loans()
+    assert [loan['patron_id'] for loan in overdue] == ["000001", "000002"]
+    assert overdue[0]['days_overdue'] == 10
+    assert len(get_overdue_loans(limit=1)) == 1
+
+def test_borrowed_books_flag_overdue(clean_db):
+    _open_loan("000001", 1, 2)
+    books = get_patron_borrowed_books("000001")
+    assert books[0]['is_overdue'] is True
+    assert calculate_late_fee_for_book("000001", 1)['days_overdue'] == 2
+
+def test_overdue_api(clean_db):
+    _open_loan("000001", 1, 4)
+    client = create_app().test_client()
+
+    response = client.get('/api/overdue')
+    assert response.status_code == 200
+    assert response.get_json()['count'] == 1
+
+    assert client.get('/api/overdue?limit=x').status_code == 400
@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+
+from app import create_app
+from database import *
+from services.library_service import *
+
+
+def _loan(patron_id, book_id, due_days_ago, returned=False):
+    now = datetime.now()
+    due = now - timedelta(days=due_days_ago)
+    conn = get_db_connection()
+    conn.execute('''
+        INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (patron_id, book_id, (due - timedelta(days=14)).isoformat(), due.isoformat(),
+          now.isoformat() if returned else None))
+    conn.commit()
+    conn.close()
+
+def test_report_totals_match_per_loan_fees(clean_db):
+    _loan("000001", 1, 3)
+    _loan("000001", 2, 12)
+    _loan("000001", 3, -4)
+
+    report = get_patron_status_report("000001")
+    expected = sum(calculate_late_fee_for_book("000001", book_id)['fee_amount'] for book_id in (1, 2, 3))
+    assert report['total_late_fees'] == expected == 10.0
+    assert report['currently_borrowed_count'] == 3
+    assert [loan['book_id'] for loan in report['currently_borrowed_books']] == [2, 1, 3]
+    assert report['currently_borrowed_books'][0]['is_overdue'] is True
+
+def test_history_includes_returned_and_archived(clean_db):
+    _loan("000001", 1, 400, returned=True)
+    archive_closed_loans(datetime.now() + timedelta(days=1))
+    _loan("000001", 2, 20, returned=True)
+    _loan("000001", 3, 1)
+
+    report = get_patron_status_report("000001")
+    assert len(report['borrowing_history']) == 3
+    assert report['borrowing_history'][0]['title'] == '1984'
+    assert report['currently_borrowed_count'] == 1
+    assert report['total_late_fees'] == 0.5
+
+def test_report_for_patron_without_loans(clean_db):
+    report = get_patron_status_report("000999")
+    assert report['status'] == "success"
+    assert report['currently_borrowed_books'] == []
+    assert report['borrowing_history'] == []
+    assert report['total_late_fees'] == 0.0
+
+def test_patron_status_api(clean_db):
+    client = create_app().test_client()
+    data = client.get('/api/patron/123456/status').get_json()
+    assert data['currently_borrowed_count'] == 1
+    assert data['currently_borrowed_books'][0]['title'] == '1984'
+
+    assert client.get('/api/patron/12/status').status_code == 400
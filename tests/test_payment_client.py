@@ -0,0 +1,164 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app import create_app
+from services.library_service import pay_late_fees, refund_late_fee_payment
+from services.payment_service import *
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class StubGatewayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self):
+        server = self.server
+        server.requests.append((self.command, self.path, self.client_address[1]))
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length)) if length else {}
+        if server.mode == 'slow':
+            time.sleep(0.5)
+        if server.mode == 'error':
+            return self._reply(500, {'message': 'boom'})
+        if self.path == '/charges':
+            if body['amount'] > 1000:
+                return self._reply(402, {'message': 'Payment declined: amount exceeds limit'})
+            return self._reply(200, {'transaction_id': f"txn_{body['customer_id']}_1", 'message': 'charged'})
+        if self.path == '/refunds':
+            return self._reply(200, {'message': 'refunded'})
+        if self.path.startswith('/charges/txn_'):
+            return self._reply(200, {'transaction_id': self.path.split('/')[-1], 'status': 'completed'})
+        return self._reply(404, {'message': 'not found'})
+
+    do_GET = do_POST = _handle
+
+    def log_message(self, *args):
+        pass
+
+
+class StubGatewayServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        pass  # clients that time out hang up mid-reply
+
+
+@pytest.fixture
+def stub_server():
+    server = StubGatewayServer(('127.0.0.1', 0), StubGatewayHandler)
+    server.mode = 'ok'
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def _client(server, **kwargs):
+    url = f'http://127.0.0.1:{server.server_address[1]}'
+    return GatewayClient(HttpPaymentGateway(url, timeout=(1.0, 0.2)), **kwargs)
+
+def test_http_gateway_reuses_connection(stub_server):
+    client = _client(stub_server)
+    for _ in range(5):
+        success, txn, _ = client.process_payment('123456', 5.0, 'Late fees')
+        assert success and txn == 'txn_123456_1'
+
+    assert len({port for _, _, port in stub_server.requests}) == 1
+
+def test_decline_and_lookups(stub_server):
+    client = _client(stub_server)
+    assert client.process_payment('123456', 5000.0) == (False, '', 'Payment declined: amount exceeds limit')
+    assert client.refund_payment('txn_123456_1', 5.0) == (True, 'refunded')
+    assert client.verify_payment_status('txn_123456_1')['status'] == 'completed'
+    assert client.breaker.state == CircuitBreaker.CLOSED
+
+def test_breaker_opens_and_fails_fast(stub_server):
+    stub_server.mode = 'error'
+    client = _client(stub_server, breaker=CircuitBreaker(failure_threshold=3, reset_timeout=60))
+    for _ in range(3):
+        success, _, message = client.process_payment('123456', 5.0)
+        assert not success and 'gateway error' in message.lower()
+
+    calls = len(stub_server.requests)
+    success, _, message = client.process_payment('123456', 5.0)
+    assert not success and 'temporarily unavailable' in message
+    assert len(stub_server.requests) == calls
+    assert client.stats()['circuit'] == 'open'
+    assert client.stats()['operations']['process_payment']['rejected'] == 1
+
+def test_timeout_counts_as_failure(stub_server):
+    stub_server.mode = 'slow'
+    client = _client(stub_server, breaker=CircuitBreaker(failure_threshold=1))
+    start = time.monotonic()
+    success, _, message = client.process_payment('123456', 5.0)
+    assert not success and 'timeout' in message.lower()
+    assert time.monotonic() - start < 0.5
+    assert client.breaker.state == CircuitBreaker.OPEN
+
+def test_breaker_half_open_trial():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock)
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    clock.now = 10
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()  # only one trial at a time
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock.now = 20
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+
+def test_token_bucket_refills():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=2, clock=clock)
+    assert bucket.try_acquire() and bucket.try_acquire()
+    assert not bucket.try_acquire()
+    clock.now = 0.5
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+
+def test_rate_limited_calls_are_refused(stub_server):
+    client = _client(stub_server, limiter=TokenBucket(rate=1, capacity=1, clock=FakeClock()))
+    assert client.refund_payment('txn_1', 1.0)[0]
+    assert client.refund_payment('txn_1', 1.0) == (False, 'Payment service is busy, please try again shortly')
+    assert client.stats()['operations']['refund_payment']['throttled'] == 1
+
+def test_shared_client_through_app_config(clean_db, stub_server, mocker):
+    url = f'http://127.0.0.1:{stub_server.server_address[1]}'
+    try:
+        app = create_app({'PAYMENT_GATEWAY_URL': url, 'SEED_SAMPLE_DATA': False})
+        client = get_payment_gateway()
+        assert isinstance(client.gateway, HttpPaymentGateway)
+
+        mocker.patch('services.library_service.get_ledger_late_fee', return_value={'fee_amount': 3.5})
+        success, _, transaction_id = pay_late_fees('123456', 1)
+        assert success and transaction_id == 'txn_123456_1'
+        assert refund_late_fee_payment(transaction_id, 3.5)[0]
+
+        stats = app.test_client().get('/api/payments/stats').get_json()
+        assert stats['circuit'] == 'closed'
+        assert stats['operations']['process_payment']['calls'] == 1
+    finally:
+        configure_payment_gateway()
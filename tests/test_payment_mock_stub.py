@@ -4,17 +4,6 @@ import pytest
 from services.library_service import *
 from database import *
 
-@pytest.fixture
-def fresh_db():
-    conn = get_db_connection()
-    conn.execute('''DROP TABLE books''')
-    conn.execute('''DROP TABLE borrow_records''')
-    conn.close()
-
-    init_database()
-    add_sample_data()
-    yield
-
 @pytest.fixture
 def sample_book():
     return {'id': 10, 'title': 'Test Book', 'author': 'Mr. Name', 'isbn': '1234567890987'}
@@ -0,0 +1,59 @@
+import pstats
+import time
+
+from app import create_app
+
+
+def _client(**config):
+    app = create_app({'PROFILING_ENABLED': True, 'PROFILE_SAMPLE_INTERVAL': 0.0005, **config})
+
+    @app.route('/slow')
+    def slow():
+        time.sleep(0.05)
+        return 'done'
+
+    return app.test_client()
+
+def test_profiling_is_off_by_default(clean_db):
+    client = create_app().test_client()
+    response = client.get('/catalog', headers={'X-Profile': 'cprofile'})
+    assert 'X-Profile-Id' not in response.headers
+    assert client.get('/admin/profiles').status_code == 404
+
+def test_cprofile_download(clean_db, tmp_path):
+    client = _client()
+    assert 'X-Profile-Id' not in client.get('/catalog').headers
+
+    response = client.get('/catalog', headers={'X-Profile': 'cprofile', 'X-Request-ID': 'req-1'})
+    assert response.status_code == 200 and response.headers['X-Profile-Id'] == 'req-1'
+
+    [profile] = client.get('/admin/profiles').get_json()['results']
+    assert (profile['id'], profile['kind'], profile['path'], profile['status']) == ('req-1', 'cprofile', '/catalog', 200)
+    assert profile['download'] == '/admin/profiles/req-1.pstats'
+
+    path = tmp_path / 'req-1.pstats'
+    path.write_bytes(client.get(profile['download']).data)
+    stats = pstats.Stats(str(path))
+    assert any(name == 'catalog' for _, _, name in stats.stats)
+    assert client.get('/admin/profiles/req-1.collapsed').status_code == 404
+
+def test_sampled_stacks_listed_slowest_first(clean_db):
+    client = _client(PROFILE_SAMPLE_RATE=1.0)
+    client.get('/catalog')
+    slow_id = client.get('/slow').headers['X-Profile-Id']
+
+    profiles = client.get('/admin/profiles').get_json()['results']
+    assert [p['path'] for p in profiles] == ['/slow', '/catalog']
+    assert profiles[0]['kind'] == 'stacks' and profiles[0]['duration_ms'] >= 50
+
+    collapsed = client.get(f'/admin/profiles/{slow_id}.collapsed').get_data(as_text=True)
+    lines = collapsed.splitlines()
+    assert lines and all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+    assert any(';slow (test_profiling.py:' in line for line in lines)
+    assert client.get('/admin/profiles/missing.collapsed').status_code == 404
+
+def test_profile_history_is_bounded(clean_db):
+    client = _client(PROFILE_HISTORY=2)
+    for _ in range(3):
+        client.get('/api/branches', headers={'X-Profile': 'stacks'})
+    assert len(client.get('/admin/profiles').get_json()['results']) == 2
@@ -0,0 +1,27 @@
+from app import create_app
+from database import *
+from services.library_service import *
+
+
+def test_book_record_mapping_access(clean_db):
+    book = get_book_by_id(1)
+    assert isinstance(book, Book)
+    assert book['title'] == book.title == 'The Great Gatsby'
+    assert 'isbn' in book and 'missing' not in book
+    assert book.get('missing', 'x') == 'x'
+    assert dict(book)['available_copies'] == 3
+    assert not hasattr(book, '__dict__')
+
+def test_loan_record_fields(clean_db):
+    loans = get_patron_borrowed_books("123456")
+    assert isinstance(loans[0], Loan)
+    assert loans[0]['title'] == '1984'
+    assert loans[0]['is_overdue'] is False
+
+def test_records_serialize_with_jsonify(clean_db):
+    app = create_app()
+    with app.app_context():
+        from flask import jsonify
+        data = jsonify(get_all_books()).get_json()
+    assert data[0]['title'] == '1984'
+    assert set(data[0]) == set(Book.__slots__)
@@ -0,0 +1,133 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import database
+from database import HOLD_PICKUP_DAYS
+from app import create_app
+from repository import (
+    InMemoryRepository, Query, any_of, compile_sqlite, configure_repository, contains, eq, evaluate,
+    is_in, is_null
+)
+from services.catalog_snapshot import snapshot_search
+from services.library_service import *
+
+
+@pytest.fixture(params=['sqlite', 'memory'])
+def backend(request):
+    """Run a test against each storage backend, seeded with the sample catalog."""
+    if request.param == 'sqlite':
+        request.getfixturevalue('clean_db')
+    repository = configure_repository(request.param)
+    repository.add_sample_data()
+    yield repository
+    configure_repository('sqlite')
+
+def test_borrow_and_return(backend):
+    assert borrow_book_by_patron("000001", 1)[0] is True
+    assert borrow_book_by_patron("000001", 3) == (False, "This book is currently not available.")
+    assert backend.get_book_by_id(1).available_copies == 2
+    assert backend.get_patron_borrow_count("000001") == 1
+
+    assert return_book_by_patron("000001", 1) == (True, "Book returned successfully. No late fee.")
+    assert return_book_by_patron("000001", 1) == (False, "Book not borrowed by patron.")
+    assert backend.get_book_by_id(1).available_copies == 3
+
+def test_borrow_limit(backend):
+    backend.insert_book("Plenty", "Author", "9781000000601", 10, 10)
+    book_id = backend.get_book_by_isbn("9781000000601").id
+    results = [borrow_book_by_patron("000002", book_id)[0] for _ in range(7)]
+    assert results == [True] * 5 + [False] * 2
+
+def test_holds_and_branches(backend):
+    east = next(branch['id'] for branch in backend.get_branches() if branch['code'] == 'EAST')
+    assert place_hold("000001", 3)[0] is True
+    assert return_book_by_patron("123456", 3, east)[0] is True
+    assert backend.get_hold("000001", 3)['branch_id'] == east
+    assert borrow_book_by_patron("000001", 3)[0] is True
+
+    assert place_hold("000002", 3)[0] is True
+    assert return_book_by_patron("000001", 3)[0] is True
+    later = datetime.now() + timedelta(days=HOLD_PICKUP_DAYS + 1)
+    assert backend.expire_ready_holds(later) == [(3, None)]
+    assert backend.get_hold("000002", 3) is None
+    assert backend.get_book_by_id(3).available_copies == 1
+
+    assert borrow_book_by_patron("000002", 1, east)[0] is True
+    assert borrow_book_by_patron("000003", 1, east)[1] == "This book is currently not available at this branch."
+    holdings = {row['code']: row['available_copies'] for row in backend.get_book_holdings(1)}
+    assert holdings == {'MAIN': 2, 'EAST': 0}
+    assert [book.id for book in backend.get_branch_books(east)] == [3, 1]
+
+def test_search_and_reports(backend):
+    assert [book['id'] for book in search_books_in_catalog("  GATSBY ", "title")] == [1]
+    assert [book['id'] for book in search_books_in_catalog("978-0-06-112008-4", "isbn")] == [2]
+    assert [book['id'] for book in search_books_in_catalog("o", "author")] == [3, 1]
+    branch_results = search_books_in_catalog("gatsby", "title", 2)
+    assert branch_results[0]['branch_available_copies'] == 1
+
+    report = get_patron_status_report("123456")
+    assert report['currently_borrowed_count'] == 1
+    assert report['currently_borrowed_books'][0]['title'] == "1984"
+    assert calculate_late_fee_for_book("123456", 3)['status'] == 'On time'
+
+def test_memory_backend_leaves_sqlite_alone(clean_db):
+    client = create_app({'STORAGE_BACKEND': 'memory'}).test_client()
+    try:
+        assert b'The Great Gatsby' in client.get('/catalog').data
+        client.post('/borrow', data={'patron_id': '000001', 'book_id': '1'})
+        assert client.get('/api/books/1/availability').get_json()['available_copies'] == 2
+        assert client.get('/api/search?q=gatsby').get_json()['results'][0]['available_copies'] == 2
+    finally:
+        configure_repository('sqlite')
+    assert database.get_book_by_id(1).available_copies == 3
+
+def test_memory_backend_refuses_sqlite_only_options(clean_db, tmp_path):
+    for option, value in (('CATALOG_SNAPSHOT_PATH', str(tmp_path / 'catalog.snap')), ('GROUP_COMMIT', True),
+                          ('FEE_SCHEDULER_INTERVAL', 60)):
+        with pytest.raises(ValueError, match=option):
+            create_app({'STORAGE_BACKEND': 'memory', option: value})
+
+    database.insert_book("Only In SQLite", "Author", "9781000000602", 1, 1)
+    create_app({'CATALOG_SNAPSHOT_PATH': str(tmp_path / 'catalog.snap')}).test_client().get('/api/search?q=only')
+    client = create_app({'STORAGE_BACKEND': 'memory'}).test_client()
+    try:
+        assert client.get('/api/search?q=only').get_json()['results'] == []
+        assert client.get('/export/books.csv').status_code == 501
+    finally:
+        configure_repository('sqlite')
+        snapshot_search.configure(None)
+
+def test_overdue_loans(backend):
+    long_ago = datetime.now() - timedelta(days=30)
+    backend.borrow_book_transaction("000001", 1, long_ago, long_ago + timedelta(days=14))
+    backend.borrow_book_transaction("000002", 2, long_ago, long_ago + timedelta(days=20))
+    overdue = backend.get_overdue_loans()
+    assert [(loan['patron_id'], loan['title'], loan['days_overdue']) for loan in overdue] == [
+        ("000001", "The Great Gatsby", 16), ("000002", "To Kill a Mockingbird", 10)]
+    assert len(backend.get_overdue_loans(limit=1)) == 1
+
+    client = create_app({'STORAGE_BACKEND': backend, 'SEED_SAMPLE_DATA': False}).test_client()
+    assert client.get('/api/overdue').get_json()['count'] == 2
+
+def test_memory_backend_only_runs_queries():
+    with pytest.raises(TypeError):
+        InMemoryRepository().conn_execute_read('SELECT 1')
+
+def test_query_compiles_to_sqlite():
+    query = Query('books', ('id', 'title'), (contains('title', 'war'), any_of(eq('id', 1), is_null('isbn'))),
+                  order_by=('title', '-id'), limit=5)
+    assert compile_sqlite(query) == (
+        'SELECT id, title FROM books WHERE title LIKE ? AND (id = ? OR isbn IS NULL) '
+        'ORDER BY title, id DESC LIMIT ?', ('%war%', 1, 5))
+    with pytest.raises(ValueError):
+        compile_sqlite(Query('books; DROP TABLE books', ('id',)))
+
+def test_query_evaluates_like_sqlite():
+    rows = [{'id': 1, 'name': 'Beta', 'due': None}, {'id': 2, 'name': 'alpha', 'due': 3},
+            {'id': 3, 'name': 'Alphabet', 'due': 1}, {'id': 4, 'name': 'gamma', 'due': 3}]
+    assert evaluate(Query('t', ('id',), order_by=('due', '-id')), rows) == [
+        {'id': 1}, {'id': 3}, {'id': 4}, {'id': 2}]
+    assert evaluate(Query('t', ('id',), (contains('name', 'ALPHA'),), limit=1), rows) == [{'id': 2}]
+    assert evaluate(Query('t', ('name',), (is_in('id', [3, 4]),)), rows) == [
+        {'name': 'Alphabet'}, {'name': 'gamma'}]
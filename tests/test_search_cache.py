@@ -0,0 +1,76 @@
+from app import create_app
+from database import *
+from services.library_service import *
+from services.search_cache import SearchCache, normalize_search_key, search_cache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_normalized_terms_share_entry(clean_db):
+    search_books_in_catalog("Orwell", "author")
+    hits = search_cache.stats()['hits']
+
+    results = search_books_in_catalog("  orWELL ", "author")
+    assert search_cache.stats()['hits'] == hits + 1
+    assert results[0]['title'] == '1984'
+
+def test_insert_book_invalidates(clean_db):
+    assert len(search_books_in_catalog("gatsby", "title")) == 1
+    add_book_to_catalog("Gatsby Returns", "Author", "9781234567897", 1)
+    assert len(search_books_in_catalog("gatsby", "title")) == 2
+
+def test_availability_change_refreshes_results(clean_db):
+    assert search_books_in_catalog("gatsby", "title")[0]['available_copies'] == 3
+    search_books_in_catalog("orwell", "author")
+    borrow_book_by_patron("000001", 1)
+
+    assert normalize_search_key("author", "orwell") in search_cache._entries
+    assert search_books_in_catalog("gatsby", "title")[0]['available_copies'] == 2
+
+def test_lru_eviction_and_ttl():
+    clock = FakeClock()
+    cache = SearchCache(max_entries=2, ttl=10, clock=clock)
+    cache.put(("title", "a"), [{'id': 1}])
+    cache.put(("title", "b"), [{'id': 2}])
+    cache.get(("title", "a"))
+    cache.put(("title", "c"), [{'id': 3}])
+
+    assert cache.get(("title", "b")) is None
+    assert cache.get(("title", "a")) == [{'id': 1}]
+    assert cache.stats()['evictions'] == 1
+
+    clock.now = 11
+    assert cache.get(("title", "a")) is None
+    assert cache.stats()['expirations'] == 1
+
+def test_stats_endpoint(clean_db):
+    client = create_app().test_client()
+    client.get('/search?q=gatsby&type=title')
+    client.get('/api/search?q=Gatsby&type=title')
+
+    stats = client.get('/api/search/stats').get_json()
+    assert stats['hits'] >= 1
+    assert 0 < stats['hit_rate'] <= 1
+
+def test_non_ascii_terms_match_like_sqlite(clean_db):
+    add_book_to_catalog("Émile Zola Stories", "Émile Zola", "9781000000801", 1)
+    assert [book['title'] for book in search_books_in_catalog("Émile", "title")] == ["Émile Zola Stories"]
+    assert [book['title'] for book in search_books_in_catalog("  ÉMILE zola ", "author")] == ["Émile Zola Stories"]
+    # LIKE folds ASCII only, so a lowercase accented letter is a different search
+    assert search_books_in_catalog("émile", "title") == []
+    assert normalize_search_key("title", "Émile") != normalize_search_key("title", "émile")
+
+def test_invalidation_during_query_is_not_cached():
+    cache = SearchCache()
+    generation = cache.generation
+    cache.invalidate(1)
+    cache.put(("title", "a"), [{'id': 1, 'available_copies': 3}], generation)
+    assert cache.get(("title", "a")) is None
+
+    cache.put(("title", "a"), [{'id': 1, 'available_copies': 2}], cache.generation)
+    assert cache.get(("title", "a")) == [{'id': 1, 'available_copies': 2}]
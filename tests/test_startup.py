@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+
+from app import create_app
+from database import *
+from services.payment_service import PaymentGateway, get_payment_gateway
+
+
+def test_ensure_schema_skips_current_database(clean_db):
+    assert ensure_schema() is False
+
+    conn = get_db_connection()
+    conn.execute('PRAGMA user_version = 0')
+    conn.commit()
+    conn.close()
+    assert ensure_schema() is True
+    assert ensure_schema() is False
+
+def test_production_skips_sample_data(clean_db):
+    conn = get_db_connection()
+    conn.execute('DELETE FROM borrow_records')
+    conn.execute('DELETE FROM books')
+    conn.commit()
+    conn.close()
+
+    create_app({'SEED_SAMPLE_DATA': False})
+    assert get_all_books() == []
+
+    create_app()
+    assert len(get_all_books()) == 3
+
+def test_production_env_default(clean_db, monkeypatch):
+    monkeypatch.setenv('LIBRARY_ENV', 'production')
+    assert create_app().config['SEED_SAMPLE_DATA'] is False
+
+def test_payment_gateway_shared_and_lazy():
+    gateway = get_payment_gateway()
+    assert isinstance(gateway, PaymentGateway)
+    assert get_payment_gateway() is gateway
+
+def test_import_app_skips_cli_only_dependencies():
+    code = ("import sys, app; print('numpy' in sys.modules, 'services.circulation_report' in sys.modules, "
+            "'requests' in sys.modules)")
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                            cwd=os.path.join(os.path.dirname(__file__), '..'), check=True)
+    assert result.stdout.split() == ['False', 'False', 'False']
+
+def test_template_bytecode_cache_is_private(clean_db):
+    cache = create_app().jinja_env.bytecode_cache
+    info = os.stat(cache.directory)
+    assert info.st_uid == os.getuid()
+    assert info.st_mode & 0o077 == 0
@@ -0,0 +1,75 @@
+import sqlite3
+import threading
+import time
+
+import database
+from app import create_app
+from database import *
+from services.library_service import *
+import services.suggest_index as suggest_index_module
+from services.suggest_index import PrefixIndex, suggest_index
+
+
+def test_prefix_index_completions():
+    index = PrefixIndex(["Harry Potter", "harvest", "Hamlet", "Harry Potter", "Zen"])
+    assert index.complete("har") == ["Harry Potter", "harvest"]
+    assert index.complete("HA", limit=1) == ["Hamlet"]
+    assert index.complete("q") == []
+    assert len(index) == 4
+
+def test_suggest_from_catalog(clean_db):
+    result = suggest_index.suggest("the")
+    assert result['titles'] == ["The Great Gatsby"]
+    assert suggest_index.suggest("geo")['authors'] == ["George Orwell"]
+
+def test_insert_updates_index(clean_db):
+    suggest_index.suggest("the")
+    add_book_to_catalog("The Hobbit", "J. R. R. Tolkien", "9780547928227", 2)
+
+    result = suggest_index.suggest("the")
+    assert result['titles'] == ["The Great Gatsby", "The Hobbit"]
+    assert suggest_index.suggest("j.")['authors'] == ["J. R. R. Tolkien"]
+
+def test_suggest_api(clean_db):
+    client = create_app().test_client()
+    data = client.get('/api/suggest?q=to').get_json()
+    assert data['titles'] == ["To Kill a Mockingbird"]
+
+    assert client.get('/api/suggest').status_code == 400
+    assert client.get('/api/suggest?q=a&limit=x').status_code == 400
+    many = client.get('/api/suggest?q=t&limit=100000').get_json()
+    assert len(many['titles']) <= 50
+    assert client.get('/api/suggest?q=to&limit=-3').get_json()['titles'] == ["To Kill a Mockingbird"]
+
+def test_picks_up_inserts_from_other_processes(clean_db, monkeypatch):
+    suggest_index.suggest("the")
+    conn = sqlite3.connect(database.DATABASE)
+    conn.execute("INSERT INTO books (title, author, isbn, total_copies, available_copies) "
+                 "VALUES ('The Hobbit', 'J. R. R. Tolkien', '9780547928227', 2, 2)")
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(suggest_index, 'check_interval', 0)
+    assert suggest_index.suggest("the")['titles'] == ["The Great Gatsby", "The Hobbit"]
+
+def test_insert_during_rebuild_is_kept(clean_db, monkeypatch):
+    suggest_index.on_book_changed(None)
+    read_rows = suggest_index_module.conn_execute_read
+
+    def read_then_insert(query):
+        rows = read_rows(query)
+        writer = threading.Thread(target=add_book_to_catalog,
+                                  args=("The Hobbit", "J. R. R. Tolkien", "9780547928227", 2))
+        writer.start()
+        while get_book_by_isbn("9780547928227") is None:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        threads.append(writer)
+        return rows
+
+    threads = []
+    monkeypatch.setattr(suggest_index_module, 'conn_execute_read', read_then_insert)
+    suggest_index.rebuild()
+    threads[0].join()
+    monkeypatch.undo()
+    assert suggest_index.suggest("the")['titles'] == ["The Great Gatsby", "The Hobbit"]